@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+#
+# This code is licensed under the GPL 2.0 license.
+#
+"""
+ * Measures the mapping of the tile-local coordinates of a synthetic tile with dense polygons to EPSG:3857.
+ * Compares the per-vertex mapping with map_coordinates_recursive to map_tile_coordinates with and without NumPy.
+ * Usage: python -m tests.benchmark_coordinate_mapping [nr_of_polygons] [nr_of_vertices_per_ring]
+"""
+import gc
+import math
+import sys
+import time
+
+from util import feature_helper
+from util.feature_helper import map_coordinates_recursive, map_tile_coordinates, TileAffine
+from util.tile_helper import tile_to_latlon
+
+_TILE_EXTENT = 4096
+_REPETITIONS = 5
+
+
+def _create_polygons(nr_of_polygons, nr_of_vertices):
+    polygons = []
+    for i in range(nr_of_polygons):
+        center_x = (i * 37) % _TILE_EXTENT
+        center_y = (i * 91) % _TILE_EXTENT
+        ring = []
+        for v in range(nr_of_vertices):
+            angle = 2 * math.pi * v / nr_of_vertices
+            ring.append([int(center_x + 100 * math.cos(angle)), int(center_y + 100 * math.sin(angle))])
+        ring.append(ring[0])
+        polygons.append([ring])
+    return polygons
+
+
+def _map_per_vertex(polygons, tile_bounds):
+    delta_x = tile_bounds[2] - tile_bounds[0]
+    delta_y = tile_bounds[3] - tile_bounds[1]
+    result = []
+    for p in polygons:
+        result.append(map_coordinates_recursive(p,
+                                                tile_extent=_TILE_EXTENT,
+                                                mapper_func=lambda c: [
+                                                    int(tile_bounds[0] + delta_x / _TILE_EXTENT * c[0]),
+                                                    int(tile_bounds[1] + delta_y / _TILE_EXTENT * c[1])],
+                                                all_out_of_bounds_func=lambda out_of_bounds: None))
+    return result
+
+
+def _map_per_layer(polygons, tile_bounds):
+    return [coordinates for coordinates, _ in map_tile_coordinates(polygons, TileAffine(tile_bounds, _TILE_EXTENT))]
+
+
+def _measure(func, polygons, tile_bounds):
+    durations = []
+    for _ in range(_REPETITIONS):
+        # the results of the previous runs would otherwise be traversed by the garbage collector
+        gc.collect()
+        start = time.time()
+        func(polygons, tile_bounds)
+        durations.append(time.time() - start)
+    return min(durations)
+
+
+def run(nr_of_polygons=2000, nr_of_vertices=100):
+    polygons = _create_polygons(nr_of_polygons, nr_of_vertices)
+    tile_bounds = tile_to_latlon(14, 8580, 10645, scheme="tms")
+    print("{} polygons with {} vertices each".format(nr_of_polygons, nr_of_vertices + 1))
+
+    expected = _map_per_vertex(polygons, tile_bounds)
+    base_duration = _measure(_map_per_vertex, polygons, tile_bounds)
+    print("map_coordinates_recursive: {:.3f}s".format(base_duration))
+    numpy = feature_helper.np
+    for name, np in [("NumPy", numpy), ("pure Python", None)]:
+        if name == "NumPy" and np is None:
+            print("map_tile_coordinates ({}): not installed".format(name))
+            continue
+        feature_helper.np = np
+        assert _map_per_layer(polygons, tile_bounds) == expected
+        duration = _measure(_map_per_layer, polygons, tile_bounds)
+        print("map_tile_coordinates ({}): {:.3f}s, speedup {:.2f}".format(name, duration, base_duration / duration))
+    feature_helper.np = numpy
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    run(*args)
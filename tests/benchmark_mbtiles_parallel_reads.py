@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+#
+# This code is licensed under the GPL 2.0 license.
+#
+"""
+ * Measures how reading the tiles of a synthetic MBTiles file scales with the number of read connections.
+ * Usage: python -m tests.benchmark_mbtiles_parallel_reads [nr_of_tiles_per_axis] [tile_size_in_bytes]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from util.tile_source import MBTilesSource
+from tests.benchmark_mbtiles_queries import create_mbtiles
+
+_ZOOM_LEVEL = 14
+_CONNECTION_COUNTS = [1, 2, 4, 8]
+
+
+def _read_all(source, tiles_to_load):
+    nr_of_bytes = 0
+    for tile, data in source.iter_tiles(_ZOOM_LEVEL, tiles_to_load=tiles_to_load):
+        nr_of_bytes += len(data)
+    return nr_of_bytes
+
+
+def run(nr_of_tiles_per_axis=128, tile_size=32 * 1024):
+    path = os.path.join(tempfile.gettempdir(), "vtr_benchmark_parallel_{}.mbtiles".format(nr_of_tiles_per_axis))
+    print("Creating {} tiles of {} bytes in {}".format(nr_of_tiles_per_axis ** 2, tile_size, path))
+    create_mbtiles(path, nr_of_tiles_per_axis, tile_size=tile_size)
+    tiles_to_load = [(x, y) for x in range(nr_of_tiles_per_axis) for y in range(nr_of_tiles_per_axis)]
+
+    # warm up the page cache, so that all runs read from memory
+    _read_all(MBTilesSource(path), tiles_to_load)
+    base_duration = None
+    for nr_of_connections in _CONNECTION_COUNTS:
+        source = MBTilesSource(path, nr_of_read_connections=nr_of_connections)
+        start = time.time()
+        nr_of_bytes = _read_all(source, tiles_to_load)
+        duration = time.time() - start
+        source.close_connection()
+        if base_duration is None:
+            base_duration = duration
+        print("{} connection(s): {:.3f}s, {:.1f} MB/s, speedup {:.2f}".format(
+            nr_of_connections, duration, nr_of_bytes / duration / 1024 / 1024, base_duration / duration))
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    run(*args)
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+#
+# This code is licensed under the GPL 2.0 license.
+#
+"""
+ * Compares the tile query of MBTilesSource with the former string concatenation query on a synthetic MBTiles file.
+ * Usage: python -m tests.benchmark_mbtiles_queries [nr_of_tiles_per_axis]
+"""
+import os
+import sys
+import sqlite3
+import tempfile
+import time
+
+from util.tile_source import MBTilesSource
+
+_ZOOM_LEVEL = 14
+_REQUEST_SIZE = 16
+
+
+def create_mbtiles(path, nr_of_tiles_per_axis, tile_size=2):
+    """
+     * Creates an MBTiles file with nr_of_tiles_per_axis^2 tiles of tile_size bytes on the zoom level 14
+    """
+    if os.path.isfile(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE metadata (name text, value text)")
+    conn.execute("CREATE TABLE tiles (zoom_level integer, tile_column integer, tile_row integer, tile_data blob)")
+    conn.execute("CREATE UNIQUE INDEX tile_index ON tiles (zoom_level, tile_column, tile_row)")
+    conn.executemany("INSERT INTO metadata VALUES (?, ?)", [("name", "benchmark"), ("format", "pbf")])
+    tile_data = sqlite3.Binary(b"\x1a" + b"\x00" * (tile_size - 1))
+    for col in range(nr_of_tiles_per_axis):
+        conn.executemany("INSERT INTO tiles VALUES (?, ?, ?, ?)",
+                         ((_ZOOM_LEVEL, col, row, tile_data) for row in range(nr_of_tiles_per_axis)))
+    conn.commit()
+    conn.close()
+
+
+def _legacy_query(conn, tiles_to_load):
+    tile_coords = str(["{};{}".format(x[0], x[1]) for x in tiles_to_load]).replace("[", "").replace("]", "")
+    sql = "SELECT zoom_level, tile_column, tile_row, tile_data FROM tiles WHERE zoom_level = {} AND " \
+          "tile_column || \";\" || tile_row IN ({});".format(_ZOOM_LEVEL, tile_coords)
+    return conn.execute(sql).fetchall()
+
+
+def _measure(func, repetitions=5):
+    durations = []
+    result = None
+    for _ in range(repetitions):
+        start = time.time()
+        result = func()
+        durations.append(time.time() - start)
+    return min(durations), result
+
+
+def run(nr_of_tiles_per_axis=1000):
+    path = os.path.join(tempfile.gettempdir(), "vtr_benchmark_{}.mbtiles".format(nr_of_tiles_per_axis))
+    print("Creating {} tiles in {}".format(nr_of_tiles_per_axis ** 2, path))
+    create_mbtiles(path, nr_of_tiles_per_axis)
+
+    offset = nr_of_tiles_per_axis // 2
+    tiles_to_load = [(offset + x, offset + y) for x in range(_REQUEST_SIZE) for y in range(_REQUEST_SIZE)]
+
+    conn = sqlite3.connect(path)
+    legacy_duration, legacy_rows = _measure(lambda: _legacy_query(conn, tiles_to_load))
+    conn.close()
+
+    source = MBTilesSource(path)
+    duration, tiles = _measure(lambda: source.load_tiles(_ZOOM_LEVEL, tiles_to_load=tiles_to_load))
+    where_clause, parameters = source._get_where_clause(tiles_to_load=tiles_to_load, zoom_level=_ZOOM_LEVEL)
+    plan = source._get_from_db("EXPLAIN QUERY PLAN SELECT tile_data FROM tiles {}".format(where_clause), parameters)
+    source.close_connection()
+
+    assert len(legacy_rows) == len(tiles)
+    print("Requested tiles: {}".format(len(tiles_to_load)))
+    print("Concatenation query: {:.4f}s".format(legacy_duration))
+    print("Bounding box query:  {:.4f}s".format(duration))
+    print("Query plan: {}".format("; ".join(str(r[-1]) for r in plan)))
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        run(int(sys.argv[1]))
+    else:
+        run()
@@ -12,17 +12,29 @@ def get_tests():
     from test_server_source import ServerSourceTests
     from test_tilehelper import TileHelperTests
     from test_filehelper import FileHelperTests
+    from test_featurehelper import FeatureHelperTests
+    from test_overzoomhelper import OverzoomHelperTests
     from test_vtreader import VtReaderTests
     from test_tilejson import TileJsonTests
     from test_networkhelper import NetworkHelperTests
+    from test_tile_index import TileIndexTests
+    from test_directory_source import DirectorySourceTests
+    from test_pmtiles_source import PMTilesSourceTests
+    from test_postgis_source import PostGISSourceTests
 
     tests = [
         unittest.TestLoader().loadTestsFromTestCase(MbtileSourceTests),
         unittest.TestLoader().loadTestsFromTestCase(ServerSourceTests),
         unittest.TestLoader().loadTestsFromTestCase(TileHelperTests),
         unittest.TestLoader().loadTestsFromTestCase(FileHelperTests),
+        unittest.TestLoader().loadTestsFromTestCase(FeatureHelperTests),
+        unittest.TestLoader().loadTestsFromTestCase(OverzoomHelperTests),
         unittest.TestLoader().loadTestsFromTestCase(TileJsonTests),
         unittest.TestLoader().loadTestsFromTestCase(NetworkHelperTests),
+        unittest.TestLoader().loadTestsFromTestCase(TileIndexTests),
+        unittest.TestLoader().loadTestsFromTestCase(DirectorySourceTests),
+        unittest.TestLoader().loadTestsFromTestCase(PMTilesSourceTests),
+        unittest.TestLoader().loadTestsFromTestCase(PostGISSourceTests),
         unittest.TestLoader().loadTestsFromTestCase(VtReaderTests),
     ]
     return tests
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+#
+# This code is licensed under the GPL 2.0 license.
+#
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+try:
+    import simplejson as json
+except ImportError:
+    import json
+from util.tile_source import DirectorySource
+
+
+class DirectorySourceTests(unittest.TestCase):
+    """
+    Tests for DirectorySource
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        with open(os.path.join(self.directory, "metadata.json"), "w") as f:
+            json.dump({"name": "directory_test", "bounds": [0, 0, 1, 1], "vector_layers": []}, f)
+        for col, row in [(3, 4), (3, 5), (4, 5)]:
+            column_dir = os.path.join(self.directory, "10", str(col))
+            if not os.path.isdir(column_dir):
+                os.makedirs(column_dir)
+            with open(os.path.join(column_dir, "{}.pbf".format(row)), "wb") as f:
+                f.write("{};{}".format(col, row).encode("utf-8"))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_non_existing_directory(self):
+        with self.assertRaises(RuntimeError):
+            DirectorySource(os.path.join(self.directory, "doesnotexist"))
+
+    def test_load_tiles(self):
+        src = DirectorySource(self.directory)
+        tiles = src.load_tiles(10, tiles_to_load=[(3, 4), (3, 5), (4, 4), (4, 5), (9, 9)])
+        data_by_coord = dict((t.coord(), data) for t, data in tiles)
+        self.assertEqual({(3, 4): b"3;4", (3, 5): b"3;5", (4, 5): b"4;5"}, data_by_coord)
+
+    def test_load_tiles_progress(self):
+        src = DirectorySource(self.directory)
+        max_progress = []
+        progress = []
+        src.max_progress_changed.connect(max_progress.append)
+        src.progress_changed.connect(progress.append)
+        src.load_tiles(10, tiles_to_load=[(3, 4), (3, 5), (4, 4), (4, 5)])
+        self.assertEqual([4], max_progress)
+        self.assertEqual(4, progress[-1])
+
+    def test_load_tiles_with_limit(self):
+        src = DirectorySource(self.directory)
+        tiles = src.load_tiles(10, tiles_to_load=[(3, 4), (3, 5), (4, 5)], max_tiles=2)
+        self.assertEqual(2, len(tiles))
+
+
+def suite():
+    s = unittest.makeSuite(DirectorySourceTests, 'test')
+    return s
+
+
+# run all tests using unittest skipping nose or testplugin
+def run_all():
+    unittest.TextTestRunner(verbosity=3, stream=sys.stdout).run(suite())
+
+
+if __name__ == "__main__":
+    run_all()
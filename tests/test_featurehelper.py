@@ -0,0 +1,78 @@
+import unittest
+import random
+import mock
+from util.feature_helper import map_tile_coordinates, map_coordinates_recursive, TileAffine
+from util.tile_helper import tile_to_latlon
+
+_TILE_EXTENT = 4096
+
+
+def _map_reference(coordinates, tile_bounds):
+    all_out_of_bounds = []
+    delta_x = tile_bounds[2] - tile_bounds[0]
+    delta_y = tile_bounds[3] - tile_bounds[1]
+    mapped = map_coordinates_recursive(coordinates,
+                                       tile_extent=_TILE_EXTENT,
+                                       mapper_func=lambda c: [int(tile_bounds[0] + delta_x / _TILE_EXTENT * c[0]),
+                                                              int(tile_bounds[1] + delta_y / _TILE_EXTENT * c[1])],
+                                       all_out_of_bounds_func=all_out_of_bounds.append)
+    return mapped, all(c is True for c in all_out_of_bounds)
+
+
+def _line(nr_of_vertices, low=-64, high=_TILE_EXTENT + 64):
+    return [[random.randint(low, high), random.randint(low, high)] for _ in range(nr_of_vertices)]
+
+
+class FeatureHelperTests(unittest.TestCase):
+    """
+    Tests for util.feature_helper
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        random.seed(42)
+        # tiles with negative and positive coordinates, so that truncating rounds in both directions
+        self.tile_bounds = [tile_to_latlon(14, 8580, 10645, scheme="tms"), tile_to_latlon(3, 6, 1, scheme="tms")]
+        self.geometries = [
+            [100, 200],
+            _line(1),
+            _line(200),
+            _line(20, low=_TILE_EXTENT + 1, high=_TILE_EXTENT + 20),
+            [_line(300), _line(40)],
+            [[_line(100), _line(10)], [_line(50)]],
+            [],
+        ]
+
+    def _assert_equal_to_reference(self):
+        for tile_bounds in self.tile_bounds:
+            result = map_tile_coordinates(self.geometries, TileAffine(tile_bounds, _TILE_EXTENT))
+            expected = [_map_reference(g, tile_bounds) for g in self.geometries]
+            self.assertEqual(expected, result)
+
+    def test_map_tile_coordinates(self):
+        self._assert_equal_to_reference()
+
+    def test_map_tile_coordinates_without_numpy(self):
+        with mock.patch("util.feature_helper.np", None):
+            self._assert_equal_to_reference()
+
+    def test_map_tile_coordinates_out_of_bounds(self):
+        geometries = [_line(3, low=-10, high=0), [_line(3, low=-10, high=0)], [0, 0]]
+        result = map_tile_coordinates(geometries, TileAffine(self.tile_bounds[0], _TILE_EXTENT))
+        self.assertEqual([True, False, False], [out_of_bounds for _, out_of_bounds in result])
+
+
+def suite():
+    s = unittest.makeSuite(FeatureHelperTests, 'test')
+    return s
+
+
+if __name__ == "__main__":
+    unittest.main()
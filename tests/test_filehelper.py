@@ -1,5 +1,8 @@
 import sys
 import unittest
+import zlib
+import shutil
+import threading
 from util.file_helper import *
 from util import file_helper
 
@@ -57,12 +60,75 @@ class FileHelperTests(unittest.TestCase):
     def test_is_gzipped_false(self):
         self.assertFalse(is_gzipped([0xC0, 0xFF, 0xEE]))
 
+    def test_decompress_gzip(self):
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        content = compressor.compress(b"tile data") + compressor.flush()
+        self.assertEqual(b"tile data", decompress(content))
+
+    def test_decompress_zlib(self):
+        self.assertEqual(b"tile data", decompress(zlib.compress(b"tile data")))
+
+    def test_decompress_uncompressed(self):
+        self.assertEqual(b"\x1a\x02tile data", decompress(b"\x1a\x02tile data"))
+
     def test_get_styles(self):
         self.assertEqual(0, len(get_styles("total_random_name_that_doesnt_exist")))
 
     def test_get_cached_tile(self):
         self.assertIsNone(get_cache_entry("blabla", "zoom", "x", "y"))
 
+    def test_revalidate_expired_cache_entry(self):
+        validators = {"etag": "abc", "last_modified": None, "max_age": 0}
+        cache_tile("validators_test", 1, 2, 3, decoded_data={"water": {}}, validators=validators)
+        cache_file = file_helper._get_cache_entry_path("validators_test", zoom_level=1, x=2, y=3)
+        os.utime(cache_file, (time.time() - 10, time.time() - 10))
+        self.assertIsNone(get_cache_entry("validators_test", 1, 2, 3))
+        self.assertEqual(validators, get_cache_entry_validators("validators_test", 1, 2, 3))
+        decoded_data = refresh_cache_entry("validators_test", 1, 2, 3, {"etag": "def", "last_modified": None,
+                                                                          "max_age": 60})
+        self.assertEqual({"water": {}}, decoded_data)
+        self.assertEqual({"water": {}}, get_cache_entry("validators_test", 1, 2, 3))
+        self.assertEqual("def", get_cache_entry_validators("validators_test", 1, 2, 3)["etag"])
+
+    def test_expired_cache_entry_without_validators(self):
+        cache_tile("validators_test", 1, 2, 4, decoded_data={"water": {}})
+        cache_file = file_helper._get_cache_entry_path("validators_test", zoom_level=1, x=2, y=4)
+        expired = time.time() - max_cache_age_minutes * 60 - 10
+        os.utime(cache_file, (expired, expired))
+        self.assertIsNone(get_cache_entry("validators_test", 1, 2, 4))
+        self.assertFalse(os.path.isfile(cache_file))
+        self.assertIsNone(get_cache_entry_validators("validators_test", 1, 2, 4))
+
+    def test_is_tile_cached(self):
+        self.assertFalse(is_tile_cached("cached_test", 1, 2, 5))
+        cache_tile("cached_test", 1, 2, 5, decoded_data={"water": {}})
+        self.assertTrue(is_tile_cached("cached_test", 1, 2, 5))
+        cache_tile("cached_test", 1, 2, 5, decoded_data={"water": {}}, validators={"max_age": -10})
+        self.assertFalse(is_tile_cached("cached_test", 1, 2, 5))
+        cache_file = file_helper._get_cache_entry_path("cached_test", zoom_level=1, x=2, y=5)
+        self.assertTrue(os.path.isfile(cache_file))
+
+    def test_is_tile_cached_in_previous_session(self):
+        cache_tile("cached_session_test", 1, 2, 5, decoded_data={"water": {}})
+        file_helper._cache_entry_expiries.clear()
+        self.assertFalse(is_tile_cached("cached_session_test", 1, 2, 5))
+        self.assertTrue(is_tile_cached("cached_session_test", 1, 2, 5, read_files=True))
+        file_helper._cache_entry_expiries.clear()
+        self.assertIsNotNone(get_cache_entry("cached_session_test", 1, 2, 5))
+        self.assertTrue(is_tile_cached("cached_session_test", 1, 2, 5))
+
+    def test_cache_tile_concurrently(self):
+        directory = os.path.dirname(file_helper._get_cache_entry_path("concurrent_test", zoom_level=1, x=2, y=5))
+        shutil.rmtree(directory, ignore_errors=True)
+        threads = [threading.Thread(target=cache_tile, args=("concurrent_test", 1, 2, 5),
+                                    kwargs={"decoded_data": {"water": {"index": i}}}) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertIn(get_cache_entry("concurrent_test", 1, 2, 5)["water"]["index"], range(8))
+        self.assertEqual(["5.bin"], os.listdir(directory))
+
     def test_get_cached_tile_file_name(self):
         path = os.path.join(get_cache_directory(), "test", "2", "3", "4.bin")
         self.assertEqual(path, file_helper._get_cache_entry_path("test", zoom_level=2, x=3, y=4))
@@ -5,6 +5,9 @@
 import unittest
 import os
 import sys
+import threading
+import tempfile
+import sqlite3
 from ..util.tile_source import MBTilesSource
 
 
@@ -111,10 +114,134 @@ class MbtileSourceTests(unittest.TestCase):
         self.assertEqual(1, len(all_tiles))
         self.assertEqual((8586, 10642), all_tiles[0][0].coord())
 
+    def test_iter_tiles(self):
+        src = _create('uster_zh.mbtiles', directory=_sample_dir())
+        tiles = src.iter_tiles(14, tiles_to_load=[(8586, 10642), (8587, 10642)])
+        tile, data = next(tiles)
+        self.assertIn(tile.coord(), [(8586, 10642), (8587, 10642)])
+        self.assertIsNotNone(data)
+        tiles.close()
+
+    def test_tile_limit_reached(self):
+        src = _create('uster_zh.mbtiles', directory=_sample_dir())
+        limit_reached = []
+        src.tile_limit_reached.connect(lambda: limit_reached.append(True))
+        src.load_tiles(14, tiles_to_load=[(8586, 10642), (8587, 10642)], max_tiles=1)
+        self.assertEqual([True], limit_reached)
+
+    def test_existing_tiles_indexed_by_column(self):
+        path = _create_mbtiles([(2, 0, 0), (2, 0, 1), (2, 1, 1), (2, 3, 2)])
+        src = MBTilesSource(path)
+        self.assertEqual([(0, 1), (1, 1)], src.get_existing_tiles(2, [(0, 1), (1, 0), (1, 1)]))
+        self.assertEqual([0, 1], src._zoom_indexes[2].columns())
+        self.assertEqual([(3, 2)], src.get_existing_tiles(2, [(2, 2), (3, 2)]))
+        self.assertEqual([0, 1, 2, 3], src._zoom_indexes[2].columns())
+        src.close_connection()
+        self.assertEqual([0, 1, 2, 3], MBTilesSource(path)._tile_index.get(2, src._index_signature).columns())
+
+    def test_too_large_zoom_level_not_indexed(self):
+        path = _create_mbtiles([(2, 0, 0), (2, 0, 1), (2, 1, 1)])
+        src = MBTilesSource(path)
+        src._max_indexed_tiles_per_zoom = 2
+        tiles = [(0, 0), (0, 1), (1, 0)]
+        self.assertEqual(tiles, src.get_existing_tiles(2, tiles))
+        self.assertTrue(MBTilesSource(path)._tile_index.get(2, src._index_signature).too_large)
+
+    def test_sources_share_connection_pool(self):
+        src = _create('uster_zh.mbtiles', directory=_sample_dir())
+        other_src = _create('uster_zh.mbtiles', directory=_sample_dir())
+        self.assertIs(src._get_connection_pool(), other_src._get_connection_pool())
+        self.assertIs(src._get_connection_pool().metadata(), other_src._get_connection_pool().metadata())
+
+    def test_connection_pool_closed_with_last_source(self):
+        path = _create_mbtiles([(2, 0, 0)])
+        src = MBTilesSource(path)
+        other_src = MBTilesSource(path)
+        connection = src._get_connection_pool().connection()
+        other_src._get_connection_pool()
+        src.close_connection()
+        self.assertEqual(1, connection.execute("select count(*) from tiles").fetchone()[0])
+        other_src.close_connection()
+        with self.assertRaises(sqlite3.ProgrammingError):
+            connection.execute("select count(*) from tiles")
+        self.assertEqual(1, src._get_from_db("select count(*) from tiles")[0][0])
+
+    def test_outdated_connection_pool_replaced(self):
+        path = _create_mbtiles([(2, 0, 0)])
+        src = MBTilesSource(path)
+        pool = src._get_connection_pool()
+        conn = sqlite3.connect(path)
+        conn.execute("INSERT INTO tiles VALUES (2, 0, 1, ?)", (sqlite3.Binary(b"data"),))
+        conn.commit()
+        conn.close()
+        os.utime(path, (0, 0))
+        other_src = MBTilesSource(path)
+        self.assertIsNot(pool, other_src._get_connection_pool())
+        self.assertEqual(2, other_src._get_from_db("select count(*) from tiles")[0][0])
+        connection = pool.connection()
+        src.close_connection()
+        with self.assertRaises(sqlite3.ProgrammingError):
+            connection.execute("select count(*) from tiles")
+
+    def test_connection_per_thread(self):
+        src = _create('uster_zh.mbtiles', directory=_sample_dir())
+        connections = []
+
+        def load():
+            src.load_tiles(14, tiles_to_load=[(8586, 10642)])
+            connections.append(src._get_connection_pool().connection())
+
+        thread = threading.Thread(target=load)
+        thread.start()
+        thread.join()
+        self.assertIsNot(src._get_connection_pool().connection(), connections[0])
+        self.assertTrue(src._get_connection_pool().connection().execute("PRAGMA query_only").fetchone()[0])
+
+    def test_load_tiles_parallel(self):
+        path = _get_path('uster_zh.mbtiles', directory=_sample_dir())
+        tiles_to_load = [(x, y) for x in range(8586, 8591) for y in range(10642, 10648)]
+        tiles = MBTilesSource(path).load_tiles(14, tiles_to_load=tiles_to_load)
+        parallel_tiles = MBTilesSource(path, nr_of_read_connections=3).load_tiles(14, tiles_to_load=tiles_to_load)
+        self.assertEqual(sorted(t[0].coord() for t in tiles), sorted(t[0].coord() for t in parallel_tiles))
+
+    def test_deduplicated_schema(self):
+        path = os.path.join(tempfile.mkdtemp(), "deduplicated.mbtiles")
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE metadata (name text, value text)")
+        conn.execute("CREATE TABLE map (zoom_level integer, tile_column integer, tile_row integer, tile_id text)")
+        conn.execute("CREATE TABLE images (tile_data blob, tile_id text)")
+        conn.execute("CREATE VIEW tiles AS SELECT zoom_level, tile_column, tile_row, tile_data "
+                     "FROM map JOIN images ON images.tile_id = map.tile_id")
+        conn.executemany("INSERT INTO map VALUES (?, ?, ?, ?)", [(2, 0, 0, "ocean"), (2, 0, 1, "ocean"),
+                                                                (2, 1, 1, "land")])
+        conn.executemany("INSERT INTO images VALUES (?, ?)", [(sqlite3.Binary(b"ocean"), "ocean"),
+                                                              (sqlite3.Binary(b"land"), "land")])
+        conn.commit()
+        conn.close()
+        src = MBTilesSource(path)
+        tiles = src.load_tiles(2, tiles_to_load=[(0, 0), (0, 1), (1, 1)])
+        payload_ids = dict((t.coord(), t.payload_id) for t, data in tiles)
+        self.assertEqual({(0, 0): "ocean", (0, 1): "ocean", (1, 1): "land"}, payload_ids)
+
     def test_where_clause(self):
         src = _create('uster_zh.mbtiles', directory=_sample_dir())
-        where_clause = src._get_where_clause(tiles_to_load=[], zoom_level=14)
-        self.assertEqual('WHERE zoom_level = 14 AND tile_column || ";" || tile_row IN ()', where_clause)
+        where_clause, parameters = src._get_where_clause(tiles_to_load=[], zoom_level=14)
+        self.assertEqual('WHERE zoom_level = ?', where_clause)
+        self.assertEqual((14,), parameters)
+
+    def test_where_clause_bounding_box(self):
+        src = _create('uster_zh.mbtiles', directory=_sample_dir())
+        where_clause, parameters = src._get_where_clause(tiles_to_load=[(8586, 10642), (8588, 10640)], zoom_level=14)
+        self.assertEqual('WHERE zoom_level = ? AND tile_column BETWEEN ? AND ? AND tile_row BETWEEN ? AND ?',
+                         where_clause)
+        self.assertEqual((14, 8586, 8588, 10640, 10642), parameters)
+
+    def test_load_tiles_outside_of_bounding_box_ignored(self):
+        src = _create('uster_zh.mbtiles', directory=_sample_dir())
+        tiles_to_load = [(8586, 10642), (8588, 10644)]
+        loaded_tiles = set(t[0].coord() for t in src.load_tiles(14, tiles_to_load=tiles_to_load))
+        self.assertIn((8586, 10642), loaded_tiles)
+        self.assertTrue(loaded_tiles.issubset(tiles_to_load))
 
 
 def _sample_dir():
@@ -129,6 +256,20 @@ def _get_path(mbtiles_file, directory=None):
     return path
 
 
+def _create_mbtiles(tiles):
+    """
+     * Creates a file with the tiles, specified as tuples (zoom_level, tile_column, tile_row)
+    """
+    path = os.path.join(tempfile.mkdtemp(), "test.mbtiles")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE metadata (name text, value text)")
+    conn.execute("CREATE TABLE tiles (zoom_level integer, tile_column integer, tile_row integer, tile_data blob)")
+    conn.executemany("INSERT INTO tiles VALUES (?, ?, ?, ?)", [t + (sqlite3.Binary(b"data"),) for t in tiles])
+    conn.commit()
+    conn.close()
+    return path
+
+
 def _create(mbtiles_file, directory=None):
     path = _get_path(mbtiles_file=mbtiles_file, directory=directory)
     return MBTilesSource(path)
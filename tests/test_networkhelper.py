@@ -1,6 +1,36 @@
 import unittest
+import threading
+try:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+except ImportError:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
 from util.network_helper import *
 
+_TILE_CONTENT = b"tile content"
+_ETAG = '"v1"'
+
+
+class _TileRequestHandler(BaseHTTPRequestHandler):
+    """
+     * Stand-in for a tile server which supports conditional requests by ETag
+    """
+
+    def do_GET(self):
+        if self.headers.get("If-None-Match") == _ETAG:
+            self.send_response(304)
+            self.send_header("ETag", _ETAG)
+            self.end_headers()
+        else:
+            self.send_response(200)
+            self.send_header("ETag", _ETAG)
+            self.send_header("Cache-Control", "max-age=60")
+            self.send_header("Content-Length", str(len(_TILE_CONTENT)))
+            self.end_headers()
+            self.wfile.write(_TILE_CONTENT)
+
+    def log_message(self, format, *args):
+        pass
+
 
 class NetworkHelperTests(unittest.TestCase):
     """
@@ -9,11 +39,16 @@ class NetworkHelperTests(unittest.TestCase):
 
     @classmethod
     def setUpClass(cls):
-        pass
+        cls.server = HTTPServer(("localhost", 0), _TileRequestHandler)
+        cls.server_thread = threading.Thread(target=cls.server.serve_forever)
+        cls.server_thread.daemon = True
+        cls.server_thread.start()
+        cls.tile_url = "http://localhost:{}/0/0/0.pbf".format(cls.server.server_port)
 
     @classmethod
     def tearDownClass(cls):
-        pass
+        cls.server.shutdown()
+        cls.server.server_close()
 
     def test_url_exists(self):
         exists, error, _ = url_exists("https://travis-ci.org/")
@@ -23,3 +58,62 @@ class NetworkHelperTests(unittest.TestCase):
     def test_url_exists_not(self):
         exists, error, _ = url_exists("https://traaadsfadsfadssfdsfdsfdsvis-ci.org/")
         self.assertFalse(exists)
+
+    def test_load_tiles_with_validators(self):
+        results = load_tiles_async([(self.tile_url, 0, 0)])
+        self.assertEqual(1, len(results))
+        coord, content, validators = results[0]
+        self.assertEqual((0, 0), coord)
+        self.assertEqual(_TILE_CONTENT, content)
+        self.assertEqual(_ETAG, validators["etag"])
+        self.assertEqual(60, validators["max_age"])
+
+    def test_load_tiles_not_modified(self):
+        validators = {"etag": _ETAG, "last_modified": None, "max_age": 60}
+        results = load_tiles_async([(self.tile_url, 0, 0)], validators_by_tile={(0, 0): validators})
+        self.assertEqual(1, len(results))
+        coord, content, new_validators = results[0]
+        self.assertIsNone(content)
+        self.assertEqual(_ETAG, new_validators["etag"])
+
+    def test_load_tiles_modified(self):
+        validators = {"etag": '"v0"', "last_modified": None, "max_age": 60}
+        results = load_tiles_async([(self.tile_url, 0, 0)], validators_by_tile={(0, 0): validators})
+        self.assertEqual(_TILE_CONTENT, results[0][1])
+
+    def test_load_tiles_statistics(self):
+        statistics = NetworkStatistics()
+        list(iter_tiles_async([(self.tile_url, 0, 0), (self.tile_url, 1, 0)], statistics=statistics))
+        summary = statistics.summary()
+        self.assertEqual(["localhost"], list(summary["hosts"].keys()))
+        self.assertEqual(2, summary["total"]["requests"])
+        self.assertEqual(2 * len(_TILE_CONTENT), summary["total"]["bytes_received"])
+        self.assertEqual({200: 2}, summary["total"]["status_codes"])
+
+    def test_statistics_summary(self):
+        statistics = NetworkStatistics()
+        statistics.add_request("a.example.com", 200, duration=0.5, time_to_first_byte=0.1, bytes_transferred=50,
+                               bytes_received=100)
+        statistics.add_request("a.example.com", None, duration=1.5, time_to_first_byte=0.3, bytes_transferred=None,
+                               bytes_received=0, error=1)
+        statistics.add_request("b.example.com", 304, duration=1.0, time_to_first_byte=1.0, bytes_transferred=None,
+                               bytes_received=0)
+        summary = statistics.summary()
+        host_a = summary["hosts"]["a.example.com"]
+        self.assertEqual(2, host_a["requests"])
+        self.assertEqual(0.5, host_a["error_rate"])
+        self.assertAlmostEqual(0.2, host_a["avg_time_to_first_byte"])
+        self.assertEqual(0.5, host_a["compression_ratio"])
+        self.assertEqual(25, host_a["throughput"])
+        self.assertEqual(1, summary["hosts"]["b.example.com"]["not_modified"])
+        self.assertEqual(3, summary["total"]["requests"])
+        self.assertEqual(1.0, summary["total"]["max_time_to_first_byte"])
+        self.assertEqual({200: 1, 304: 1}, summary["total"]["status_codes"])
+
+    def test_iter_tiles(self):
+        tiles = iter_tiles_async([(self.tile_url, 0, 0), (self.tile_url, 1, 0)])
+        first_coord, first_content, _ = next(tiles)
+        self.assertEqual(_TILE_CONTENT, first_content)
+        remaining = list(tiles)
+        self.assertEqual(1, len(remaining))
+        self.assertEqual({(0, 0), (1, 0)}, {first_coord, remaining[0][0]})
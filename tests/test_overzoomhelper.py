@@ -0,0 +1,93 @@
+import unittest
+from util.overzoom_helper import get_overzoomed_data
+from util.feature_helper import TileAffine
+from util.tile_helper import VectorTile
+
+_TILE_EXTENT = 4096
+
+
+def _layer(*features):
+    return {"extent": _TILE_EXTENT, "features": list(features)}
+
+
+def _feature(geo_type, geometry):
+    return {"type": geo_type, "geometry": geometry, "properties": {"name": "test"}}
+
+
+class OverzoomHelperTests(unittest.TestCase):
+    """
+    Tests for util.overzoom_helper
+    """
+
+    def setUp(self):
+        self.parent = VectorTile("xyz", 14, 8586, 5741)
+        # the lower left child, as the y axis of the tile-local coordinates points up
+        self.child = VectorTile("xyz", 15, 2 * 8586, 2 * 5741 + 1)
+
+    def test_not_a_child(self):
+        with self.assertRaises(RuntimeError):
+            get_overzoomed_data({}, self.child, self.parent)
+
+    def test_point_rescaled(self):
+        data = get_overzoomed_data({"poi": _layer(_feature(1, [[1000, 1500]]))}, self.parent, self.child)
+        self.assertEqual([[2000, 3000]], data["poi"]["features"][0]["geometry"])
+        expected = TileAffine(self.parent.extent, _TILE_EXTENT).map([1000, 1500])
+        actual = TileAffine(self.child.extent, _TILE_EXTENT).map([2000, 3000])
+        self.assertAlmostEqual(expected[0], actual[0], delta=1)
+        self.assertAlmostEqual(expected[1], actual[1], delta=1)
+
+    def test_features_outside_dropped(self):
+        data = get_overzoomed_data({"poi": _layer(_feature(1, [[3000, 3000]])),
+                                    "water": _layer(_feature(1, [[10, 10]]), _feature(1, [[3000, 10]]))},
+                                   self.parent, self.child)
+        self.assertEqual(["water"], list(data.keys()))
+        self.assertEqual(1, len(data["water"]["features"]))
+
+    def test_line_clipped(self):
+        line = [[0, 1000], [4000, 1000]]
+        data = get_overzoomed_data({"road": _layer(_feature(2, line))}, self.parent, self.child)
+        clipped = data["road"]["features"][0]["geometry"]
+        self.assertEqual([0, 2000], clipped[0])
+        self.assertEqual([_TILE_EXTENT + _TILE_EXTENT // 64, 2000], clipped[1])
+
+    def test_polygon_clipped(self):
+        ring = [[-100, -100], [4200, -100], [4200, 4200], [-100, 4200], [-100, -100]]
+        data = get_overzoomed_data({"landuse": _layer(_feature(3, [ring]))}, self.parent, self.child)
+        rings = data["landuse"]["features"][0]["geometry"]
+        self.assertEqual(1, len(rings))
+        xs = [c[0] for c in rings[0]]
+        ys = [c[1] for c in rings[0]]
+        buffer_size = _TILE_EXTENT // 64
+        self.assertEqual((-buffer_size, _TILE_EXTENT + buffer_size), (min(xs), max(xs)))
+        self.assertEqual((-buffer_size, _TILE_EXTENT + buffer_size), (min(ys), max(ys)))
+        self.assertEqual(rings[0][0], rings[0][-1])
+
+    def test_geojson_layer(self):
+        extent = self.child.extent
+        inside = [(extent[0] + extent[2]) / 2, (extent[1] + extent[3]) / 2]
+        outside = [extent[2] + (extent[2] - extent[0]), inside[1]]
+        properties = {"_col": self.parent.column, "_row": self.parent.row, "_zoom": self.parent.zoom_level}
+        layer = {
+            "isGeojson": True,
+            "Point": [{"geometry": {"type": "Point", "coordinates": c}, "properties": dict(properties)}
+                      for c in [inside, outside]],
+            "LineString": [],
+            "Polygon": []
+        }
+        data = get_overzoomed_data({"poi": layer}, self.parent, self.child)
+        points = data["poi"]["Point"]
+        self.assertEqual(1, len(points))
+        self.assertEqual(inside, points[0]["geometry"]["coordinates"])
+        self.assertEqual((self.child.column, self.child.row, 15),
+                         (points[0]["properties"]["_col"], points[0]["properties"]["_row"],
+                          points[0]["properties"]["_zoom"]))
+        self.assertEqual(self.parent.column, layer["Point"][0]["properties"]["_col"])
+
+
+def suite():
+    s = unittest.makeSuite(OverzoomHelperTests, 'test')
+    return s
+
+
+if __name__ == "__main__":
+    unittest.main()
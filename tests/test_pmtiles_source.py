@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+#
+# This code is licensed under the GPL 2.0 license.
+#
+import unittest
+import os
+import struct
+import shutil
+import tempfile
+import threading
+import zlib
+try:
+    import simplejson as json
+except ImportError:
+    import json
+from util.tile_source import PMTilesSource
+from util.pmtiles_helper import zxy_to_tile_id, Directory
+
+
+def _gzip(data):
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _varint(value):
+    result = bytearray()
+    while value >= 0x80:
+        result.append((value & 0x7f) | 0x80)
+        value >>= 7
+    result.append(value)
+    return bytes(result)
+
+
+def _serialize_directory(entries):
+    """
+    :param entries: A list of tuples (tile_id, offset, length, run_length) sorted by tile_id
+    """
+    data = _varint(len(entries))
+    last_id = 0
+    for tile_id, _, _, _ in entries:
+        data += _varint(tile_id - last_id)
+        last_id = tile_id
+    for _, _, _, run_length in entries:
+        data += _varint(run_length)
+    for _, _, length, _ in entries:
+        data += _varint(length)
+    for i, (_, offset, _, _) in enumerate(entries):
+        if i > 0 and offset == entries[i - 1][1] + entries[i - 1][2]:
+            data += _varint(0)
+        else:
+            data += _varint(offset + 1)
+    return _gzip(data)
+
+
+def create_pmtiles(path, tiles, metadata, leaf_size=None):
+    """
+     * Writes a PMTiles v3 archive with gzip compressed directories and metadata
+    :param tiles: A dict {(zoom, col, row): data} with the tiles in xyz scheme
+    :param leaf_size: If set, the entries are split into leaf directories of this size
+    """
+    tile_data = b""
+    offsets_by_data = {}
+    entries = []
+    for tile_id, data in sorted((zxy_to_tile_id(*zxy), data) for zxy, data in tiles.items()):
+        if data not in offsets_by_data:
+            offsets_by_data[data] = len(tile_data)
+            tile_data += data
+        offset = offsets_by_data[data]
+        last = entries[-1] if entries else None
+        if last and last[1] == offset and last[0] + last[3] == tile_id:
+            entries[-1] = (last[0], last[1], last[2], last[3] + 1)
+        else:
+            entries.append((tile_id, offset, len(data), 1))
+
+    leaf_directories = b""
+    if leaf_size:
+        root_entries = []
+        for i in range(0, len(entries), leaf_size):
+            leaf = _serialize_directory(entries[i:i + leaf_size])
+            root_entries.append((entries[i][0], len(leaf_directories), len(leaf), 0))
+            leaf_directories += leaf
+        root = _serialize_directory(root_entries)
+    else:
+        root = _serialize_directory(entries)
+    metadata = _gzip(json.dumps(metadata).encode("utf-8"))
+
+    zooms = [zxy[0] for zxy in tiles]
+    root_offset = 127
+    metadata_offset = root_offset + len(root)
+    leaf_offset = metadata_offset + len(metadata)
+    data_offset = leaf_offset + len(leaf_directories)
+    header = struct.pack("<7sB11Q6B4iB2i", b"PMTiles", 3,
+                         root_offset, len(root),
+                         metadata_offset, len(metadata),
+                         leaf_offset, len(leaf_directories),
+                         data_offset, len(tile_data),
+                         len(tiles), len(entries), len(offsets_by_data),
+                         1, 2, 1, 1, min(zooms), max(zooms),
+                         int(8.5 * 1e7), int(47.3 * 1e7), int(8.8 * 1e7), int(47.5 * 1e7),
+                         min(zooms), int(8.6 * 1e7), int(47.4 * 1e7))
+    with open(path, "wb") as f:
+        f.write(header + root + metadata + leaf_directories + tile_data)
+
+
+class PMTilesSourceTests(unittest.TestCase):
+    """
+    Tests for PMTilesSource
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "test.pmtiles")
+        self.tiles = {}
+        for col in range(4):
+            for row in range(4):
+                self.tiles[(2, col, row)] = "{};{}".format(col, row).encode("utf-8")
+        self.tiles[(3, 0, 0)] = b"empty"
+        self.tiles[(3, 0, 1)] = b"empty"
+        self.tiles[(3, 7, 7)] = b"empty"
+        self.metadata = {"name": "pmtiles_test", "attribution": "test", "vector_layers": [{"id": "water"}]}
+        create_pmtiles(self.path, self.tiles, self.metadata)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_tile_ids(self):
+        self.assertEqual(0, zxy_to_tile_id(0, 0, 0))
+        self.assertEqual([1, 2, 3, 4], [zxy_to_tile_id(1, x, y) for x, y in [(0, 0), (0, 1), (1, 1), (1, 0)]])
+        self.assertEqual(5, zxy_to_tile_id(2, 0, 0))
+        self.assertEqual(21, zxy_to_tile_id(3, 0, 0))
+
+    def test_directory_find(self):
+        directory = Directory(tile_ids=[5, 10], run_lengths=[2, 0], lengths=[3, 4], offsets=[0, 100])
+        self.assertIsNone(directory.find(4))
+        self.assertEqual((0, 3, False), directory.find(6))
+        self.assertIsNone(directory.find(7))
+        self.assertEqual((100, 4, True), directory.find(12))
+
+    def test_non_existing_file(self):
+        with self.assertRaises(RuntimeError):
+            PMTilesSource(os.path.join(self.directory, "doesnotexist.pmtiles"))
+
+    def test_invalid_file(self):
+        path = os.path.join(self.directory, "invalid.pmtiles")
+        with open(path, "wb") as f:
+            f.write(b"\x00" * 200)
+        with self.assertRaises(RuntimeError):
+            PMTilesSource(path)
+
+    def test_metadata(self):
+        src = PMTilesSource(self.path)
+        self.assertEqual("pmtiles_test", src.name())
+        self.assertEqual("test", src.attribution())
+        self.assertEqual([{"id": "water"}], src.vector_layers())
+        self.assertEqual("xyz", src.scheme())
+        self.assertEqual(2, src.min_zoom())
+        self.assertEqual(3, src.max_zoom())
+        self.assertEqual([8.5, 47.3, 8.8, 47.5], src.bounds())
+
+    def test_load_tiles(self):
+        src = PMTilesSource(self.path)
+        tiles = src.load_tiles(2, tiles_to_load=[(0, 0), (1, 2), (3, 3), (4, 4)])
+        data_by_coord = dict((t.coord(), data) for t, data in tiles)
+        self.assertEqual({(0, 0): b"0;0", (1, 2): b"1;2", (3, 3): b"3;3"}, data_by_coord)
+
+    def test_load_tiles_with_run_length(self):
+        src = PMTilesSource(self.path)
+        tiles = src.load_tiles(3, tiles_to_load=[(0, 0), (0, 1), (1, 1), (7, 7)])
+        data_by_coord = dict((t.coord(), data) for t, data in tiles)
+        self.assertEqual({(0, 0): b"empty", (0, 1): b"empty", (7, 7): b"empty"}, data_by_coord)
+        self.assertEqual(1, len(set(t.payload_id for t, _ in tiles)))
+
+    def test_contiguous_tiles_read_once(self):
+        src = PMTilesSource(self.path)
+        tiles_to_load = [(col, row) for col in range(4) for row in range(4)]
+        src.get_existing_tiles(2, tiles_to_load)
+        reads = []
+        original_read = src._read
+        src._read = lambda offset, length: reads.append(length) or original_read(offset, length)
+        tiles = src.load_tiles(2, tiles_to_load=tiles_to_load)
+        self.assertEqual(16, len(tiles))
+        self.assertEqual(1, len(reads))
+
+    def test_leaf_directories(self):
+        create_pmtiles(self.path, self.tiles, self.metadata, leaf_size=4)
+        src = PMTilesSource(self.path)
+        tiles = src.load_tiles(2, tiles_to_load=[(0, 0)])
+        self.assertEqual(1, len(tiles))
+        self.assertEqual(b"0;0", tiles[0][1])
+        # only the root and the covering leaf have been read
+        self.assertEqual(2, len(src._directories))
+        tiles = src.load_tiles(2, tiles_to_load=[(col, row) for col in range(4) for row in range(4)])
+        self.assertEqual(16, len(tiles))
+
+    def test_get_existing_tiles(self):
+        src = PMTilesSource(self.path)
+        existing = src.get_existing_tiles(3, [(0, 0), (0, 1), (1, 0), (7, 7), (8, 8)])
+        self.assertEqual([(0, 0), (0, 1), (7, 7)], existing)
+
+    def test_get_indexed_tiles(self):
+        src = PMTilesSource(self.path)
+        tiles = [(0, 0), (0, 1), (1, 0), (7, 7), (8, 8)]
+        self.assertIsNone(src.get_indexed_tiles(3, tiles))
+        src.get_existing_tiles(3, tiles)
+        self.assertEqual([(0, 0), (0, 1), (7, 7)], src.get_indexed_tiles(3, tiles))
+
+    def test_close_connection(self):
+        src = PMTilesSource(self.path)
+        src.load_tiles(2, tiles_to_load=[(0, 0)])
+        src.close_connection()
+        tiles = src.load_tiles(2, tiles_to_load=[(1, 1)])
+        self.assertEqual(b"1;1", tiles[0][1])
+
+    def test_close_connection_while_loading(self):
+        src = PMTilesSource(self.path)
+        src._max_cached_directories = 1
+        tiles_to_load = [(col, row) for col in range(4) for row in range(4)]
+        errors = []
+
+        def load():
+            try:
+                for _ in range(50):
+                    self.assertEqual(16, len(src.load_tiles(2, tiles_to_load=tiles_to_load)))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=load) for _ in range(2)]
+        for t in threads:
+            t.start()
+        while any(t.is_alive() for t in threads):
+            src.close_connection()
+        for t in threads:
+            t.join()
+        self.assertEqual([], errors)
+
+
+def suite():
+    s = unittest.makeSuite(PMTilesSourceTests, 'test')
+    return s
+
+
+if __name__ == "__main__":
+    unittest.main()
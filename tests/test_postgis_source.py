@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+#
+# This code is licensed under the GPL 2.0 license.
+#
+"""
+ * The tests require a PostGIS database, e.g. the postgis service of docker/docker-compose.yml.
+ * The database is configured with the environment variables VTR_POSTGIS_HOST, VTR_POSTGIS_PORT, VTR_POSTGIS_USER,
+   VTR_POSTGIS_PASSWORD and VTR_POSTGIS_DATABASE. The tests are skipped, if the database isn't available.
+"""
+import unittest
+import os
+import copy
+try:
+    import psycopg2
+except ImportError:
+    psycopg2 = None
+from util.tile_source import PostGISSource
+from util.connection import POSTGIS_CONNECTION_TEMPLATE
+
+_TABLE = "vtr_test_points"
+
+
+def _get_connection():
+    connection = copy.deepcopy(POSTGIS_CONNECTION_TEMPLATE)
+    connection["name"] = "postgis_test"
+    connection["host"] = os.environ.get("VTR_POSTGIS_HOST", "localhost")
+    connection["port"] = int(os.environ.get("VTR_POSTGIS_PORT", 5432))
+    connection["username"] = os.environ.get("VTR_POSTGIS_USER", "postgres")
+    connection["password"] = os.environ.get("VTR_POSTGIS_PASSWORD", "postgres")
+    connection["database"] = os.environ.get("VTR_POSTGIS_DATABASE", "postgres")
+    connection["tables"] = [_TABLE]
+    return connection
+
+
+def _connect():
+    connection = _get_connection()
+    return psycopg2.connect(host=connection["host"],
+                            port=connection["port"],
+                            user=connection["username"],
+                            password=connection["password"],
+                            dbname=connection["database"],
+                            connect_timeout=3)
+
+
+class PostGISSourceTests(unittest.TestCase):
+    """
+    Tests for PostGISSource
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        if psycopg2 is None:
+            raise unittest.SkipTest("psycopg2 is not installed")
+        try:
+            conn = _connect()
+        except psycopg2.Error as e:
+            raise unittest.SkipTest("PostGIS is not available: {}".format(e))
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute("CREATE EXTENSION IF NOT EXISTS postgis")
+                cur.execute("DROP TABLE IF EXISTS {}".format(_TABLE))
+                cur.execute("CREATE TABLE {} (id serial PRIMARY KEY, name text, geom geometry(Point, 4326))"
+                            .format(_TABLE))
+                cur.execute("CREATE INDEX ON {} USING gist (geom)".format(_TABLE))
+                cur.execute("INSERT INTO {} (name, geom) VALUES "
+                            "('uster', ST_SetSRID(ST_MakePoint(8.72, 47.35), 4326)), "
+                            "('rapperswil', ST_SetSRID(ST_MakePoint(8.82, 47.22), 4326))".format(_TABLE))
+                cur.execute("ANALYZE {}".format(_TABLE))
+        conn.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        conn = _connect()
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute("DROP TABLE IF EXISTS {}".format(_TABLE))
+        conn.close()
+
+    def setUp(self):
+        self.source = PostGISSource(_get_connection())
+
+    def tearDown(self):
+        self.source.close_connection()
+
+    def test_vector_layers(self):
+        layers = self.source.vector_layers()
+        self.assertEqual(1, len(layers))
+        self.assertEqual(_TABLE, layers[0]["id"])
+        self.assertEqual(["id", "name"], list(layers[0]["fields"].keys()))
+
+    def test_bounds(self):
+        bounds = self.source.bounds()
+        self.assertAlmostEqual(8.72, bounds[0], places=1)
+        self.assertAlmostEqual(47.35, bounds[3], places=1)
+
+    def test_load_tiles(self):
+        # tile of Uster on zoom level 10 in xyz scheme and a tile without features
+        tiles = self.source.load_tiles(10, tiles_to_load=[(536, 358), (0, 0)])
+        self.assertEqual(1, len(tiles))
+        tile, data = tiles[0]
+        self.assertEqual((536, 358), tile.coord())
+        self.assertIn(_TABLE.encode("utf-8"), data)
+        self.assertIn(b"uster", data)
+
+    def test_load_tiles_concurrently(self):
+        tiles_to_load = [(col, row) for col in range(4) for row in range(4)]
+        tiles = self.source.load_tiles(2, tiles_to_load=tiles_to_load)
+        self.assertEqual([(2, 1)], [t.coord() for t, _ in tiles])
+
+    def test_load_tiles_after_close(self):
+        self.source.load_tiles(10, tiles_to_load=[(536, 358)])
+        self.source.close_connection()
+        tiles = self.source.load_tiles(10, tiles_to_load=[(536, 358)])
+        self.assertEqual(1, len(tiles))
+
+    def test_query_error_raised(self):
+        with self.assertRaises(RuntimeError):
+            self.source._execute("SELECT * FROM vtr_not_existing_table")
+
+
+def suite():
+    s = unittest.makeSuite(PostGISSourceTests, 'test')
+    return s
+
+
+if __name__ == "__main__":
+    unittest.main()
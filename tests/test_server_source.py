@@ -28,15 +28,31 @@ class ServerSourceTests(unittest.TestCase):
         print(ctx.exception)
         self.assertTrue(error in ctx.exception)
 
-    @mock.patch("util.tile_source.TileJSON")
-    @mock.patch("util.tile_source.load_tiles_async", return_value=[((1, 2), 'data')])
+    @mock.patch("util.tile_source.get_tile_json")
+    @mock.patch("util.tile_source.get_cache_entry_validators", return_value=None)
+    @mock.patch("util.tile_source.iter_tiles_async", return_value=[((1, 2), 'data', None)])
     @mock.patch("util.tile_source.url_exists", return_value=(True, None, "https://localhost"))
-    def test_load(self, mock_url_exists, mock_load_tiles_async, mock_tile_json):
+    def test_load(self, mock_url_exists, mock_iter_tiles_async, mock_validators, mock_tile_json):
         src = ServerSource("https://localhost")
         mock_url_exists.assert_called_with("https://localhost")
         tiles = src.load_tiles(14, [(1, 1)])
         self.assertEqual(1, len(tiles))
 
+    @mock.patch("util.tile_source.get_tile_json")
+    @mock.patch("util.tile_source.refresh_cache_entry", return_value={"water": {}})
+    @mock.patch("util.tile_source.get_cache_entry_validators", return_value={"etag": "abc"})
+    @mock.patch("util.tile_source.iter_tiles_async", return_value=[((1, 1), None, {"etag": "abc"})])
+    @mock.patch("util.tile_source.url_exists", return_value=(True, None, "https://localhost"))
+    def test_load_not_modified(self, mock_url_exists, mock_iter_tiles_async, mock_validators, mock_refresh,
+                               mock_tile_json):
+        src = ServerSource("https://localhost")
+        tiles = src.load_tiles(14, [(1, 1)])
+        self.assertEqual(1, len(tiles))
+        tile, data = tiles[0]
+        self.assertIsNone(data)
+        self.assertEqual({"water": {}}, tile.decoded_data)
+        self.assertEqual({(1, 1): {"etag": "abc"}}, mock_iter_tiles_async.call_args[1]["validators_by_tile"])
+
 
 def suite():
     s = unittest.makeSuite(ServerSourceTests, 'test')
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+#
+# This code is licensed under the GPL 2.0 license.
+#
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+try:
+    import simplejson as json
+except ImportError:
+    import json
+from util.tile_index import ZoomIndex, TileIndex
+from util.tile_helper import TileRange
+from util.tile_source import DirectorySource
+
+
+class TileIndexTests(unittest.TestCase):
+    """
+    Tests for util.tile_index
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_zoom_index_ranges(self):
+        zoom_index = ZoomIndex.from_tiles([(1, 3), (1, 1), (1, 2), (1, 7), (2, 5), (1, 2)])
+        self.assertEqual({"1": [[1, 3], [7, 7]], "2": [[5, 5]]}, zoom_index.to_json())
+        self.assertEqual(5, zoom_index.nr_of_tiles())
+
+    def test_zoom_index_filter(self):
+        zoom_index = ZoomIndex.from_tiles([(1, 1), (1, 2), (1, 3), (1, 7), (2, 5)])
+        self.assertEqual([(1, 2), (1, 7), (2, 5)], zoom_index.filter([(0, 1), (1, 2), (1, 4), (1, 7), (2, 5), (2, 6)]))
+
+    def test_zoom_index_tile_range_intersection(self):
+        zoom_index = ZoomIndex.from_tiles([(1, 1), (1, 2), (1, 3), (1, 7), (2, 5)])
+        self.assertEqual([(1, 2), (1, 3), (2, 5)], sorted(TileRange(0, 2, 2, 5).intersection(zoom_index)))
+
+    def test_zoom_index_columns_added(self):
+        zoom_index = ZoomIndex.from_tiles([(1, 1)])
+        self.assertEqual([2, 4], zoom_index.get_missing_columns([1, 2, 4]))
+        self.assertTrue(zoom_index.add_sorted_tiles(columns=[2, 3, 4], tiles=[(2, 5), (4, 1), (4, 2)]))
+        self.assertEqual([], zoom_index.get_missing_columns([1, 2, 3, 4]))
+        self.assertEqual([(2, 5), (4, 2)], zoom_index.filter([(2, 5), (3, 5), (4, 2)]))
+
+    def test_zoom_index_too_large(self):
+        zoom_index = ZoomIndex.from_tiles([(1, 1)])
+        self.assertFalse(zoom_index.add_sorted_tiles(columns=[2], tiles=[(2, 1), (2, 2)], max_tiles=2))
+        self.assertTrue(zoom_index.too_large)
+        self.assertEqual([2], zoom_index.get_missing_columns([2]))
+
+    def test_tile_index_persisted(self):
+        path = os.path.join(self.directory, "index")
+        TileIndex(path).put(14, [1, 2], ZoomIndex.from_tiles([(5, 6)]))
+        self.assertEqual(["14.json"], os.listdir(path))
+        tile_index = TileIndex(path)
+        self.assertTrue(tile_index.get(14, [1, 2]).contains(5, 6))
+        self.assertIsNone(tile_index.get(14, [1, 3]))
+        self.assertIsNone(tile_index.get(13, [1, 2]))
+
+    def test_tile_index_saved_after_interval(self):
+        path = os.path.join(self.directory, "index")
+        tile_index = TileIndex(path)
+        tile_index.put(14, [1], ZoomIndex.from_tiles([(5, 6)]))
+        tile_index.put(14, [1], ZoomIndex.from_tiles([(5, 6), (5, 7)]))
+        tile_index.put(15, [1], ZoomIndex.from_tiles([(10, 12)]))
+        self.assertFalse(TileIndex(path).get(14, [1]).contains(5, 7))
+        self.assertIsNone(TileIndex(path).get(15, [1]))
+        tile_index.flush()
+        self.assertTrue(TileIndex(path).get(14, [1]).contains(5, 7))
+        self.assertTrue(TileIndex(path).get(15, [1]).contains(10, 12))
+
+    def test_tile_index_fallback_path(self):
+        path = os.path.join(self.directory, "a", "index")
+        other_path = os.path.join(self.directory, "b", "index")
+        self.assertNotEqual(TileIndex(path)._fallback_path, TileIndex(other_path)._fallback_path)
+        self.assertEqual(TileIndex(path)._fallback_path, TileIndex(path)._fallback_path)
+
+    def test_directory_source_existing_tiles(self):
+        with open(os.path.join(self.directory, "metadata.json"), "w") as f:
+            json.dump({"name": "tile_index_test", "bounds": [0, 0, 1, 1], "vector_layers": []}, f)
+        for col, row in [(3, 4), (3, 5), (4, 5)]:
+            column_dir = os.path.join(self.directory, "10", str(col))
+            if not os.path.isdir(column_dir):
+                os.makedirs(column_dir)
+            with open(os.path.join(column_dir, "{}.pbf".format(row)), "wb") as f:
+                f.write(b"data")
+        src = DirectorySource(self.directory)
+        tiles = [(x, y) for x in range(2, 6) for y in range(3, 7)]
+        self.assertIsNone(src.get_indexed_tiles(10, tiles))
+        self.assertEqual([(3, 4), (3, 5), (4, 5)], src.get_existing_tiles(10, tiles))
+        self.assertEqual([(3, 4), (3, 5), (4, 5)], src.get_indexed_tiles(10, tiles))
+        self.assertTrue(os.path.isfile(os.path.join(self.directory, ".vtr_index", "10.json")))
+        self.assertEqual([2, 3, 4, 5], src._zoom_indexes[10].columns())
+        zoom_index = TileIndex(os.path.join(self.directory, ".vtr_index")).get(10, [])
+        self.assertFalse(zoom_index.is_indexed(3, [None]))
+        self.assertTrue(zoom_index.is_indexed(2, [None]))
+
+
+def suite():
+    s = unittest.makeSuite(TileIndexTests, 'test')
+    return s
+
+
+# run all tests using unittest skipping nose or testplugin
+def run_all():
+    unittest.TextTestRunner(verbosity=3, stream=sys.stdout).run(suite())
+
+
+if __name__ == "__main__":
+    run_all()
@@ -2,6 +2,8 @@ import sys
 import unittest
 from util.tile_helper import *
 import itertools
+import pickle
+import mock
 
 
 class TileHelperTests(unittest.TestCase):
@@ -25,6 +27,21 @@ class TileHelperTests(unittest.TestCase):
         assert lon == target_lon
         assert lat == target_lat
 
+    @mock.patch("util.tile_helper.QgsCoordinateReferenceSystem")
+    @mock.patch("util.tile_helper.QgsCoordinateTransform")
+    def test_coordinate_transforms_cached(self, mock_transform, mock_crs):
+        clear_coordinate_transforms()
+        self.addCleanup(clear_coordinate_transforms)
+        mock_transform.return_value.transform.return_value = (10, 20)
+        convert_coordinate(4326, "EPSG:3857", lat=2, lng=1)
+        points = convert_coordinates("EPSG:4326", 3857, [(1, 2), (3, 4)])
+        self.assertEqual([(10, 20), (10, 20)], points)
+        self.assertEqual(1, mock_transform.call_count)
+        self.assertEqual(2, mock_crs.call_count)
+
+    def test_convert_coordinates_same_crs(self):
+        self.assertEqual([(1, 2)], convert_coordinates(3857, "EPSG:3857", [(1, 2)]))
+
     def test_change_scheme(self):
         self.assertEqual(0, change_scheme(zoom=0, y=0))
         self.assertEqual(0, change_scheme(zoom=1, y=1))
@@ -106,6 +123,137 @@ class TileHelperTests(unittest.TestCase):
         tiles_equal = center_tiles_equal(tile_limit=tile_limit, extent_a=extent_a, extent_b=extent_b)
         self.assertTrue(tiles_equal)
 
+    def test_vector_tile_extent(self):
+        tile = VectorTile("xyz", 14, 8568, 5747)
+        self.assertEqual(tile_to_latlon(14, 8568, 5747, scheme="xyz"), tile.extent)
+        self.assertIs(tile.extent, VectorTile("xyz", 14, 8568, 5747).extent)
+
+    def test_vector_tile_slots(self):
+        tile = VectorTile("xyz", 14, 1, 2)
+        with self.assertRaises(AttributeError):
+            tile.unknown_attribute = 1
+
+    def test_vector_tile_pickle(self):
+        tile = VectorTile("tms", 14, 1, 2)
+        tile.decoded_data = {"water": {}}
+        tile.payload_id = 3
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            copy = pickle.loads(pickle.dumps(tile, protocol))
+            self.assertEqual((1, 2), copy.coord())
+            self.assertEqual("tms", copy.scheme)
+            self.assertEqual({"water": {}}, copy.decoded_data)
+            self.assertEqual(3, copy.payload_id)
+            self.assertEqual(tile.extent, copy.extent)
+
+
+    def test_tile_range(self):
+        tiles = TileRange(1, 2, 4, 3)
+        self.assertEqual(8, len(tiles))
+        self.assertIn((4, 3), tiles)
+        self.assertNotIn((5, 3), tiles)
+        self.assertEqual(set(itertools.product(range(1, 5), range(2, 4))), set(tiles))
+        self.assertEqual(8, len(list(tiles)))
+
+    def test_tile_range_empty(self):
+        tiles = TileRange(3, 3, 2, 2)
+        self.assertEqual(0, len(tiles))
+        self.assertEqual([], list(tiles))
+
+    def test_tile_range_center_out_order(self):
+        for x_max, y_max in [(4, 4), (5, 2), (0, 7), (9, 4), (6, 11)]:
+            tiles = TileRange(10, 20, 10 + x_max, 20 + y_max)
+            all_tiles = list(itertools.product(range(10, 11 + x_max), range(20, 21 + y_max)))
+            for nr_of_tiles in range(1, len(all_tiles)):
+                expected = get_tiles_from_center(nr_of_tiles=nr_of_tiles, available_tiles=all_tiles)
+                self.assertEqual(expected, set(tiles[:nr_of_tiles]))
+
+    def test_tile_range_intersection(self):
+        tiles = TileRange(0, 0, 4, 4)
+        self.assertEqual(TileRange(2, 3, 4, 4), tiles.intersection(TileRange(2, 3, 8, 8)))
+        self.assertEqual(0, len(tiles.intersection(TileRange(5, 5, 8, 8))))
+        self.assertEqual([(2, 2), (4, 4)], sorted(tiles.intersection({(2, 2), (4, 4), (5, 5)})))
+
+    def test_get_all_tiles(self):
+        bounds = create_bounds(zoom=14, x_min=2, x_max=5, y_min=3, y_max=4, scheme="xyz")
+        tiles = get_all_tiles(bounds)
+        self.assertEqual(TileRange(2, 3, 5, 4), tiles)
+        self.assertEqual(8, len(tiles))
+
+
+    def test_center_out_rank_matches_spiral(self):
+        # walk a spiral around the center: 1 step up, 1 right, 2 down, 2 left, 3 up, ...
+        spiral = [(0, 0)]
+        x, y = 0, 0
+        directions = [(0, -1), (1, 0), (0, 1), (-1, 0)]
+        nr_of_steps = 0
+        for direction in range(40):
+            if direction % 2 == 0:
+                nr_of_steps += 1
+            for _ in range(nr_of_steps):
+                x += directions[direction % 4][0]
+                y += directions[direction % 4][1]
+                spiral.append((x, y))
+        ranks = [get_center_out_rank((t[0] + 7, t[1] + 3), (7, 3)) for t in spiral]
+        self.assertEqual(list(range(len(spiral))), ranks)
+
+    def test_center_tiles_sparse(self):
+        available_tiles = [(0, 0), (10, 10), (5, 4), (5, 5), (9, 0)]
+        t = get_tiles_from_center(nr_of_tiles=2, available_tiles=available_tiles)
+        self.assertEqual({(5, 4), (5, 5)}, t)
+
+    def test_center_tiles_equal_same_extent(self):
+        extent = {'y_min': 3, 'y_max': 5, 'zoom': 3, 'height': 3, 'width': 2, 'x_max': 4, 'x_min': 3}
+        self.assertTrue(center_tiles_equal(tile_limit=2, extent_a=extent, extent_b=dict(extent)))
+
+    def test_tile_key(self):
+        self.assertEqual(1, get_tile_key(0, 0, 0))
+        # the quadkey 213 of the tile 3/3/5
+        self.assertEqual(int("1213", 4), get_tile_key(3, 3, 5))
+        self.assertEqual((3, 3, 5), get_tile_from_key(get_tile_key(3, 3, 5)))
+        self.assertEqual((22, 2197845, 1465286), get_tile_from_key(get_tile_key(22, 2197845, 1465286)))
+        self.assertEqual(get_tile_key(3, 3, 5), VectorTile("xyz", 3, 3, 5).key())
+        self.assertEqual(3, get_key_zoom(get_tile_key(3, 3, 5)))
+
+    def test_tile_key_parent_and_children(self):
+        key = get_tile_key(3, 3, 5)
+        self.assertEqual((2, 1, 2), get_tile_from_key(get_parent_key(key)))
+        self.assertEqual((0, 0, 0), get_tile_from_key(get_parent_key(key, levels=3)))
+        with self.assertRaises(RuntimeError):
+            get_parent_key(key, levels=4)
+        children = [get_tile_from_key(k) for k in get_child_keys(key)]
+        self.assertEqual([(4, 6, 10), (4, 7, 10), (4, 6, 11), (4, 7, 11)], children)
+
+    def test_tile_key_neighbours(self):
+        key = get_tile_key(3, 3, 5)
+        self.assertEqual((3, 4, 5), get_tile_from_key(get_neighbour_key(key, 1, 0)))
+        self.assertEqual((3, 2, 4), get_tile_from_key(get_neighbour_key(key, -1, -1)))
+        self.assertEqual((3, 0, 7), get_tile_from_key(get_neighbour_key(key, -3, 2)))
+        self.assertIsNone(get_neighbour_key(key, -4, 0))
+        self.assertIsNone(get_neighbour_key(key, 0, 3))
+        for col, row in itertools.product(range(8), range(8)):
+            for delta_col, delta_row in itertools.product(range(-2, 3), range(-2, 3)):
+                expected = None
+                if 0 <= col + delta_col < 8 and 0 <= row + delta_row < 8:
+                    expected = get_tile_key(3, col + delta_col, row + delta_row)
+                self.assertEqual(expected, get_neighbour_key(get_tile_key(3, col, row), delta_col, delta_row))
+
+    def test_tile_key_range(self):
+        sorted_keys = sorted(get_tile_key(4, col, row) for col in range(16) for row in range(16))
+        first, last = get_descendant_key_range(get_tile_key(2, 1, 2), 4)
+        descendants = [get_tile_from_key(k) for k in get_keys_in_range(sorted_keys, first, last)]
+        self.assertEqual(sorted((4, col, row) for col in range(4, 8) for row in range(8, 12)), sorted(descendants))
+
+    def test_surrounding_tiles(self):
+        tiles = get_surrounding_tiles(TileRange(1, 1, 2, 2), within=TileRange(0, 0, 3, 2))
+        self.assertEqual(set([(0, 0), (1, 0), (2, 0), (3, 0), (0, 1), (3, 1), (0, 2), (3, 2)]), set(tiles))
+        self.assertEqual(len(tiles), len(set(tiles)))
+
+    def test_parent_range(self):
+        parents = get_parent_range(TileRange(5, 2, 9, 3), 2)
+        self.assertEqual((1, 0, 2, 0), (parents.x_min, parents.y_min, parents.x_max, parents.y_max))
+        self.assertEqual(set((c >> 2, r >> 2) for c in range(5, 10) for r in range(2, 4)), set(parents))
+
+
 
 def suite():
     s = unittest.makeSuite(TileHelperTests, 'test')
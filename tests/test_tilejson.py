@@ -1,6 +1,9 @@
 import unittest
+import json
+import mock
 from util.tile_helper import get_tile_bounds, tile_to_latlon, WORLD_BOUNDS
-from util.tile_json import TileJSON
+from util.tile_json import TileJSON, get_tile_json
+from util import tile_json
 
 
 class TileJsonTests(unittest.TestCase):
@@ -91,6 +94,51 @@ class TileJsonTests(unittest.TestCase):
         world_bounds_tile = get_tile_bounds(zoom=14, source_crs=4326, scheme="xyz", bounds=WORLD_BOUNDS)
         self.assertEqual(world_bounds_tile, b)
 
+    @mock.patch("util.tile_json.load_url_with_validators")
+    def test_get_tile_json_shared(self, mock_load_url):
+        mock_load_url.return_value = (200, json.dumps(_get_test_tilejson()), _validators(etag="abc"))
+        tile_json._tile_json_cache.clear()
+        first = get_tile_json("http://localhost/shared.json")
+        second = get_tile_json("http://localhost/shared.json")
+        self.assertIs(first, second)
+        self.assertEqual(1, mock_load_url.call_count)
+
+    @mock.patch("util.tile_json.load_url_with_validators")
+    def test_get_tile_json_revalidated(self, mock_load_url):
+        mock_load_url.return_value = (200, json.dumps(_get_test_tilejson()), _validators(etag="abc", max_age=0))
+        tile_json._tile_json_cache.clear()
+        tj = get_tile_json("http://localhost/expired.json")
+        mock_load_url.return_value = (304, None, _validators())
+        revalidated = get_tile_json("http://localhost/expired.json")
+        self.assertIs(tj, revalidated)
+        mock_load_url.assert_called_with("http://localhost/expired.json", validators=_validators(etag="abc",
+                                                                                                 max_age=0))
+        self.assertIsNotNone(revalidated.json)
+
+    @mock.patch("util.tile_json.load_url_with_validators")
+    def test_get_tile_json_invalid_reloaded(self, mock_load_url):
+        mock_load_url.return_value = (200, json.dumps(_get_test_tilejson()), _validators(etag="abc", max_age=0))
+        tile_json._tile_json_cache.clear()
+        tj = get_tile_json("http://localhost/invalid.json")
+        mock_load_url.return_value = (200, "{invalid", _validators(etag="def", max_age=600))
+        get_tile_json("http://localhost/invalid.json")
+        self.assertTrue(tj.is_expired())
+        mock_load_url.return_value = (200, json.dumps(_get_test_tilejson()), _validators(etag="ghi", max_age=600))
+        get_tile_json("http://localhost/invalid.json")
+        self.assertFalse(tj.is_expired())
+        self.assertEqual(3, mock_load_url.call_count)
+
+    @mock.patch("util.tile_json.load_url_with_validators", return_value=(404, "Request failed", None))
+    def test_get_tile_json_failure_not_cached(self, mock_load_url):
+        tile_json._tile_json_cache.clear()
+        get_tile_json("http://localhost/missing.json")
+        get_tile_json("http://localhost/missing.json")
+        self.assertEqual(2, mock_load_url.call_count)
+
+
+def _validators(etag=None, last_modified=None, max_age=None):
+    return {"etag": etag, "last_modified": last_modified, "max_age": max_age}
+
 
 def _get_loaded(json=None):
     tj = TileJSON("")
@@ -11,8 +11,11 @@ from util.connection import MBTILES_CONNECTION_TEMPLATE
 import copy
 import mock
 import shutil
+import time
 from osgeo import gdal
-from util.file_helper import clear_cache, get_style_folder
+from util.file_helper import clear_cache, get_style_folder, is_tile_cached
+from util.tile_helper import VectorTile
+from util.mp_helper import decode_tile_native
 
 
 class VtReaderTests(unittest.TestCase):
@@ -148,12 +151,61 @@ class VtReaderTests(unittest.TestCase):
         mock_info.assert_any_call('Native decoding not supported: {}, {}bit', 'linux2', '64')
         mock_info.assert_any_call("Import complete")
 
-    def _load(self, iface, max_tiles, serial_tile_processing_limit=None, merge_tiles=False, clip_tiles=False, apply_styles=False):
+    def test_copy_decoded_data_native(self):
+        with open(os.path.join(os.path.dirname(__file__), "data", "uster.pbf"), "rb") as f:
+            data = f.read()
+        source_tile = VectorTile("xyz", 14, 8586, 5741)
+        target_tile = VectorTile("xyz", 14, 8588, 5740)
+        _, source_data = decode_tile_native((source_tile, data, True))
+        _, expected_data = decode_tile_native((target_tile, data, True))
+        copied_data = VtReader._copy_decoded_data(source_data, source_tile=source_tile, target_tile=target_tile)
+        source_feature = source_data["water"]["Polygon"][0]
+        copied_feature = copied_data["water"]["Polygon"][0]
+        expected_feature = expected_data["water"]["Polygon"][0]
+        self.assertEqual(expected_feature["properties"], copied_feature["properties"])
+        self.assertEqual(8586, source_feature["properties"]["_col"])
+        copied_coordinate = copied_feature["geometry"]["coordinates"][0][0][0]
+        expected_coordinate = expected_feature["geometry"]["coordinates"][0][0][0]
+        self.assertAlmostEqual(expected_coordinate[0], copied_coordinate[0], places=3)
+        self.assertAlmostEqual(expected_coordinate[1], copied_coordinate[1], places=3)
+
+    def test_copy_decoded_data_tile_local(self):
+        layer = {"extent": 4096, "features": []}
+        copied_data = VtReader._copy_decoded_data({"water": layer},
+                                                  source_tile=VectorTile("xyz", 14, 1, 1),
+                                                  target_tile=VectorTile("xyz", 14, 2, 1))
+        self.assertIs(layer, copied_data["water"])
+
+    def test_skip_duplicate_payloads(self):
+        tiles = [(VectorTile("xyz", 14, col, 0), b"water" if col < 3 else b"land") for col in range(4)]
+        copies_by_payload_id = {}
+        unique_tiles = list(VtReader._skip_duplicate_payloads(tiles, copies_by_payload_id))
+        self.assertEqual([0, 3], [t.column for t, data in unique_tiles])
+        self.assertEqual([1, 2], [t.column for t in copies_by_payload_id[unique_tiles[0][0].payload_id]])
+        self.assertEqual([], copies_by_payload_id[unique_tiles[1][0].payload_id])
+
+    def test_prefetch_twice(self):
+        global iface
+        clear_cache()
+        reader = self._create_reader(iface)
+        for col, row in [(8587, 10644), (8588, 10644)]:
+            reader.prefetch_async([(14, [(col, row)])], max_bytes=1024 * 1024)
+            timeout = time.time() + 30
+            while reader._prefetcher.is_running() and time.time() < timeout:
+                QApplication.processEvents()
+            self.assertFalse(reader._prefetcher.is_running())
+            self.assertTrue(is_tile_cached("uster_zh", 14, col, row))
+        reader.shutdown()
+
+    def _create_reader(self, iface):
         conn = copy.deepcopy(MBTILES_CONNECTION_TEMPLATE)
         gdal.PushErrorHandler('CPLQuietErrorHandler')
         conn["name"] = self.CONNECTION_NAME
         conn["path"] = os.path.join(os.path.dirname(__file__), '..', 'sample_data', 'uster_zh.mbtiles')
-        reader = VtReader(iface=iface, connection=conn)
+        return VtReader(iface=iface, connection=conn)
+
+    def _load(self, iface, max_tiles, serial_tile_processing_limit=None, merge_tiles=False, clip_tiles=False, apply_styles=False):
+        reader = self._create_reader(iface)
         bounds = {'y_min': 10644, 'y_max': 10645, 'zoom': 14, 'height': 2, 'width': 3, 'x_max': 8589, 'x_min': 8587}
         reader.set_options(merge_tiles=merge_tiles, clip_tiles=clip_tiles, max_tiles=max_tiles,
                            layer_filter=['landcover', 'place', 'water_name'], apply_styles=apply_styles)
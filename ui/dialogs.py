@@ -23,7 +23,8 @@ from ..util.connection import (
     ConnectionTypes,
     MBTILES_CONNECTION_TEMPLATE,
     TILEJSON_CONNECTION_TEMPLATE,
-    DIRECTORY_CONNECTION_TEMPLATE)
+    DIRECTORY_CONNECTION_TEMPLATE,
+    PMTILES_CONNECTION_TEMPLATE)
 
 _HELP_URL = "https://github.com/geometalab/Vector-Tiles-Reader-QGIS-Plugin/wiki/Help"
 
@@ -145,6 +146,7 @@ class ConnectionsDialog(QDialog, Ui_DlgConnections):
         self.tilejson_connections.select_connection(connection_to_select)
         self.btnConnectDirectory.clicked.connect(lambda: self.connect_to(self._directory_conn))
         self.btnConnectFile.clicked.connect(lambda: self.connect_to(self._mbtiles_conn))
+        self.btnConnectPmtiles.clicked.connect(lambda: self.connect_to(self._pmtiles_conn))
         self.tabConnections.currentChanged.connect(self._handle_tab_change)
         self.tilejson_connections.on_connect.connect(self._handle_connect)
         self.tilejson_connections.on_connection_change.connect(self._handle_connection_change)
@@ -153,6 +155,7 @@ class ConnectionsDialog(QDialog, Ui_DlgConnections):
         self.btnHelp.clicked.connect(lambda: webbrowser.open(_HELP_URL))
         self.btnBrowse.clicked.connect(self._select_file_path)
         self.btnSelectDirectory.clicked.connect(self._select_directory)
+        self.btnBrowsePmtiles.clicked.connect(self._select_pmtiles_path)
         self.open_path = None
         self.browse_path = default_browse_directory
         self.model = QStandardItemModel()
@@ -162,6 +165,7 @@ class ConnectionsDialog(QDialog, Ui_DlgConnections):
         self._current_connection = None
         self._directory_conn = None
         self._mbtiles_conn = None
+        self._pmtiles_conn = None
         self._load_mbtiles_and_directory_connections()
 
     def _update_action_text(self, connection):
@@ -175,6 +179,7 @@ class ConnectionsDialog(QDialog, Ui_DlgConnections):
     def _load_mbtiles_and_directory_connections(self):
         mbtiles_conn = self.settings.value("mbtiles_connection")
         directory_conn = self.settings.value("directory_connection")
+        pmtiles_conn = self.settings.value("pmtiles_connection")
         if mbtiles_conn:
             mbtiles_conn = ast.literal_eval(mbtiles_conn)
             if mbtiles_conn["type"] == ConnectionTypes.MBTiles:
@@ -189,8 +194,16 @@ class ConnectionsDialog(QDialog, Ui_DlgConnections):
                     self.txtDirectoryPath.setText(directory_conn["path"])
                 if directory_conn["style"]:
                     self.txtDirectoryStyleJsonUrl.setText(directory_conn["style"])
+        if pmtiles_conn:
+            pmtiles_conn = ast.literal_eval(pmtiles_conn)
+            if pmtiles_conn["type"] == ConnectionTypes.PMTiles:
+                if pmtiles_conn["path"]:
+                    self.txtPmtilesPath.setText(pmtiles_conn["path"])
+                if pmtiles_conn["style"]:
+                    self.txtPmtilesStyleJsonUrl.setText(pmtiles_conn["style"])
         self._mbtiles_conn = mbtiles_conn
         self._directory_conn = directory_conn
+        self._pmtiles_conn = pmtiles_conn
 
     def connect_to(self, connection):
         self._update_layers_group_title(connection)
@@ -203,6 +216,8 @@ class ConnectionsDialog(QDialog, Ui_DlgConnections):
                 widget = self.tabFile
             elif connection["type"] == ConnectionTypes.Directory:
                 widget = self.tabDirectory
+            elif connection["type"] == ConnectionTypes.PMTiles:
+                widget = self.tabPmtiles
             if widget:
                 self.tabConnections.setCurrentWidget(widget)
 
@@ -250,6 +265,17 @@ class ConnectionsDialog(QDialog, Ui_DlgConnections):
             connection["path"] = open_file_name
             self._handle_path_or_folder_selection(connection)
 
+    def _select_pmtiles_path(self):
+        open_file_name = QFileDialog.getOpenFileName(None, "Select PMTiles", self.browse_path, "PMTiles (*.pmtiles)")
+        if isinstance(open_file_name, tuple):
+            open_file_name = open_file_name[0]
+        if open_file_name and os.path.isfile(open_file_name):
+            self.txtPmtilesPath.setText(open_file_name)
+            connection = copy.deepcopy(PMTILES_CONNECTION_TEMPLATE)
+            connection["name"] = os.path.basename(open_file_name)
+            connection["path"] = open_file_name
+            self._handle_path_or_folder_selection(connection)
+
     def _handle_path_or_folder_selection(self, connection):
         self._current_connection = connection
         path = connection["path"]
@@ -285,6 +311,9 @@ class ConnectionsDialog(QDialog, Ui_DlgConnections):
         elif active_tab == self.tabDirectory and self._current_connection["type"] == ConnectionTypes.Directory:
             self._current_connection["style"] = self.txtDirectoryStyleJsonUrl.text()
             self.settings.setValue("directory_connection", str(self._current_connection))
+        elif active_tab == self.tabPmtiles and self._current_connection["type"] == ConnectionTypes.PMTiles:
+            self._current_connection["style"] = self.txtPmtilesStyleJsonUrl.text()
+            self.settings.setValue("pmtiles_connection", str(self._current_connection))
 
         load = True
         threshold = 20 if QGIS3 else 100
@@ -308,6 +337,8 @@ class ConnectionsDialog(QDialog, Ui_DlgConnections):
             self.connect_to(self._mbtiles_conn)
         elif active_tab == self.tabDirectory and self._directory_conn and current_connection != self._mbtiles_conn:
             self.connect_to(self._directory_conn)
+        elif active_tab == self.tabPmtiles and self._pmtiles_conn and current_connection != self._pmtiles_conn:
+            self.connect_to(self._pmtiles_conn)
         self.on_zoom_change.emit()
         self.exec_()
 
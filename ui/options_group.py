@@ -21,6 +21,9 @@ class OptionsGroup(QGroupBox, Ui_OptionsGroup):
     _SET_BACKGROUND_COLOR = "set_background_color"
     _MODE = "mode"
     _IGNORE_CRS = "ignore_crs"
+    _OVERZOOM = "overzoom"
+    _PROGRESSIVE_LOADING = "progressive_loading"
+    _PREFETCH = "prefetch"
 
     class Mode(object):
         MANUAL = "manual"
@@ -40,7 +43,10 @@ class OptionsGroup(QGroupBox, Ui_OptionsGroup):
         _APPLY_STYLES: True,
         _SET_BACKGROUND_COLOR: True,
         _MODE: Mode.MANUAL,
-        _IGNORE_CRS: False
+        _IGNORE_CRS: False,
+        _OVERZOOM: False,
+        _PROGRESSIVE_LOADING: False,
+        _PREFETCH: False
     }
 
     def __init__(self, settings, target_groupbox, zoom_change_handler):
@@ -55,6 +61,10 @@ class OptionsGroup(QGroupBox, Ui_OptionsGroup):
         self.chkMergeTiles.toggled.connect(lambda enabled: self._set_option(self._MERGE_TILES, enabled))
         self.chkClipTiles.toggled.connect(lambda enabled: self._set_option(self._CLIP_TILES, enabled))
         self.chkIgnoreCrsFromMetadata.toggled.connect(lambda enabled: self._set_option(self._IGNORE_CRS, enabled))
+        self.chkOverzoom.toggled.connect(lambda enabled: self._set_option(self._OVERZOOM, enabled))
+        self.chkProgressiveLoading.toggled.connect(
+            lambda enabled: self._set_option(self._PROGRESSIVE_LOADING, enabled))
+        self.chkPrefetch.toggled.connect(lambda enabled: self._set_option(self._PREFETCH, enabled))
         self.chkSetBackgroundColor.toggled.connect(self._on_bg_color_change)
         self.chkApplyStyles.toggled.connect(self._on_apply_styles_changed)
         self.chkLimitNrOfTiles.toggled.connect(lambda enabled: self._set_option(self._TILE_LIMIT_ENABLED, enabled))
@@ -105,6 +115,12 @@ class OptionsGroup(QGroupBox, Ui_OptionsGroup):
             self.set_checked(self.chkSetBackgroundColor, self._SET_BACKGROUND_COLOR)
         if opt[self._IGNORE_CRS]:
             self.set_checked(self.chkIgnoreCrsFromMetadata, self._IGNORE_CRS)
+        if opt[self._OVERZOOM]:
+            self.set_checked(self.chkOverzoom, self._OVERZOOM)
+        if opt[self._PROGRESSIVE_LOADING]:
+            self.set_checked(self.chkProgressiveLoading, self._PROGRESSIVE_LOADING)
+        if opt[self._PREFETCH]:
+            self.set_checked(self.chkPrefetch, self._PREFETCH)
         if opt[self._MODE]:
             val = opt[self._MODE]
             self._enable_manual_mode(val == self.Mode.MANUAL)
@@ -269,6 +285,21 @@ class OptionsGroup(QGroupBox, Ui_OptionsGroup):
         self._set_option(self._SET_BACKGROUND_COLOR, enabled)
         return enabled
 
+    def overzoom_enabled(self):
+        enabled = self.chkOverzoom.isChecked()
+        self._set_option(self._OVERZOOM, enabled)
+        return enabled
+
+    def progressive_loading_enabled(self):
+        enabled = self.chkProgressiveLoading.isChecked()
+        self._set_option(self._PROGRESSIVE_LOADING, enabled)
+        return enabled
+
+    def prefetch_enabled(self):
+        enabled = self.chkPrefetch.isChecked()
+        self._set_option(self._PREFETCH, enabled)
+        return enabled
+
     def merge_tiles_enabled(self):
         enabled = self.chkMergeTiles.isChecked()
         self._set_option(self._MERGE_TILES, enabled)
@@ -112,6 +112,29 @@ class Ui_DlgConnections(object):
         self.btnConnectDirectory.setObjectName(_fromUtf8("btnConnectDirectory"))
         self.gridLayout_2.addWidget(self.btnConnectDirectory, 2, 0, 1, 1)
         self.tabConnections.addTab(self.tabDirectory, _fromUtf8(""))
+        self.tabPmtiles = QtGui.QWidget()
+        self.tabPmtiles.setObjectName(_fromUtf8("tabPmtiles"))
+        self.gridLayout_5 = QtGui.QGridLayout(self.tabPmtiles)
+        self.gridLayout_5.setObjectName(_fromUtf8("gridLayout_5"))
+        self.lblSource_3 = QtGui.QLabel(self.tabPmtiles)
+        self.lblSource_3.setObjectName(_fromUtf8("lblSource_3"))
+        self.gridLayout_5.addWidget(self.lblSource_3, 0, 0, 1, 1)
+        self.txtPmtilesPath = QtGui.QLineEdit(self.tabPmtiles)
+        self.txtPmtilesPath.setObjectName(_fromUtf8("txtPmtilesPath"))
+        self.gridLayout_5.addWidget(self.txtPmtilesPath, 0, 1, 1, 1)
+        self.btnBrowsePmtiles = QtGui.QPushButton(self.tabPmtiles)
+        self.btnBrowsePmtiles.setObjectName(_fromUtf8("btnBrowsePmtiles"))
+        self.gridLayout_5.addWidget(self.btnBrowsePmtiles, 0, 2, 1, 1)
+        self.lblPmtilesStyleJsonUrl = QtGui.QLabel(self.tabPmtiles)
+        self.lblPmtilesStyleJsonUrl.setObjectName(_fromUtf8("lblPmtilesStyleJsonUrl"))
+        self.gridLayout_5.addWidget(self.lblPmtilesStyleJsonUrl, 1, 0, 1, 1)
+        self.txtPmtilesStyleJsonUrl = QtGui.QLineEdit(self.tabPmtiles)
+        self.txtPmtilesStyleJsonUrl.setObjectName(_fromUtf8("txtPmtilesStyleJsonUrl"))
+        self.gridLayout_5.addWidget(self.txtPmtilesStyleJsonUrl, 1, 1, 1, 1)
+        self.btnConnectPmtiles = QtGui.QPushButton(self.tabPmtiles)
+        self.btnConnectPmtiles.setObjectName(_fromUtf8("btnConnectPmtiles"))
+        self.gridLayout_5.addWidget(self.btnConnectPmtiles, 2, 0, 1, 1)
+        self.tabConnections.addTab(self.tabPmtiles, _fromUtf8(""))
         self.gridLayout.addWidget(self.tabConnections, 0, 0, 1, 1, QtCore.Qt.AlignTop)
         self.grpOptions = QtGui.QGroupBox(DlgConnections)
         self.grpOptions.setMinimumSize(QtCore.QSize(0, 190))
@@ -172,6 +195,12 @@ class Ui_DlgConnections(object):
         self.txtDirectoryPath.setToolTip(_translate("DlgConnections", "The URL to the TileJSON of the tile service (e.g. http://yourtilehoster.com/index.json)", None))
         self.btnConnectDirectory.setText(_translate("DlgConnections", "Refresh", None))
         self.tabConnections.setTabText(self.tabConnections.indexOf(self.tabDirectory), _translate("DlgConnections", "Directory", None))
+        self.lblSource_3.setText(_translate("DlgConnections", "Path", None))
+        self.txtPmtilesPath.setToolTip(_translate("DlgConnections", "The path to the PMTiles archive", None))
+        self.btnBrowsePmtiles.setText(_translate("DlgConnections", "Browse", None))
+        self.lblPmtilesStyleJsonUrl.setText(_translate("DlgConnections", "GL Style JSON URL", None))
+        self.btnConnectPmtiles.setText(_translate("DlgConnections", "Refresh", None))
+        self.tabConnections.setTabText(self.tabConnections.indexOf(self.tabPmtiles), _translate("DlgConnections", "PMTiles", None))
         self.grpOptions.setTitle(_translate("DlgConnections", "Options", None))
         self.grpLayers.setTitle(_translate("DlgConnections", "Layers", None))
 
@@ -98,6 +98,29 @@ class Ui_DlgConnections(object):
         self.btnConnectDirectory.setObjectName("btnConnectDirectory")
         self.gridLayout_2.addWidget(self.btnConnectDirectory, 2, 0, 1, 1)
         self.tabConnections.addTab(self.tabDirectory, "")
+        self.tabPmtiles = QtWidgets.QWidget()
+        self.tabPmtiles.setObjectName("tabPmtiles")
+        self.gridLayout_5 = QtWidgets.QGridLayout(self.tabPmtiles)
+        self.gridLayout_5.setObjectName("gridLayout_5")
+        self.lblSource_3 = QtWidgets.QLabel(self.tabPmtiles)
+        self.lblSource_3.setObjectName("lblSource_3")
+        self.gridLayout_5.addWidget(self.lblSource_3, 0, 0, 1, 1)
+        self.txtPmtilesPath = QtWidgets.QLineEdit(self.tabPmtiles)
+        self.txtPmtilesPath.setObjectName("txtPmtilesPath")
+        self.gridLayout_5.addWidget(self.txtPmtilesPath, 0, 1, 1, 1)
+        self.btnBrowsePmtiles = QtWidgets.QPushButton(self.tabPmtiles)
+        self.btnBrowsePmtiles.setObjectName("btnBrowsePmtiles")
+        self.gridLayout_5.addWidget(self.btnBrowsePmtiles, 0, 2, 1, 1)
+        self.lblPmtilesStyleJsonUrl = QtWidgets.QLabel(self.tabPmtiles)
+        self.lblPmtilesStyleJsonUrl.setObjectName("lblPmtilesStyleJsonUrl")
+        self.gridLayout_5.addWidget(self.lblPmtilesStyleJsonUrl, 1, 0, 1, 1)
+        self.txtPmtilesStyleJsonUrl = QtWidgets.QLineEdit(self.tabPmtiles)
+        self.txtPmtilesStyleJsonUrl.setObjectName("txtPmtilesStyleJsonUrl")
+        self.gridLayout_5.addWidget(self.txtPmtilesStyleJsonUrl, 1, 1, 1, 1)
+        self.btnConnectPmtiles = QtWidgets.QPushButton(self.tabPmtiles)
+        self.btnConnectPmtiles.setObjectName("btnConnectPmtiles")
+        self.gridLayout_5.addWidget(self.btnConnectPmtiles, 2, 0, 1, 1)
+        self.tabConnections.addTab(self.tabPmtiles, "")
         self.gridLayout.addWidget(self.tabConnections, 0, 0, 1, 1, QtCore.Qt.AlignTop)
         self.grpOptions = QtWidgets.QGroupBox(DlgConnections)
         self.grpOptions.setMinimumSize(QtCore.QSize(0, 190))
@@ -159,6 +182,12 @@ class Ui_DlgConnections(object):
         self.txtDirectoryPath.setToolTip(_translate("DlgConnections", "The URL to the TileJSON of the tile service (e.g. http://yourtilehoster.com/index.json)"))
         self.btnConnectDirectory.setText(_translate("DlgConnections", "Refresh"))
         self.tabConnections.setTabText(self.tabConnections.indexOf(self.tabDirectory), _translate("DlgConnections", "Directory"))
+        self.lblSource_3.setText(_translate("DlgConnections", "Path"))
+        self.txtPmtilesPath.setToolTip(_translate("DlgConnections", "The path to the PMTiles archive"))
+        self.btnBrowsePmtiles.setText(_translate("DlgConnections", "Browse"))
+        self.lblPmtilesStyleJsonUrl.setText(_translate("DlgConnections", "GL Style JSON URL"))
+        self.btnConnectPmtiles.setText(_translate("DlgConnections", "Refresh"))
+        self.tabConnections.setTabText(self.tabConnections.indexOf(self.tabPmtiles), _translate("DlgConnections", "PMTiles"))
         self.grpOptions.setTitle(_translate("DlgConnections", "Options"))
         self.grpLayers.setTitle(_translate("DlgConnections", "Layers"))
 
@@ -102,7 +102,7 @@ class Ui_OptionsGroup(object):
         self.horizontalLayout_2.addWidget(self.btnManualSettings)
         spacerItem1 = QtGui.QSpacerItem(40, 20, QtGui.QSizePolicy.Expanding, QtGui.QSizePolicy.Minimum)
         self.horizontalLayout_2.addItem(spacerItem1)
-        self.gridLayout.addLayout(self.horizontalLayout_2, 12, 0, 1, 2)
+        self.gridLayout.addLayout(self.horizontalLayout_2, 14, 0, 1, 2)
         self.chkAutoZoom = QtGui.QCheckBox(OptionsGroup)
         self.chkAutoZoom.setChecked(True)
         self.chkAutoZoom.setObjectName(_fromUtf8("chkAutoZoom"))
@@ -139,6 +139,15 @@ class Ui_OptionsGroup(object):
         self.chkIgnoreCrsFromMetadata = QtGui.QCheckBox(OptionsGroup)
         self.chkIgnoreCrsFromMetadata.setObjectName(_fromUtf8("chkIgnoreCrsFromMetadata"))
         self.gridLayout.addWidget(self.chkIgnoreCrsFromMetadata, 11, 0, 1, 2)
+        self.chkOverzoom = QtGui.QCheckBox(OptionsGroup)
+        self.chkOverzoom.setObjectName(_fromUtf8("chkOverzoom"))
+        self.gridLayout.addWidget(self.chkOverzoom, 8, 0, 1, 2)
+        self.chkProgressiveLoading = QtGui.QCheckBox(OptionsGroup)
+        self.chkProgressiveLoading.setObjectName(_fromUtf8("chkProgressiveLoading"))
+        self.gridLayout.addWidget(self.chkProgressiveLoading, 12, 0, 1, 2)
+        self.chkPrefetch = QtGui.QCheckBox(OptionsGroup)
+        self.chkPrefetch.setObjectName(_fromUtf8("chkPrefetch"))
+        self.gridLayout.addWidget(self.chkPrefetch, 13, 0, 1, 2)
 
         self.retranslateUi(OptionsGroup)
         QtCore.QMetaObject.connectSlotsByName(OptionsGroup)
@@ -174,4 +183,10 @@ class Ui_OptionsGroup(object):
         self.label_5.setText(_translate("OptionsGroup", "Fix Zoom", None))
         self.chkIgnoreCrsFromMetadata.setToolTip(_translate("OptionsGroup", "If checked, EPSG:3857 will be used to calculate the tile extent from the current QGIS view extent", None))
         self.chkIgnoreCrsFromMetadata.setText(_translate("OptionsGroup", "Ignore CRS from metadata", None))
+        self.chkOverzoom.setToolTip(_translate("OptionsGroup", "If checked, the zoom levels above the max. zoom of the source are created from the tiles of the max. zoom level, which are loaded only once", None))
+        self.chkOverzoom.setText(_translate("OptionsGroup", "Overzoom beyond the max. zoom of the source", None))
+        self.chkProgressiveLoading.setToolTip(_translate("OptionsGroup", "If checked, the data of a coarser, cached zoom level is shown immediately while navigating and is replaced as soon as the current zoom level is loaded", None))
+        self.chkProgressiveLoading.setText(_translate("OptionsGroup", "Show cached zoom levels while loading", None))
+        self.chkPrefetch.setToolTip(_translate("OptionsGroup", "If checked, the tiles around the loaded extent and the tiles of the adjacent zoom levels are loaded into the cache in the background, while no other tiles are loaded", None))
+        self.chkPrefetch.setText(_translate("OptionsGroup", "Prefetch surrounding tiles in the background", None))
 
@@ -88,7 +88,7 @@ class Ui_OptionsGroup(object):
         self.horizontalLayout_2.addWidget(self.btnManualSettings)
         spacerItem1 = QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Minimum)
         self.horizontalLayout_2.addItem(spacerItem1)
-        self.gridLayout.addLayout(self.horizontalLayout_2, 12, 0, 1, 2)
+        self.gridLayout.addLayout(self.horizontalLayout_2, 14, 0, 1, 2)
         self.chkAutoZoom = QtWidgets.QCheckBox(OptionsGroup)
         self.chkAutoZoom.setChecked(True)
         self.chkAutoZoom.setObjectName("chkAutoZoom")
@@ -125,6 +125,15 @@ class Ui_OptionsGroup(object):
         self.chkIgnoreCrsFromMetadata = QtWidgets.QCheckBox(OptionsGroup)
         self.chkIgnoreCrsFromMetadata.setObjectName("chkIgnoreCrsFromMetadata")
         self.gridLayout.addWidget(self.chkIgnoreCrsFromMetadata, 11, 0, 1, 2)
+        self.chkOverzoom = QtWidgets.QCheckBox(OptionsGroup)
+        self.chkOverzoom.setObjectName("chkOverzoom")
+        self.gridLayout.addWidget(self.chkOverzoom, 8, 0, 1, 2)
+        self.chkProgressiveLoading = QtWidgets.QCheckBox(OptionsGroup)
+        self.chkProgressiveLoading.setObjectName("chkProgressiveLoading")
+        self.gridLayout.addWidget(self.chkProgressiveLoading, 12, 0, 1, 2)
+        self.chkPrefetch = QtWidgets.QCheckBox(OptionsGroup)
+        self.chkPrefetch.setObjectName("chkPrefetch")
+        self.gridLayout.addWidget(self.chkPrefetch, 13, 0, 1, 2)
 
         self.retranslateUi(OptionsGroup)
         QtCore.QMetaObject.connectSlotsByName(OptionsGroup)
@@ -161,4 +170,10 @@ class Ui_OptionsGroup(object):
         self.label_5.setText(_translate("OptionsGroup", "Fix Zoom"))
         self.chkIgnoreCrsFromMetadata.setToolTip(_translate("OptionsGroup", "If checked, EPSG:3857 will be used to calculate the tile extent from the current QGIS view extent"))
         self.chkIgnoreCrsFromMetadata.setText(_translate("OptionsGroup", "Ignore CRS from metadata"))
+        self.chkOverzoom.setToolTip(_translate("OptionsGroup", "If checked, the zoom levels above the max. zoom of the source are created from the tiles of the max. zoom level, which are loaded only once"))
+        self.chkOverzoom.setText(_translate("OptionsGroup", "Overzoom beyond the max. zoom of the source"))
+        self.chkProgressiveLoading.setToolTip(_translate("OptionsGroup", "If checked, the data of a coarser, cached zoom level is shown immediately while navigating and is replaced as soon as the current zoom level is loaded"))
+        self.chkProgressiveLoading.setText(_translate("OptionsGroup", "Show cached zoom levels while loading"))
+        self.chkPrefetch.setToolTip(_translate("OptionsGroup", "If checked, the tiles around the loaded extent and the tiles of the adjacent zoom levels are loaded into the cache in the background, while no other tiles are loaded"))
+        self.chkPrefetch.setText(_translate("OptionsGroup", "Prefetch surrounding tiles in the background"))
 
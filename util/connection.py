@@ -5,6 +5,7 @@ class _ConnectionTypes(object):
     TileJSON = "TileJSON"
     MBTiles = "MBTiles"
     Directory = "Directory"
+    PMTiles = "PMTiles"
     PostGIS = "PostGIS"
 
 
@@ -24,6 +25,13 @@ DIRECTORY_CONNECTION_TEMPLATE = {
     "style": None
 }
 
+PMTILES_CONNECTION_TEMPLATE = {
+    "name": None,
+    "path": None,
+    "type": ConnectionTypes.PMTiles,
+    "style": None
+}
+
 TILEJSON_CONNECTION_TEMPLATE = {
     "name": "",
     "url": "",
@@ -43,5 +51,8 @@ POSTGIS_CONNECTION_TEMPLATE = {
     "database": None,
     "save_password": True,
     "type": ConnectionTypes.PostGIS,
-    "style": None
+    "style": None,
+    "tables": None,
+    "min_zoom": 0,
+    "max_zoom": 14
 }
\ No newline at end of file
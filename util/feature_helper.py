@@ -5,9 +5,17 @@ from .vtr_2to3 import *
 
 import uuid
 import numbers
+from itertools import chain
+try:
+    import numpy as np
+except ImportError:
+    np = None
 from .log_helper import info, debug
 from .tile_helper import tile_to_latlon
 
+# below this number of vertices, creating the arrays takes longer than transforming the vertices one by one
+_MIN_VERTICES_FOR_NUMPY = 64
+
 
 def clip_features(layer, scheme, bounds=None, should_cancel_func=None):
     layer.startEditing()
@@ -228,3 +236,114 @@ def map_coordinates_recursive(coordinates, tile_extent, mapper_func, all_out_of_
     if all_out_of_bounds_func:
         all_out_of_bounds_func(all_out_of_bounds)
     return tmp
+
+
+class TileAffine(object):
+    """
+     * The affine transformation from the tile-local integer coordinates of a tile to the coordinates of its extent
+    """
+
+    __slots__ = ("x_origin", "y_origin", "x_scale", "y_scale", "tile_extent")
+
+    def __init__(self, extent, tile_extent):
+        """
+        :param extent: The extent (x_min, y_min, x_max, y_max) of the tile, e.g. in EPSG:3857
+        :param tile_extent: The extent of the tile-local coordinates, e.g. 4096
+        """
+        self.x_origin = extent[0]
+        self.y_origin = extent[1]
+        self.x_scale = (extent[2] - extent[0]) / tile_extent
+        self.y_scale = (extent[3] - extent[1]) / tile_extent
+        self.tile_extent = tile_extent
+
+    def map(self, coordinate):
+        return [int(self.x_origin + self.x_scale * coordinate[0]), int(self.y_origin + self.y_scale * coordinate[1])]
+
+
+def map_tile_coordinates(geometries, affine):
+    """
+     * Maps the (nested) tile-local coordinates of many geometries, e.g. of all features of a layer, at once.
+     * The result is the same as of map_coordinates_recursive with a mapper, which truncates the mapped coordinates
+       to integers. All vertices are transformed with NumPy, if it's available, otherwise one by one.
+    :param geometries: A list of (nested) coordinate arrays
+    :param affine: The TileAffine of the tile
+    :return: A list of tuples (mapped_coordinates, all_out_of_bounds) per geometry. all_out_of_bounds is True,
+             if the geometry is a single line of coordinates of which none lies within the tile.
+    """
+    lines = []
+    for coordinates in geometries:
+        if not _is_coordinate(coordinates):
+            _collect_lines(coordinates, lines)
+    nr_of_vertices = sum(len(line) for line in lines)
+    if np is not None and nr_of_vertices >= _MIN_VERTICES_FOR_NUMPY:
+        mapped_lines = iter(_map_lines_vectorised(lines, affine, nr_of_vertices))
+    else:
+        mapped_lines = iter(_map_lines(lines, affine))
+
+    tile_extent = affine.tile_extent
+    result = []
+    for coordinates in geometries:
+        if _is_coordinate(coordinates):
+            result.append(([affine.map(coordinates)], False))
+            continue
+        all_out_of_bounds = _is_line(coordinates) and not any(1 <= x <= tile_extent and 1 <= y <= tile_extent
+                                                               for x, y in coordinates)
+        result.append((_rebuild_nested(coordinates, mapped_lines), all_out_of_bounds))
+    return result
+
+
+def _is_coordinate(coordinates):
+    return len(coordinates) == 2 and not isinstance(coordinates[0], (list, tuple))
+
+
+def _is_line(coordinates):
+    return len(coordinates) > 0 and _is_coordinate(coordinates[0])
+
+
+def _collect_lines(coordinates, lines):
+    if _is_line(coordinates):
+        lines.append(coordinates)
+    else:
+        for c in coordinates:
+            _collect_lines(c, lines)
+
+
+def _rebuild_nested(coordinates, mapped_lines):
+    if _is_line(coordinates):
+        return next(mapped_lines)
+    return [_rebuild_nested(c, mapped_lines) for c in coordinates]
+
+
+def _map_lines(lines, affine):
+    x_origin = affine.x_origin
+    y_origin = affine.y_origin
+    x_scale = affine.x_scale
+    y_scale = affine.y_scale
+    return [[[int(x_origin + x_scale * x), int(y_origin + y_scale * y)] for x, y in line] for line in lines]
+
+
+def _map_lines_vectorised(lines, affine, nr_of_vertices):
+    vertices = np.fromiter(chain.from_iterable(chain.from_iterable(lines)), dtype=np.float64,
+                           count=2 * nr_of_vertices).reshape(-1, 2)
+    # the same floating point operations as in TileAffine.map, so that the truncated values are equal
+    vertices[:, 0] *= affine.x_scale
+    vertices[:, 0] += affine.x_origin
+    vertices[:, 1] *= affine.y_scale
+    vertices[:, 1] += affine.y_origin
+    mapped = vertices.astype(np.int64).tolist()
+    result = []
+    start = 0
+    for line in lines:
+        end = start + len(line)
+        result.append(mapped[start:end])
+        start = end
+    return result
+
+
+def translate_coordinates_recursive(coordinates, delta_x, delta_y):
+    """
+    Returns a copy of the (nested) coordinates, moved by the specified delta
+    """
+    if len(coordinates) == 2 and all(isinstance(c, (int, float)) for c in coordinates):
+        return [coordinates[0] + delta_x, coordinates[1] + delta_y]
+    return [translate_coordinates_recursive(c, delta_x, delta_y) for c in coordinates]
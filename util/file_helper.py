@@ -1,12 +1,18 @@
 import os
+import errno
 import tempfile
 import sys
 import time
 import shutil
+import zlib
 try:
     import cPickle as pickle
 except ImportError:
     import pickle as pickle
+try:
+    import simplejson as json
+except ImportError:
+    import json
 from .log_helper import info, critical, warn, debug
 
 
@@ -14,6 +20,9 @@ geojson_folder = "tmp"
 max_cache_age_minutes = 1440  # 24 hours
 
 _temp_dir = tempfile.gettempdir()
+# the expiry times of the cache entries, which have been written or read in this session
+_cache_entry_expiries = {}
+_max_known_cache_entries = 100000
 
 
 def get_plugin_directory():
@@ -46,39 +55,186 @@ def _get_cache_entry_path(cache_name, zoom_level, x, y):
     return os.path.join(get_cache_directory(), cache_name, str(zoom_level), str(x), "{}.bin".format(y))
 
 
+def _get_cache_validators_path(cache_name, zoom_level, x, y):
+    return os.path.join(get_cache_directory(), cache_name, str(zoom_level), str(x), "{}.json".format(y))
+
+
 def get_cache_entry(cache_name, zoom_level, x, y):
+    """
+     * Returns the decoded data of the cached tile or None, if the tile isn't cached or the entry is expired.
+     * Expired entries are kept, if they can be revalidated by a conditional request (see get_cache_entry_validators)
+    """
     file_path = _get_cache_entry_path(cache_name=cache_name, zoom_level=zoom_level, x=x, y=y)
     decoded_data = None
     try:
         if os.path.isfile(file_path):
-            age_in_seconds = int(time.time()) - os.path.getmtime(file_path)
-            is_deprecated = age_in_seconds > max_cache_age_minutes * 60
-            if is_deprecated:
-                os.remove(file_path)
+            validators = _read_validators(cache_name, zoom_level, x, y)
+            expiry = _get_expiry(file_path, validators)
+            if _is_expired(expiry):
+                _forget_cache_entry(cache_name, zoom_level, x, y)
+                if not _can_revalidate(validators):
+                    os.remove(file_path)
             else:
-                with open(file_path, 'rb') as f:
-                    decoded_data = pickle.load(f)
+                decoded_data = _read_cache_file(file_path)
+                _remember_cache_entry(cache_name, zoom_level, x, y, expiry)
     except:
         critical("Error while reading cache entry {}: {}", file_path, sys.exc_info()[1])
     return decoded_data
 
 
-def cache_tile(cache_name, zoom_level, x, y, decoded_data):
+def is_tile_cached(cache_name, zoom_level, x, y, read_files=False):
+    """
+     * Returns True, if the tile has been cached or read from the cache in this session and isn't expired.
+     * No files are accessed, i.e. it's cheap enough to be called from the UI thread. Tiles which have only been
+       cached in a previous session are treated as not cached.
+    :param read_files: If True, the cache entries of tiles, which are unknown in this session, are checked too.
+     The data isn't read in contrast to get_cache_entry.
+    """
+    expiry = _cache_entry_expiries.get((cache_name, zoom_level, x, y))
+    if expiry is None and read_files:
+        file_path = _get_cache_entry_path(cache_name=cache_name, zoom_level=zoom_level, x=x, y=y)
+        try:
+            if os.path.isfile(file_path):
+                expiry = _get_expiry(file_path, _read_validators(cache_name, zoom_level, x, y))
+                _remember_cache_entry(cache_name, zoom_level, x, y, expiry)
+        except (IOError, OSError):
+            pass
+    return expiry is not None and not _is_expired(expiry)
+
+
+def _remember_cache_entry(cache_name, zoom_level, x, y, expiry):
+    if len(_cache_entry_expiries) >= _max_known_cache_entries:
+        _cache_entry_expiries.clear()
+    _cache_entry_expiries[(cache_name, zoom_level, x, y)] = expiry
+
+
+def _forget_cache_entry(cache_name, zoom_level, x, y):
+    _cache_entry_expiries.pop((cache_name, zoom_level, x, y), None)
+
+
+def _get_expiry(file_path, validators):
+    """
+     * Returns the time, after which the cache entry is expired
+    """
+    max_age_seconds = max_cache_age_minutes * 60
+    if validators and validators.get("max_age") is not None:
+        max_age_seconds = validators["max_age"]
+    return os.path.getmtime(file_path) + max_age_seconds
+
+
+def _is_expired(expiry):
+    return int(time.time()) > expiry
+
+
+def get_cache_entry_validators(cache_name, zoom_level, x, y):
+    """
+     * Returns the validators (ETag, Last-Modified) of the cached tile, if the tile is cached and can be revalidated.
+    """
     file_path = _get_cache_entry_path(cache_name=cache_name, zoom_level=zoom_level, x=x, y=y)
-    if not os.path.isfile(file_path):
-        if not decoded_data:
-            warn("Trying to cache a tile without data: {}: {},{},{}", cache_name, zoom_level, x, y)
+    validators = None
+    if os.path.isfile(file_path):
+        validators = _read_validators(cache_name, zoom_level, x, y)
+        if not _can_revalidate(validators):
+            validators = None
+    return validators
+
+
+def refresh_cache_entry(cache_name, zoom_level, x, y, validators=None):
+    """
+     * Marks the cached tile as fresh again, i.e. after the server confirmed that it hasn't been modified.
+    :param validators: The validators of the 304 response. Values which are set replace the stored ones.
+    :return: The decoded data of the cached tile
+    """
+    file_path = _get_cache_entry_path(cache_name=cache_name, zoom_level=zoom_level, x=x, y=y)
+    decoded_data = None
+    try:
+        if os.path.isfile(file_path):
+            os.utime(file_path, None)
+            stored_validators = _read_validators(cache_name, zoom_level, x, y)
+            if validators:
+                stored_validators = stored_validators or {}
+                for key in validators:
+                    if validators[key] is not None:
+                        stored_validators[key] = validators[key]
+                _write_validators(cache_name, zoom_level, x, y, stored_validators)
+            decoded_data = _read_cache_file(file_path)
+            _remember_cache_entry(cache_name, zoom_level, x, y, _get_expiry(file_path, stored_validators))
+    except:
+        critical("Error while refreshing cache entry {}: {}", file_path, sys.exc_info()[1])
+    return decoded_data
+
+
+def cache_tile(cache_name, zoom_level, x, y, decoded_data, validators=None):
+    file_path = _get_cache_entry_path(cache_name=cache_name, zoom_level=zoom_level, x=x, y=y)
+    if not decoded_data:
+        warn("Trying to cache a tile without data: {}: {},{},{}", cache_name, zoom_level, x, y)
+    else:
+        try:
+            _write_file(file_path, lambda f: pickle.dump(decoded_data, f, protocol=pickle.HIGHEST_PROTOCOL), 'wb')
+            if validators:
+                _write_validators(cache_name, zoom_level, x, y, validators)
+            else:
+                _remove_validators(cache_name, zoom_level, x, y)
+            _remember_cache_entry(cache_name, zoom_level, x, y, _get_expiry(file_path, validators))
+        except:
+            critical("Error during caching of '{}': {}", file_path, sys.exc_info()[1])
+
+
+def _read_cache_file(file_path):
+    with open(file_path, 'rb') as f:
+        return pickle.load(f)
+
+
+def _can_revalidate(validators):
+    return validators is not None and (validators.get("etag") or validators.get("last_modified"))
+
+
+def _read_validators(cache_name, zoom_level, x, y):
+    path = _get_cache_validators_path(cache_name=cache_name, zoom_level=zoom_level, x=x, y=y)
+    validators = None
+    if os.path.isfile(path):
+        try:
+            with open(path, 'r') as f:
+                validators = json.load(f)
+        except ValueError:
+            warn("Invalid cache validators: {}", path)
+    return validators
+
+
+def _write_validators(cache_name, zoom_level, x, y, validators):
+    path = _get_cache_validators_path(cache_name=cache_name, zoom_level=zoom_level, x=x, y=y)
+    _write_file(path, lambda f: json.dump(validators, f), 'w')
+
+
+def _write_file(file_path, write_func, mode):
+    """
+     * Writes the file to a temporary file in the same directory, which then replaces the file. Thus, readers never
+       get a partially written file and concurrent writers (e.g. the prefetching and the loading) don't mix their data.
+    :param write_func: The function writing the content to the passed file object
+    """
+    directory = os.path.dirname(file_path)
+    _assure_dir_exists(directory)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode) as f:
+            write_func(f)
+        if hasattr(os, "replace"):
+            os.replace(tmp_path, file_path)
         else:
-            try:
-                directory = os.path.dirname(file_path)
-                if not os.path.isdir(directory):
-                    os.makedirs(directory)
-                with open(file_path, 'wb') as f:
-                    pickle.dump(decoded_data, f, protocol=pickle.HIGHEST_PROTOCOL)
-            except:
-                critical("Error during caching of '{}': {}", file_path, sys.exc_info()[1])
+            if os.name == "nt" and os.path.isfile(file_path):
+                os.remove(file_path)
+            os.rename(tmp_path, file_path)
+    except:
+        if os.path.isfile(tmp_path):
+            os.remove(tmp_path)
+        raise
 
 
+def _remove_validators(cache_name, zoom_level, x, y):
+    path = _get_cache_validators_path(cache_name=cache_name, zoom_level=zoom_level, x=x, y=y)
+    if os.path.isfile(path):
+        os.remove(path)
+
 
 def get_sample_data_directory():
     return os.path.join(get_plugin_directory(), "sample_data")
@@ -100,6 +256,7 @@ def clear_cache():
         return
 
     shutil.rmtree(get_cache_directory(), ignore_errors=True)
+    _cache_entry_expiries.clear()
     info("Cache cleared")
 
 
@@ -111,7 +268,12 @@ def assure_temp_dirs_exist():
 
 def _assure_dir_exists(path):
     if not os.path.isdir(path):
-        os.makedirs(path)
+        try:
+            os.makedirs(path)
+        except OSError as e:
+            # the directory might have been created by another thread in the meantime
+            if e.errno != errno.EEXIST:
+                raise
 
 
 def get_geojson_file_name(name):
@@ -139,6 +301,29 @@ def is_gzipped(content):
     return result
 
 
+def is_zlib_compressed(content):
+    """
+     * Checks for a zlib header (RFC 1950): deflate compression method and a valid header checksum
+    """
+    result = False
+    if content and len(content) >= 2:
+        first_two_bytes = bytearray([content[0], content[1]])
+        result = first_two_bytes[0] & 0x0f == 8 and (first_two_bytes[0] << 8 | first_two_bytes[1]) % 31 == 0
+    return result
+
+
+def decompress(content):
+    """
+     * If the passed data is gzip or zlib compressed, it will be decompressed. Otherwise it will be returned untouched
+    :param content:
+    :return:
+    """
+    if is_gzipped(content) or is_zlib_compressed(content):
+        # 32 makes zlib detect the gzip or zlib header automatically
+        content = zlib.decompress(content, 32 + zlib.MAX_WBITS)
+    return content
+
+
 def are_headers_equal(content, expected_header_bytes):
     all_same = True
     br = bytearray(content)
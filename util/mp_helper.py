@@ -8,6 +8,7 @@ import sys
 import os
 
 from .log_helper import info, warn
+from .file_helper import decompress
 
 
 def decode_tile_python(tile_data_clip):
@@ -17,7 +18,7 @@ def decode_tile_python(tile_data_clip):
 
     decoded_data = None
     if encoded_data and not tile.decoded_data:
-        decoded_data = mapbox_vector_tile.decode(encoded_data)
+        decoded_data = mapbox_vector_tile.decode(decompress(encoded_data))
     return tile, decoded_data
 
 
@@ -70,7 +71,7 @@ def decode_tile_native(tile_data_clip):
             # with open(r"c:\temp\uster.pbf", 'wb') as f:
             #     f.write(tile_data_tuple[1])
             # encoded_data = bytearray(tile_data_tuple[1])
-            encoded_data = bytearray(data)
+            encoded_data = bytearray(decompress(data))
 
             hex_string = "".join("%02x" % b for b in encoded_data)
             hex_bytes = hex_string.encode(encoding='UTF-8')
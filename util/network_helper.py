@@ -1,8 +1,32 @@
+import re
+import time
 from .log_helper import warn, info, remove_key
 from .vtr_2to3 import *
 
+_URL_VALIDATION_MAX_AGE_SECONDS = 600
+_MAX_AGE_REGEX = re.compile(r"max-age\s*=\s*(\d+)")
+
+_url_validation_cache = {}
+
 
 def url_exists(url):
+    """
+     * Checks whether the specified URL can be reached. Successful checks are cached for the current session,
+       so that creating several sources for the same connection doesn't repeat the HEAD requests.
+    :param url:
+    :return: A tuple (success, error, url) where url is the location after following permanent redirects
+    """
+    cached = _url_validation_cache.get(url)
+    if cached and time.time() - cached[0] <= _URL_VALIDATION_MAX_AGE_SECONDS:
+        return cached[1]
+
+    result = _check_url(url)
+    if result[0]:
+        _url_validation_cache[url] = (time.time(), result)
+    return result
+
+
+def _check_url(url):
     reply = get_async_reply(url, head_only=True)
     while not reply.isFinished():
         QApplication.processEvents()
@@ -32,9 +56,11 @@ def url_exists(url):
     return success, error, url
 
 
-def get_async_reply(url, head_only=False):
+def get_async_reply(url, head_only=False, validators=None):
     m = QgsNetworkAccessManager.instance()
     req = QNetworkRequest(QUrl(url))
+    if validators:
+        _add_conditional_headers(req, validators)
     if head_only:
         reply = m.head(req)
     else:
@@ -42,60 +68,295 @@ def get_async_reply(url, head_only=False):
     return reply
 
 
-def load_tiles_async(urls_with_col_and_row, on_progress_changed=None, cancelling_func=None):
-    replies = [(get_async_reply(url), (col, row)) for url, col, row in urls_with_col_and_row]
+def load_tiles_async(urls_with_col_and_row, on_progress_changed=None, cancelling_func=None, validators_by_tile=None):
+    """
+     * Loads the specified tiles asynchronously and returns them once all requests are finished.
+     * If the loading is cancelled, the tiles loaded until then are returned.
+    :return: A list of tuples ((col, row), content, validators). See iter_tiles_async
+    """
+    return list(iter_tiles_async(urls_with_col_and_row=urls_with_col_and_row,
+                                 on_progress_changed=on_progress_changed,
+                                 cancelling_func=cancelling_func,
+                                 validators_by_tile=validators_by_tile))
+
+
+class NetworkStatistics(object):
+    """
+     * Collects the timing, status and size of network requests and aggregates them per host
+    """
+
+    def __init__(self):
+        self._hosts = {}
+
+    def add_request(self, host, status, duration, time_to_first_byte, bytes_transferred, bytes_received, error=None):
+        """
+         * Records a finished request
+        :param host:
+        :param status: The HTTP status code
+        :param duration: Seconds between sending the request and receiving the last byte
+        :param time_to_first_byte: Seconds between sending the request and receiving the response headers
+        :param bytes_transferred: The size of the response body on the wire (Content-Length), if known
+        :param bytes_received: The size of the response body after decoding the content encoding
+        :param error: The network error, if the request failed
+        """
+        stats = self._hosts.get(host)
+        if stats is None:
+            stats = {
+                "requests": 0,
+                "errors": 0,
+                "not_modified": 0,
+                "status_codes": {},
+                "duration": 0.0,
+                "time_to_first_byte": 0.0,
+                "max_time_to_first_byte": 0.0,
+                "bytes_transferred": 0,
+                "bytes_received": 0
+            }
+            self._hosts[host] = stats
+        stats["requests"] += 1
+        if error:
+            stats["errors"] += 1
+        if status == 304:
+            stats["not_modified"] += 1
+        if status is not None:
+            stats["status_codes"][status] = stats["status_codes"].get(status, 0) + 1
+        stats["duration"] += duration
+        stats["time_to_first_byte"] += time_to_first_byte
+        stats["max_time_to_first_byte"] = max(stats["max_time_to_first_byte"], time_to_first_byte)
+        if bytes_transferred is None:
+            bytes_transferred = bytes_received
+        stats["bytes_transferred"] += bytes_transferred
+        stats["bytes_received"] += bytes_received
+
+    def hosts(self):
+        return list(self._hosts.keys())
+
+    def summary(self):
+        """
+         * Returns the aggregated statistics per host and in total
+        :return: A dict {"hosts": {host: stats}, "total": stats}
+        """
+        hosts = {}
+        for host, stats in self._hosts.items():
+            hosts[host] = self._summarize([stats])
+        return {
+            "hosts": hosts,
+            "total": self._summarize(list(self._hosts.values()))
+        }
+
+    @staticmethod
+    def _summarize(all_stats):
+        nr_of_requests = sum(s["requests"] for s in all_stats)
+        nr_of_errors = sum(s["errors"] for s in all_stats)
+        duration = sum(s["duration"] for s in all_stats)
+        bytes_transferred = sum(s["bytes_transferred"] for s in all_stats)
+        bytes_received = sum(s["bytes_received"] for s in all_stats)
+        status_codes = {}
+        for s in all_stats:
+            for status, count in s["status_codes"].items():
+                status_codes[status] = status_codes.get(status, 0) + count
+        summary = {
+            "requests": nr_of_requests,
+            "errors": nr_of_errors,
+            "error_rate": 0.0,
+            "not_modified": sum(s["not_modified"] for s in all_stats),
+            "status_codes": status_codes,
+            "avg_time_to_first_byte": 0.0,
+            "max_time_to_first_byte": max([s["max_time_to_first_byte"] for s in all_stats] or [0.0]),
+            "avg_duration": 0.0,
+            "bytes_transferred": bytes_transferred,
+            "bytes_received": bytes_received,
+            "compression_ratio": None,
+            "throughput": None
+        }
+        if nr_of_requests:
+            summary["error_rate"] = float(nr_of_errors) / nr_of_requests
+            summary["avg_time_to_first_byte"] = sum(s["time_to_first_byte"] for s in all_stats) / nr_of_requests
+            summary["avg_duration"] = duration / nr_of_requests
+        if bytes_received:
+            summary["compression_ratio"] = float(bytes_transferred) / bytes_received
+        if duration > 0:
+            # bytes per second of a single connection, i.e. not considering parallel requests
+            summary["throughput"] = bytes_transferred / duration
+        return summary
+
+
+def iter_tiles_async(urls_with_col_and_row, on_progress_changed=None, cancelling_func=None, validators_by_tile=None,
+                     statistics=None):
+    """
+     * Loads the specified tiles asynchronously and yields each tile as soon as its request is finished.
+     * The Qt events are processed while waiting, also while the consumer isn't pulling new tiles.
+     * If the loading is cancelled, the tiles whose requests are finished already are yielded, the other requests
+       are aborted. They are aborted too, if the consumer closes the generator before all tiles are yielded.
+    :param urls_with_col_and_row: A list of tuples (url, col, row)
+    :param on_progress_changed:
+    :param cancelling_func:
+    :param validators_by_tile: The cache validators by (col, row). Tiles with validators are requested conditionally.
+    :param statistics: A NetworkStatistics instance to which the finished requests are added
+    :return: Tuples ((col, row), content, validators). The content is None, if the tile hasn't been modified.
+    """
+    replies = []
+    response_times = {}
+    for url, col, row in urls_with_col_and_row:
+        validators = None
+        if validators_by_tile:
+            validators = validators_by_tile.get((col, row))
+        reply = get_async_reply(url, validators=validators)
+        if statistics is not None:
+            timing = {"started": time.time(), "first_byte": None}
+            reply.metaDataChanged.connect(lambda t=timing: _set_first_byte_time(t))
+            response_times[(col, row)] = timing
+        replies.append((reply, (col, row)))
     total_nr_of_requests = len(replies)
-    all_finished = False
-    nr_finished_before = 0
-    finished_tiles = set()
+    unhandled_replies = set(r[0] for r in replies)
     nr_finished = 0
-    all_results = []
-    cancelling = False
-    while not all_finished:
-        cancelling = cancelling_func and cancelling_func()
-        if cancelling:
-            break
-
-        results = []
-        new_finished = [r for r in replies if r[0].isFinished() and r[1] not in finished_tiles]
-        nr_finished += len(new_finished)
-        for reply, tile_coord in new_finished:
-            finished_tiles.add(tile_coord)
-            error = reply.error()
-            if error:
-                info("Error during network request: {}, {}", error, reply.url())
-            else:
-                content = reply.readAll().data()
-                results.append((tile_coord, content))
-            reply.deleteLater()
-        QApplication.processEvents()
-        all_results.extend(results)
-        all_finished = nr_finished == total_nr_of_requests
-        if nr_finished != nr_finished_before:
-            nr_finished_before = nr_finished
+    try:
+        while nr_finished < total_nr_of_requests:
+            cancelling = cancelling_func and cancelling_func()
+            if not cancelling:
+                QApplication.processEvents()
+            new_finished = [r for r in replies if r[0].isFinished()]
+            if not new_finished:
+                if cancelling:
+                    break
+                continue
+
+            replies = [r for r in replies if not r[0].isFinished()]
+            nr_finished += len(new_finished)
             if on_progress_changed:
                 on_progress_changed(nr_finished)
-    if not all_finished and cancelling:
-        unfinished_requests = [r for r in replies if not r[0].isFinished]
-        for r in unfinished_requests:
-            r.abort()
-    if cancelling:
-        all_results = []
-    return all_results
+            for reply, tile_coord in new_finished:
+                error = reply.error()
+                status = reply.attribute(QNetworkRequest.HttpStatusCodeAttribute)
+                content = None
+                result = None
+                if error:
+                    info("Error during network request: {}, {}", error, reply.url())
+                else:
+                    if status != 304:
+                        content = reply.readAll().data()
+                    result = (tile_coord, content, get_cache_validators(reply))
+                if statistics is not None:
+                    _add_to_statistics(statistics, reply, status, error, content, response_times[tile_coord])
+                unhandled_replies.discard(reply)
+                reply.deleteLater()
+                if result:
+                    yield result
+            if cancelling:
+                break
+    finally:
+        # the requests still running when cancelling or when the generator is closed
+        for reply in unhandled_replies:
+            if not reply.isFinished():
+                reply.abort()
+            reply.deleteLater()
+
+
+def _set_first_byte_time(timing):
+    if timing["first_byte"] is None:
+        timing["first_byte"] = time.time()
+
+
+def _add_to_statistics(statistics, reply, status, error, content, timing):
+    finished = time.time()
+    first_byte = timing["first_byte"] or finished
+    content_length = _get_raw_header(reply, b"Content-Length")
+    bytes_transferred = None
+    if content_length and content_length.isdigit():
+        bytes_transferred = int(content_length)
+    bytes_received = 0
+    if content:
+        bytes_received = len(content)
+    statistics.add_request(host=reply.url().host(),
+                           status=status,
+                           duration=finished - timing["started"],
+                           time_to_first_byte=first_byte - timing["started"],
+                           bytes_transferred=bytes_transferred,
+                           bytes_received=bytes_received,
+                           error=error)
+
+
+def _add_conditional_headers(request, validators):
+    """
+     * Turns the request into a conditional request, i.e. the server will answer with 304 Not Modified
+       and without body, if the resource hasn't changed since the validators have been received.
+    :param request:
+    :param validators: The validators as returned by get_cache_validators
+    :return:
+    """
+    etag = validators.get("etag")
+    last_modified = validators.get("last_modified")
+    if etag:
+        request.setRawHeader(b"If-None-Match", etag.encode("utf-8"))
+    if last_modified:
+        request.setRawHeader(b"If-Modified-Since", last_modified.encode("utf-8"))
+    if etag or last_modified:
+        # the 304 has to reach us, otherwise the network cache of QGIS would answer the request
+        request.setAttribute(QNetworkRequest.CacheLoadControlAttribute, QNetworkRequest.AlwaysNetwork)
+
+
+def get_cache_validators(reply):
+    """
+     * Returns the validators (ETag, Last-Modified and the max-age of the Cache-Control header) of the reply.
+    :param reply:
+    :return: A dict with the keys 'etag', 'last_modified' and 'max_age'. Missing values are None.
+    """
+    validators = {
+        "etag": _get_raw_header(reply, b"ETag"),
+        "last_modified": _get_raw_header(reply, b"Last-Modified"),
+        "max_age": None
+    }
+    cache_control = _get_raw_header(reply, b"Cache-Control")
+    if cache_control:
+        if "no-cache" in cache_control or "no-store" in cache_control:
+            validators["max_age"] = 0
+        else:
+            match = _MAX_AGE_REGEX.search(cache_control)
+            if match:
+                validators["max_age"] = int(match.group(1))
+    return validators
+
+
+def _get_raw_header(reply, name):
+    value = None
+    if reply.hasRawHeader(name):
+        value = reply.rawHeader(name).data()
+        if not isinstance(value, str):
+            value = value.decode("utf-8")
+    return value
 
 
 def load_url(url):
-    reply = get_async_reply(url)
+    status, content, _ = load_url_with_validators(url)
+    return status, content
+
+
+def load_url_with_validators(url, validators=None):
+    """
+     * Loads the specified url and returns the HTTP status, the content and the cache validators of the response.
+     * If the validators of a previous response are specified, the request is sent conditionally. If the resource
+       hasn't been modified, the status 304 and an empty content are returned.
+    :param url:
+    :param validators:
+    :return:
+    """
+    reply = get_async_reply(url, validators=validators)
     while not reply.isFinished():
         QApplication.processEvents()
 
     http_status_code = reply.attribute(QNetworkRequest.HttpStatusCodeAttribute)
+    new_validators = None
     if http_status_code == 200:
         content = reply.readAll().data()
+        new_validators = get_cache_validators(reply)
+    elif http_status_code == 304:
+        content = None
+        new_validators = get_cache_validators(reply)
     else:
         if http_status_code is None:
             content = "Request failed: {}".format(reply.errorString())
         else:
             content = "Request failed: HTTP status {}".format(http_status_code)
         warn(content)
-    return http_status_code, content
+    reply.deleteLater()
+    return http_status_code, content, new_validators
@@ -0,0 +1,261 @@
+from .feature_helper import geo_types, GeoTypes
+
+# the buffer around an overzoomed tile as fraction of the tile size, like the buffer of the tiles of a source
+_BUFFER_RATIO = 1.0 / 64
+
+
+def get_overzoomed_data(decoded_data, parent_tile, tile):
+    """
+     * Returns the decoded data of the tile, created from the decoded data of its parent on a lower zoom level.
+     * The features are clipped at the bounds of the tile plus a buffer. The tile-local coordinates of the features
+       decoded by the python decoder are rescaled to the extent of the tile, so that the data looks like the data
+       of a tile loaded from the source. The GeoJSON of the native decoder already has absolute coordinates.
+    :param decoded_data: The decoded data of the parent tile
+    :param parent_tile: The VectorTile of the parent
+    :param tile: The VectorTile to create the data for
+    :return: A dict with the layers containing features within the tile
+    """
+    levels = tile.zoom_level - parent_tile.zoom_level
+    if levels < 0:
+        raise RuntimeError("{} is not a child of {}".format(tile, parent_tile))
+    data = {}
+    for layer_name in decoded_data:
+        layer = decoded_data[layer_name]
+        if layer.get("isGeojson"):
+            clipped_layer = _clip_geojson_layer(layer, tile)
+        else:
+            clipped_layer = _clip_layer(layer, parent_tile, tile, 1 << levels)
+        if clipped_layer:
+            data[layer_name] = clipped_layer
+    return data
+
+
+def _get_box(extent, buffer_size):
+    return extent[0] - buffer_size, extent[1] - buffer_size, extent[2] + buffer_size, extent[3] + buffer_size
+
+
+def _clip_layer(layer, parent_tile, tile, scale):
+    """
+     * Clips the features of a layer with tile-local coordinates, whose y axis points up
+    """
+    layer_extent = layer.get("extent", 4096)
+    parent_extent = parent_tile.extent
+    child_extent = tile.extent
+    x_factor = layer_extent / (parent_extent[2] - parent_extent[0])
+    y_factor = layer_extent / (parent_extent[3] - parent_extent[1])
+    # the tile-local coordinates of the lower left corner of the child in the parent
+    x_origin = int(round((child_extent[0] - parent_extent[0]) * x_factor))
+    y_origin = int(round((child_extent[1] - parent_extent[1]) * y_factor))
+    size = float(layer_extent) / scale
+    box = _get_box((x_origin, y_origin, x_origin + size, y_origin + size), size * _BUFFER_RATIO)
+
+    features = []
+    for feature in layer["features"]:
+        coordinates = _clip_coordinates(geo_types[feature["type"]], feature["geometry"], box)
+        if coordinates:
+            clipped_feature = dict(feature)
+            clipped_feature["geometry"] = _rescale(coordinates, x_origin, y_origin, scale)
+            features.append(clipped_feature)
+    if not features:
+        return None
+    clipped_layer = dict(layer)
+    clipped_layer["features"] = features
+    return clipped_layer
+
+
+def _clip_geojson_layer(layer, tile):
+    """
+     * Clips the GeoJSON features with absolute coordinates, which are grouped by geometry type
+    """
+    extent = tile.extent
+    box = _get_box(extent, (extent[2] - extent[0]) * _BUFFER_RATIO)
+    clipped_layer = dict(layer)
+    has_features = False
+    for geo_type in geo_types.values():
+        features = []
+        for feature in layer.get(geo_type) or []:
+            geometry = feature["geometry"]
+            coordinates = geometry["coordinates"]
+            if geometry["type"] == GeoTypes.POINT:
+                coordinates = [coordinates]
+            coordinates = _clip_coordinates(geo_type, coordinates, box)
+            if coordinates:
+                type_name = geo_type
+                if geo_type == GeoTypes.POINT and len(coordinates) == 1:
+                    coordinates = coordinates[0]
+                elif _is_multi(geo_type, coordinates):
+                    type_name = "Multi{}".format(geo_type)
+                properties = dict(feature["properties"])
+                properties["_col"] = tile.column
+                properties["_row"] = tile.row
+                properties["_zoom"] = tile.zoom_level
+                clipped_feature = dict(feature)
+                clipped_feature["geometry"] = {"type": type_name, "coordinates": coordinates}
+                clipped_feature["properties"] = properties
+                features.append(clipped_feature)
+        clipped_layer[geo_type] = features
+        has_features = has_features or len(features) > 0
+    if not has_features:
+        return None
+    return clipped_layer
+
+
+def _clip_coordinates(geo_type, coordinates, box):
+    """
+     * Returns the coordinates clipped at the box or None, if nothing of the geometry is within the box.
+     * The geometry is returned unchanged, if it's completely within the box.
+    """
+    bbox = _get_bbox(coordinates)
+    if bbox is None or bbox[0] > box[2] or bbox[2] < box[0] or bbox[1] > box[3] or bbox[3] < box[1]:
+        return None
+    if box[0] <= bbox[0] and bbox[2] <= box[2] and box[1] <= bbox[1] and bbox[3] <= box[3]:
+        return coordinates
+
+    if geo_type == GeoTypes.POINT:
+        clipped = [p for p in coordinates if _contains(box, p)]
+    elif geo_type == GeoTypes.LINE_STRING:
+        lines = coordinates if _is_multi(geo_type, coordinates) else [coordinates]
+        clipped = [part for line in lines for part in _clip_line(line, box)]
+        if len(clipped) == 1:
+            clipped = clipped[0]
+    else:
+        polygons = coordinates if _is_multi(geo_type, coordinates) else [coordinates]
+        clipped = [p for p in (_clip_polygon(rings, box) for rings in polygons) if p]
+        if len(clipped) == 1:
+            clipped = clipped[0]
+    return clipped or None
+
+
+def _is_multi(geo_type, coordinates):
+    """
+     * Returns True, if the coordinates are nested deeper than the ones of a single geometry of the type.
+       The points are always passed as a list of points.
+    """
+    depth = 0
+    c = coordinates
+    while c and isinstance(c[0], (list, tuple)):
+        depth += 1
+        c = c[0]
+    single_depth = {GeoTypes.POINT: 0, GeoTypes.LINE_STRING: 1, GeoTypes.POLYGON: 2}[geo_type]
+    return depth > single_depth
+
+
+def _get_bbox(coordinates):
+    x_min = y_min = float("inf")
+    x_max = y_max = float("-inf")
+    stack = [coordinates]
+    while stack:
+        c = stack.pop()
+        if not c:
+            continue
+        if isinstance(c[0], (list, tuple)):
+            stack.extend(c)
+        else:
+            x_min = min(x_min, c[0])
+            y_min = min(y_min, c[1])
+            x_max = max(x_max, c[0])
+            y_max = max(y_max, c[1])
+    if x_min > x_max:
+        return None
+    return x_min, y_min, x_max, y_max
+
+
+def _contains(box, point):
+    return box[0] <= point[0] <= box[2] and box[1] <= point[1] <= box[3]
+
+
+def _clip_segment(a, b, box):
+    """
+     * Clips the segment a-b at the box (Liang-Barsky)
+    :return: The tuple (start, end) of the part within the box or None
+    """
+    t0 = 0.0
+    t1 = 1.0
+    dx = b[0] - a[0]
+    dy = b[1] - a[1]
+    for p, q in ((-dx, a[0] - box[0]), (dx, box[2] - a[0]), (-dy, a[1] - box[1]), (dy, box[3] - a[1])):
+        if p == 0:
+            if q < 0:
+                return None
+        else:
+            t = float(q) / p
+            if p < 0:
+                if t > t1:
+                    return None
+                t0 = max(t0, t)
+            else:
+                if t < t0:
+                    return None
+                t1 = min(t1, t)
+    start = a if t0 == 0 else [a[0] + t0 * dx, a[1] + t0 * dy]
+    end = b if t1 == 1 else [a[0] + t1 * dx, a[1] + t1 * dy]
+    return start, end
+
+
+def _clip_line(line, box):
+    """
+     * Returns the parts of the line within the box
+    """
+    parts = []
+    current = None
+    for i in range(len(line) - 1):
+        segment = _clip_segment(line[i], line[i + 1], box)
+        if segment is None:
+            current = None
+            continue
+        start, end = segment
+        if current is None or current[-1] is not start:
+            current = [start]
+            parts.append(current)
+        current.append(end)
+        if end is not line[i + 1]:
+            # the line leaves the box
+            current = None
+    return [p for p in parts if len(p) >= 2]
+
+
+def _clip_polygon(rings, box):
+    """
+     * Clips the rings of a polygon at the box (Sutherland-Hodgman)
+    :return: The clipped rings or None, if the outer ring is outside of the box
+    """
+    clipped_rings = []
+    for index, ring in enumerate(rings):
+        clipped = _clip_ring(ring, box)
+        if len(clipped) < 4:
+            if index == 0:
+                return None
+            continue
+        clipped_rings.append(clipped)
+    return clipped_rings
+
+
+def _clip_ring(ring, box):
+    points = list(ring[:-1]) if ring and ring[0] == ring[-1] else list(ring)
+    for axis, limit, is_min in ((0, box[0], True), (0, box[2], False), (1, box[1], True), (1, box[3], False)):
+        if not points:
+            break
+        clipped = []
+        previous = points[-1]
+        previous_inside = previous[axis] >= limit if is_min else previous[axis] <= limit
+        for point in points:
+            inside = point[axis] >= limit if is_min else point[axis] <= limit
+            if inside != previous_inside:
+                t = float(limit - previous[axis]) / (point[axis] - previous[axis])
+                intersection = [previous[0] + t * (point[0] - previous[0]), previous[1] + t * (point[1] - previous[1])]
+                intersection[axis] = limit
+                clipped.append(intersection)
+            if inside:
+                clipped.append(point)
+            previous = point
+            previous_inside = inside
+        points = clipped
+    if points:
+        points.append(points[0])
+    return points
+
+
+def _rescale(coordinates, x_origin, y_origin, scale):
+    if not isinstance(coordinates[0], (list, tuple)):
+        return [int(round((coordinates[0] - x_origin) * scale)), int(round((coordinates[1] - y_origin) * scale))]
+    return [_rescale(c, x_origin, y_origin, scale) for c in coordinates]
@@ -0,0 +1,172 @@
+import struct
+from bisect import bisect_right
+
+from .file_helper import decompress
+
+HEADER_SIZE_BYTES = 127
+# the root directory and up to two levels of leaf directories
+MAX_DIRECTORY_DEPTH = 3
+
+_MAGIC = b"PMTiles"
+_VERSION = 3
+_HEADER_FORMAT = "<7sB11Q6B4iB2i"
+
+
+class Compression(object):
+    Unknown = 0
+    NoCompression = 1
+    Gzip = 2
+    Brotli = 3
+    Zstd = 4
+
+
+class TileType(object):
+    Unknown = 0
+    Mvt = 1
+
+
+def read_header(data):
+    """
+     * Parses the fixed size header at the beginning of a PMTiles v3 archive
+    :param data: The first HEADER_SIZE_BYTES bytes of the archive
+    :return: A dict with the fields of the header
+    """
+    if len(data) < HEADER_SIZE_BYTES:
+        raise RuntimeError("The file is too small to be a PMTiles archive")
+    values = struct.unpack(_HEADER_FORMAT, bytes(data[:HEADER_SIZE_BYTES]))
+    if values[0] != _MAGIC:
+        raise RuntimeError("The file is not a PMTiles archive")
+    if values[1] != _VERSION:
+        raise RuntimeError("PMTiles version {} is not supported, only version {} is".format(values[1], _VERSION))
+    return {
+        "root_offset": values[2],
+        "root_length": values[3],
+        "metadata_offset": values[4],
+        "metadata_length": values[5],
+        "leaf_directory_offset": values[6],
+        "leaf_directory_length": values[7],
+        "tile_data_offset": values[8],
+        "tile_data_length": values[9],
+        "addressed_tiles_count": values[10],
+        "tile_entries_count": values[11],
+        "tile_contents_count": values[12],
+        "clustered": values[13] == 1,
+        "internal_compression": values[14],
+        "tile_compression": values[15],
+        "tile_type": values[16],
+        "min_zoom": values[17],
+        "max_zoom": values[18],
+        "min_lon": values[19] / 1e7,
+        "min_lat": values[20] / 1e7,
+        "max_lon": values[21] / 1e7,
+        "max_lat": values[22] / 1e7,
+        "center_zoom": values[23],
+        "center_lon": values[24] / 1e7,
+        "center_lat": values[25] / 1e7
+    }
+
+
+def decompress_internal(data, compression):
+    """
+     * Decompresses a directory or the metadata of an archive
+    """
+    if compression == Compression.NoCompression:
+        return data
+    if compression == Compression.Gzip:
+        return decompress(data)
+    raise RuntimeError("The compression {} of the PMTiles archive is not supported".format(compression))
+
+
+def zxy_to_tile_id(zoom, col, row):
+    """
+     * Returns the id of a tile in xyz scheme. The ids of all lower zoom levels come first, the tiles within
+       a zoom level are numbered along a Hilbert curve.
+    """
+    tile_id = ((1 << (2 * zoom)) - 1) // 3
+    n = 1 << zoom
+    s = n >> 1
+    x = col
+    y = row
+    while s > 0:
+        rx = 1 if x & s else 0
+        ry = 1 if y & s else 0
+        tile_id += s * s * ((3 * rx) ^ ry)
+        if ry == 0:
+            if rx == 1:
+                x = n - 1 - x
+                y = n - 1 - y
+            x, y = y, x
+        s >>= 1
+    return tile_id
+
+
+def _read_varint(data, position):
+    value = 0
+    shift = 0
+    while True:
+        b = data[position]
+        position += 1
+        value |= (b & 0x7f) << shift
+        if b < 0x80:
+            return value, position
+        shift += 7
+
+
+class Directory(object):
+    """
+     * A decompressed directory of an archive. The entries are stored in parallel lists sorted by tile id.
+     * Entries with a run length of 0 point to a leaf directory, all others to the data of
+       run_length consecutive tiles.
+    """
+
+    def __init__(self, tile_ids, run_lengths, lengths, offsets):
+        self.tile_ids = tile_ids
+        self.run_lengths = run_lengths
+        self.lengths = lengths
+        self.offsets = offsets
+
+    @staticmethod
+    def deserialize(data):
+        data = bytearray(data)
+        nr_of_entries, position = _read_varint(data, 0)
+        tile_ids = []
+        run_lengths = []
+        lengths = []
+        offsets = []
+        last_id = 0
+        for _ in range(nr_of_entries):
+            delta, position = _read_varint(data, position)
+            last_id += delta
+            tile_ids.append(last_id)
+        for _ in range(nr_of_entries):
+            value, position = _read_varint(data, position)
+            run_lengths.append(value)
+        for _ in range(nr_of_entries):
+            value, position = _read_varint(data, position)
+            lengths.append(value)
+        for i in range(nr_of_entries):
+            value, position = _read_varint(data, position)
+            if value == 0 and i > 0:
+                # 0 means the data directly follows the data of the previous entry
+                offsets.append(offsets[i - 1] + lengths[i - 1])
+            else:
+                offsets.append(value - 1)
+        return Directory(tile_ids, run_lengths, lengths, offsets)
+
+    def find(self, tile_id):
+        """
+         * Returns the tuple (offset, length, is_leaf) of the entry containing the tile or None,
+           if the tile isn't in the directory
+        """
+        index = bisect_right(self.tile_ids, tile_id) - 1
+        if index < 0:
+            return None
+        run_length = self.run_lengths[index]
+        if run_length == 0:
+            return self.offsets[index], self.lengths[index], True
+        if tile_id < self.tile_ids[index] + run_length:
+            return self.offsets[index], self.lengths[index], False
+        return None
+
+    def __len__(self):
+        return len(self.tile_ids)
@@ -0,0 +1,191 @@
+import os
+import sqlite3
+import sys
+import threading
+try:
+    from urllib.request import pathname2url
+except ImportError:
+    from urllib import pathname2url
+
+from .log_helper import debug, critical, warn
+
+_MMAP_SIZE_BYTES = 256 * 1024 * 1024
+_CACHE_SIZE_KIB = 16 * 1024
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_connection_pool(path):
+    """
+     * Returns the connection pool of the specified SQLite file. The pool is shared by all sources of the file.
+     * A new pool is created, if the file has been replaced or modified since the pool has been created.
+       The pools of the previous versions of the file aren't handed out anymore and are closed, as soon as
+       their last user releases them.
+     * Each call has to be paired with a call of release_connection_pool
+    :param path:
+    :return:
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    key = (path, stat.st_mtime, stat.st_size)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            for stale_key in [k for k in _pools if k[0] == path]:
+                debug("Connection pool of '{}' is outdated", path)
+                del _pools[stale_key]
+            pool = ReadOnlyConnectionPool(path)
+            _pools[key] = pool
+        pool.nr_of_users += 1
+    return pool
+
+
+def release_connection_pool(pool):
+    """
+     * Releases a pool returned by get_connection_pool. The pool is closed, once it has no users anymore.
+    :param pool:
+    :return:
+    """
+    with _pools_lock:
+        pool.nr_of_users -= 1
+        if pool.nr_of_users > 0:
+            return
+        for key in [k for k, p in _pools.items() if p is pool]:
+            del _pools[key]
+    pool.close()
+
+
+def close_connection_pools():
+    """
+     * Closes the connections of all pools, e.g. when the plugin is unloaded. The pools still in use
+       reconnect with their next access.
+    """
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+class MetadataSnapshot(object):
+    """
+     * Immutable copy of a metadata table with name and value columns
+    """
+
+    def __init__(self, values):
+        self._values = dict(values)
+
+    def get(self, name, default=None):
+        return self._values.get(name, default)
+
+    def names(self):
+        return list(self._values.keys())
+
+    def __contains__(self, name):
+        return name in self._values
+
+
+class ReadOnlyConnectionPool(object):
+    """
+     * Hands out one read-only connection per thread. SQLite connections must not be used by several threads at
+       the same time, so each thread gets its own one. Released connections are reused by the next thread.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.nr_of_users = 0
+        self._local = threading.local()
+        self._connections = []
+        self._free_connections = []
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._metadata = None
+
+    def connection(self):
+        """
+         * Returns the connection of the current thread
+        """
+        conn = self._get_local_connection()
+        if conn is None:
+            with self._lock:
+                if self._free_connections:
+                    conn = self._free_connections.pop()
+            if conn is None:
+                conn = self._connect()
+                with self._lock:
+                    self._connections.append(conn)
+            self._local.connection = conn
+            self._local.generation = self._generation
+        return conn
+
+    def release(self):
+        """
+         * Returns the connection of the current thread to the pool
+        """
+        conn = self._get_local_connection()
+        self._local.connection = None
+        if conn is not None:
+            with self._lock:
+                self._free_connections.append(conn)
+
+    def close(self):
+        """
+         * Closes all connections of the pool, including the ones still held by a thread
+        """
+        with self._lock:
+            connections = self._connections
+            self._connections = []
+            self._free_connections = []
+            self._generation += 1
+        self._local.connection = None
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                warn("Closing connection failed: {}", sys.exc_info()[1])
+        if connections:
+            debug("{} connections to '{}' closed", len(connections), self.path)
+
+    def _get_local_connection(self):
+        """
+         * Returns the connection of the current thread, if it hasn't been closed by close() in the meantime
+        """
+        conn = getattr(self._local, "connection", None)
+        if conn is not None and getattr(self._local, "generation", None) != self._generation:
+            conn = None
+            self._local.connection = None
+        return conn
+
+    def metadata(self):
+        """
+         * Returns the metadata table, which is only read once per file
+        :return: MetadataSnapshot
+        """
+        if self._metadata is None:
+            values = {}
+            try:
+                rows = self.connection().execute("select name, value from metadata").fetchall()
+                values = dict((row["name"], row["value"]) for row in rows)
+            except sqlite3.Error:
+                warn("Reading metadata table of '{}' failed: {}", self.path, sys.exc_info()[1])
+            self._metadata = MetadataSnapshot(values)
+        return self._metadata
+
+    def _connect(self):
+        debug("Connecting to: {}", self.path)
+        uri = "file:{}?mode=ro&immutable=1".format(pathname2url(self.path))
+        try:
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        except TypeError:
+            # the uri parameter is not supported before Python 3.4
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+        except sqlite3.OperationalError:
+            critical("Read-only connection failed, falling back to default connection: {}", sys.exc_info()[1])
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA query_only = 1")
+        conn.execute("PRAGMA mmap_size = {}".format(_MMAP_SIZE_BYTES))
+        conn.execute("PRAGMA cache_size = -{}".format(_CACHE_SIZE_KIB))
+        debug("Successfully connected")
+        return conn
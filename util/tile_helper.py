@@ -1,5 +1,7 @@
 import itertools
-import operator
+import heapq
+import threading
+from bisect import bisect_left, bisect_right
 from .global_map_tiles import GlobalMercator
 from .log_helper import debug
 from .vtr_2to3 import *
@@ -16,17 +18,47 @@ if sys.version_info[0] < 3:
 WORLD_BOUNDS = [-180, -85.05112878, 180, 85.05112878]
 
 
+_MERCATOR = GlobalMercator(tileSize=512)
+_MAX_CACHED_TILE_EXTENTS = 65536
+_tile_extents = {}
+_MAX_CACHED_CENTER_TILES = 64
+_center_tiles_by_extent = {}
+_transforms = {}
+_transforms_lock = threading.RLock()
+
+
 class VectorTile(object):
-    
-    decoded_data = None
+    """
+     * The tiles only store their coordinates. The extent is computed when it's accessed the first time.
+     * As there are no per-instance dicts, attributes which aren't listed in __slots__ can't be set.
+    """
+
+    __slots__ = ("scheme", "zoom_level", "column", "row", "_extent", "decoded_data", "validators", "payload_id")
 
     def __init__(self, scheme, zoom_level, x, y):
         self.scheme = scheme
         self.zoom_level = int(zoom_level)
         self.column = int(x)
         self.row = int(y)
-        self.extent = tile_to_latlon(self.zoom_level, self.column, self.row, self.scheme)
-    
+        self._extent = None
+        self.decoded_data = None
+        self.validators = None
+        self.payload_id = None
+
+    @property
+    def extent(self):
+        if self._extent is None:
+            self._extent = tile_to_latlon(self.zoom_level, self.column, self.row, self.scheme)
+        return self._extent
+
+    def __getstate__(self):
+        # required to pickle objects with __slots__ with the pickle protocols 0 and 1
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
     def __str__(self):
         return "Tile ({}, {}, {})".format(self.zoom_level, self.column, self.row)
 
@@ -36,6 +68,9 @@ class VectorTile(object):
     def coord(self):
         return self.column, self.row
 
+    def key(self):
+        return get_tile_key(self.zoom_level, self.column, self.row)
+
 
 def clamp(value, low=None, high=None):
     if low is not None and value < low:
@@ -74,16 +109,26 @@ def create_bounds(zoom, x_min, x_max, y_min, y_max, scheme):
 
 
 def center_tiles_equal(tile_limit, extent_a, extent_b):
+    if TileRange.from_bounds(extent_a) == TileRange.from_bounds(extent_b):
+        return True
     center_tiles_a = _center_tiles(tile_limit=tile_limit, extent=extent_a)
     center_tiles_b = _center_tiles(tile_limit=tile_limit, extent=extent_b)
     return center_tiles_a == center_tiles_b
 
 
 def _center_tiles(tile_limit, extent):
-    tiles = list(itertools.product(
-        range(extent["x_min"], extent["x_max"] + 1),
-        range(extent["y_min"], extent["y_max"] + 1)))
-    center_tiles = get_tiles_from_center(nr_of_tiles=tile_limit, available_tiles=tiles)
+    """
+     * Returns the center tiles of the extent. The result is memoised, as the same extents are compared
+       repeatedly while the map is being panned.
+    """
+    tiles = TileRange.from_bounds(extent)
+    key = (tile_limit, tiles)
+    center_tiles = _center_tiles_by_extent.get(key)
+    if center_tiles is None:
+        center_tiles = frozenset(tiles[:tile_limit])
+        if len(_center_tiles_by_extent) >= _MAX_CACHED_CENTER_TILES:
+            _center_tiles_by_extent.clear()
+        _center_tiles_by_extent[key] = center_tiles
     return center_tiles
 
 
@@ -106,9 +151,12 @@ def latlon_to_tile(zoom, lat, lng, source_crs, scheme="xyz"):
 
     if get_code_from_epsg(source_crs) != 3857:
         lng, lat = convert_coordinate(source_crs=source_crs, target_crs=3857, lat=lat, lng=lng)
-    gm = GlobalMercator(tileSize=512)
+    return _meters_to_tile(zoom, lng, lat, scheme)
+
+
+def _meters_to_tile(zoom, x, y, scheme):
     global_mercator_output_scheme = "tms"
-    col, row = gm.MetersToTile(mx=lng, my=lat, zoom=zoom)   # GlobalMercator returns in TMS scheme here
+    col, row = _MERCATOR.MetersToTile(mx=x, my=y, zoom=zoom)   # GlobalMercator returns in TMS scheme here
     col = clamp(col, low=0)
     row = clamp(row, low=0)
     if scheme != global_mercator_output_scheme:
@@ -117,22 +165,58 @@ def latlon_to_tile(zoom, lat, lng, source_crs, scheme="xyz"):
     return int(col), int(row)
 
 
+def get_coordinate_transform(source_crs, target_crs):
+    """
+     * Returns the QgsCoordinateTransform between the two CRS.
+     * The transforms are cached by the EPSG codes, i.e. the CRS objects are created only once per pair of codes.
+    :param source_crs: The EPSG code of the source CRS, either as int or in the form 'EPSG:4326'
+    :param target_crs: The EPSG code of the target CRS
+    """
+    key = (get_code_from_epsg(source_crs), get_code_from_epsg(target_crs))
+    with _transforms_lock:
+        xform = _transforms.get(key)
+        if xform is None:
+            crs_src = QgsCoordinateReferenceSystem(key[0])
+            crs_dest = QgsCoordinateReferenceSystem(key[1])
+            if QGIS3:
+                xform = QgsCoordinateTransform(crs_src, crs_dest, QgsProject.instance())
+            else:
+                xform = QgsCoordinateTransform(crs_src, crs_dest)
+            _transforms[key] = xform
+    return xform
+
+
+def clear_coordinate_transforms():
+    """
+     * Removes the cached transforms, e.g. when the project and thereby the transform context changes
+    """
+    with _transforms_lock:
+        _transforms.clear()
+
+
 def convert_coordinate(source_crs, target_crs, lat, lng):
-    source_crs = get_code_from_epsg(source_crs)
-    target_crs = get_code_from_epsg(target_crs)
+    return convert_coordinates(source_crs, target_crs, [(lng, lat)])[0]
 
-    crs_src = QgsCoordinateReferenceSystem(source_crs)
-    crs_dest = QgsCoordinateReferenceSystem(target_crs)
-    if QGIS3:
-        xform = QgsCoordinateTransform(crs_src, crs_dest, QgsProject.instance())
-    else:
-        xform = QgsCoordinateTransform(crs_src, crs_dest)
 
-    try:
-        x, y = xform.transform(QgsPoint(lng, lat))
-    except TypeError:
-        x, y = xform.transform(lng, lat)
-    return x, y
+def convert_coordinates(source_crs, target_crs, points):
+    """
+     * Transforms many points with the same transform
+    :param points: A list of tuples (lng, lat) or (x, y) respectively
+    :return: A list of tuples (x, y) in the target CRS
+    """
+    if get_code_from_epsg(source_crs) == get_code_from_epsg(target_crs):
+        return [(x, y) for x, y in points]
+    xform = get_coordinate_transform(source_crs, target_crs)
+    result = []
+    # the transforms are shared with the loading thread
+    with _transforms_lock:
+        for lng, lat in points:
+            try:
+                x, y = xform.transform(QgsPoint(lng, lat))
+            except TypeError:
+                x, y = xform.transform(lng, lat)
+            result.append((x, y))
+    return result
 
 
 def get_code_from_epsg(epsg_string):
@@ -145,6 +229,7 @@ def get_code_from_epsg(epsg_string):
 def tile_to_latlon(zoom, x, y, scheme="tms"):
     """
      * Returns the tile extent in ESPG:3857 coordinates
+     * The extents are memoised, as the same tiles are requested again and again while panning
     :param zoom:
     :param x:
     :param y:
@@ -152,10 +237,16 @@ def tile_to_latlon(zoom, x, y, scheme="tms"):
     :return:
     """
 
-    gm = GlobalMercator(tileSize=512)
-    if scheme != "tms":
-        y = change_scheme(zoom, y)
-    return gm.TileBounds(x, y, zoom)
+    key = (zoom, x, y, scheme == "tms")
+    extent = _tile_extents.get(key)
+    if extent is None:
+        if scheme != "tms":
+            y = change_scheme(zoom, y)
+        extent = _MERCATOR.TileBounds(x, y, zoom)
+        if len(_tile_extents) >= _MAX_CACHED_TILE_EXTENTS:
+            _tile_extents.clear()
+        _tile_extents[key] = extent
+    return extent
 
 
 def get_tile_bounds(zoom, bounds, source_crs, scheme="xyz"):
@@ -176,8 +267,11 @@ def get_tile_bounds(zoom, bounds, source_crs, scheme="xyz"):
         lng_max = bounds[2]
         lat_max = bounds[3]
 
-        xy_min = latlon_to_tile(zoom=zoom, lat=lat_min, lng=lng_min, source_crs=source_crs, scheme=scheme)
-        xy_max = latlon_to_tile(zoom=zoom, lat=lat_max, lng=lng_max, source_crs=source_crs, scheme=scheme)
+        if zoom is None:
+            raise RuntimeError("zoom is required")
+        corners = convert_coordinates(source_crs, 3857, [(lng_min, lat_min), (lng_max, lat_max)])
+        xy_min = _meters_to_tile(zoom, corners[0][0], corners[0][1], scheme)
+        xy_max = _meters_to_tile(zoom, corners[1][0], corners[1][1], scheme)
 
         x_min = min(xy_min[0], xy_max[0])
         x_max = max(xy_min[0], xy_max[0])
@@ -192,21 +286,121 @@ def get_tile_bounds(zoom, bounds, source_crs, scheme="xyz"):
     return tile_bounds
 
 
-def get_all_tiles(bounds, is_cancel_requested_handler):
-    tiles = []
-    width = bounds["width"]
-    height = bounds["height"]
-    x_min = bounds["x_min"]
-    y_min = bounds["y_min"]
-    debug("Preprocessing {} tiles", width*height)
-    for x in range(width):
-        if is_cancel_requested_handler():
-            break
-        for y in range(height):
-            col = x + x_min
-            row = y + y_min
-            tiles.append((col, row))
-    return tiles
+def get_all_tiles(bounds):
+    """
+     * Returns the TileRange of the bounds. The tiles aren't materialised, they're created while iterating the range.
+    """
+    debug("Preprocessing {} tiles", bounds["width"] * bounds["height"])
+    return TileRange.from_bounds(bounds)
+
+
+def get_parent_range(tile_range, levels):
+    """
+     * Returns the TileRange of the parents of the tiles, the specified number of zoom levels up
+    """
+    return TileRange(tile_range.x_min >> levels, tile_range.y_min >> levels,
+                     tile_range.x_max >> levels, tile_range.y_max >> levels)
+
+
+def get_surrounding_tiles(tile_range, within, distance=1):
+    """
+     * Returns the tiles around the TileRange up to the specified distance, nearest tiles first
+    :param within: The TileRange of the tiles which may be returned, e.g. the bounds of the source
+    """
+    outer = TileRange(tile_range.x_min - distance, tile_range.y_min - distance,
+                      tile_range.x_max + distance, tile_range.y_max + distance)
+    return [t for t in outer.intersection(within) if t not in tile_range]
+
+
+class TileRange(object):
+    """
+     * The rectangle of tiles between (x_min, y_min) and (x_max, y_max), both inclusive.
+     * The tiles are iterated from the center outwards, ring by ring, in the same order as get_tiles_from_center
+       selects them. Slicing a range, e.g. tile_range[:max_tiles], only creates the tiles being returned.
+    """
+
+    __slots__ = ("x_min", "y_min", "x_max", "y_max")
+
+    def __init__(self, x_min, y_min, x_max, y_max):
+        self.x_min = int(x_min)
+        self.y_min = int(y_min)
+        self.x_max = int(x_max)
+        self.y_max = int(y_max)
+
+    @staticmethod
+    def from_bounds(bounds):
+        return TileRange(bounds["x_min"], bounds["y_min"], bounds["x_max"], bounds["y_max"])
+
+    def center(self):
+        return (self.x_min + _get_center_offset(self.x_max - self.x_min),
+                self.y_min + _get_center_offset(self.y_max - self.y_min))
+
+    def intersection(self, other):
+        """
+         * Returns the TileRange of the tiles in both ranges, if other is a TileRange. Otherwise, other is expected
+           to support the in operator (e.g. a set or a ZoomIndex) and the tiles of this range, which are in other,
+           are returned as list in the order of the range.
+        """
+        if isinstance(other, TileRange):
+            return TileRange(max(self.x_min, other.x_min), max(self.y_min, other.y_min),
+                             min(self.x_max, other.x_max), min(self.y_max, other.y_max))
+        return [t for t in self if t in other]
+
+    def __len__(self):
+        return max(0, self.x_max - self.x_min + 1) * max(0, self.y_max - self.y_min + 1)
+
+    def __contains__(self, tile):
+        return self.x_min <= tile[0] <= self.x_max and self.y_min <= tile[1] <= self.y_max
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            raise TypeError("TileRange only supports slicing")
+        return list(itertools.islice(self, key.start, key.stop, key.step))
+
+    def __eq__(self, other):
+        return isinstance(other, TileRange) and \
+               (self.x_min, self.y_min, self.x_max, self.y_max) == (other.x_min, other.y_min, other.x_max, other.y_max)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((self.x_min, self.y_min, self.x_max, self.y_max))
+
+    def __repr__(self):
+        return "TileRange({}, {}, {}, {})".format(self.x_min, self.y_min, self.x_max, self.y_max)
+
+    def __iter__(self):
+        if len(self) == 0:
+            return
+        cx, cy = self.center()
+        yield cx, cy
+        max_distance = max(cx - self.x_min, self.x_max - cx, cy - self.y_min, self.y_max - cy)
+        for r in range(1, max_distance + 1):
+            for t in self._iter_ring(cx, cy, r):
+                yield t
+
+    def _iter_ring(self, cx, cy, r):
+        """
+         * Yields the tiles within the range with the distance r from the center. Each ring starts right of the
+           top left corner and runs clockwise: top, right, bottom and left side.
+        """
+        y = cy - r
+        if y >= self.y_min:
+            for x in range(max(cx - r + 1, self.x_min), min(cx + r, self.x_max) + 1):
+                yield x, y
+        x = cx + r
+        if x <= self.x_max:
+            for y in range(max(cy - r + 1, self.y_min), min(cy + r, self.y_max) + 1):
+                yield x, y
+        y = cy + r
+        if y <= self.y_max:
+            for x in range(min(cx + r - 1, self.x_max), max(cx - r, self.x_min) - 1, -1):
+                yield x, y
+        x = cx - r
+        if x >= self.x_min:
+            for y in range(min(cy + r - 1, self.y_max), max(cy - r, self.y_min) - 1, -1):
+                yield x, y
 
 
 def change_scheme(zoom, y):
@@ -218,20 +412,123 @@ def change_scheme(zoom, y):
     """
     return (2 ** zoom) - y - 1
 
-_UP = 0
-_RIGHT = 1
-_DOWN = 2
-_LEFT = 3
+def get_tile_key(zoom, col, row):
+    """
+     * Returns the integer key of the tile: the Morton code of col and row (i.e. the quadkey as integer) with a leading
+       1 bit, which encodes the zoom level.
+     * The parent of a key is key >> 2 and the descendants of a key on a zoom level form a contiguous range of keys,
+       so that sorted keys can be queried with bisect.
+     * The keys are independent of the scheme, but the tiles have to be in the same scheme to be comparable.
+    """
+    return (1 << (2 * zoom)) | _spread_bits(col) | (_spread_bits(row) << 1)
 
-_directions = {
-    _UP: (0, -1),
-    _RIGHT: (1, 0),
-    _DOWN: (0, 1),
-    _LEFT: (-1, 0)
-    }
+
+def get_tile_from_key(key):
+    """
+     * Returns the tuple (zoom, col, row) of the tile key
+    """
+    zoom = get_key_zoom(key)
+    morton = key ^ (1 << (2 * zoom))
+    return zoom, _compact_bits(morton), _compact_bits(morton >> 1)
+
+
+def get_key_zoom(key):
+    return (key.bit_length() - 1) // 2
+
+
+def get_parent_key(key, levels=1):
+    if levels > get_key_zoom(key):
+        raise RuntimeError("The tile has no parent {} levels up".format(levels))
+    return key >> (2 * levels)
+
+
+def get_child_keys(key):
+    """
+     * Returns the keys of the four children, sorted like the keys
+    """
+    first_child = key << 2
+    return [first_child, first_child | 1, first_child | 2, first_child | 3]
+
+
+def get_neighbour_key(key, delta_col, delta_row):
+    """
+     * Returns the key of the tile delta_col columns and delta_row rows away or None, if the tile is outside of the world.
+     * The coordinates are added within the interleaved bits, i.e. the key isn't decoded.
+    """
+    zoom = get_key_zoom(key)
+    morton = key ^ (1 << (2 * zoom))
+    col = _add_interleaved(morton & _EVEN_BITS, delta_col, _EVEN_BITS, 0)
+    row = _add_interleaved(morton & _ODD_BITS, delta_row, _ODD_BITS, 1)
+    nr_of_bits = 2 * zoom
+    if col is None or row is None or (col | row) >> nr_of_bits:
+        return None
+    return (1 << nr_of_bits) | col | row
+
+
+def get_descendant_key_range(key, zoom):
+    """
+     * Returns the tuple (first_key, last_key) with the keys of all descendants of the tile on the specified zoom level
+    """
+    levels = zoom - get_key_zoom(key)
+    if levels < 0:
+        raise RuntimeError("The zoom level {} is above the zoom level of the tile".format(zoom))
+    return key << (2 * levels), ((key + 1) << (2 * levels)) - 1
+
+
+def get_keys_in_range(sorted_keys, first_key, last_key):
+    """
+     * Returns the keys of the sorted list, which are within [first_key, last_key]
+    """
+    return sorted_keys[bisect_left(sorted_keys, first_key):bisect_right(sorted_keys, last_key)]
+
+
+# 33 bits per coordinate, so that the sum of two 32 bit coordinates doesn't overflow
+_EVEN_BITS = 0x155555555555555555
+_ODD_BITS = _EVEN_BITS << 1
+_ALL_BITS = _EVEN_BITS | _ODD_BITS
+_SPREAD_BYTES = [sum(((b >> i) & 1) << (2 * i) for i in range(8)) for b in range(256)]
+
+
+def _spread_bits(value):
+    """
+     * Inserts a 0 bit after each of the lower 32 bits, i.e. 0b111 becomes 0b10101
+    """
+    return (_SPREAD_BYTES[value & 0xFF]
+            | _SPREAD_BYTES[(value >> 8) & 0xFF] << 16
+            | _SPREAD_BYTES[(value >> 16) & 0xFF] << 32
+            | _SPREAD_BYTES[(value >> 24) & 0xFF] << 48)
+
+
+def _compact_bits(value):
+    value &= _EVEN_BITS
+    value = (value | (value >> 1)) & 0x3333333333333333
+    value = (value | (value >> 2)) & 0x0F0F0F0F0F0F0F0F
+    value = (value | (value >> 4)) & 0x00FF00FF00FF00FF
+    value = (value | (value >> 8)) & 0x0000FFFF0000FFFF
+    value = (value | (value >> 16)) & 0x00000000FFFFFFFF
+    return value
+
+
+def _add_interleaved(value, delta, mask, shift):
+    """
+     * Adds delta to the coordinate, whose bits are spread over the bits of mask
+    :return: The sum with the bits spread over the bits of mask or None, if the sum is negative
+    """
+    if delta >= 0:
+        # the bits of the other coordinate are set, so that the carry is propagated over them
+        return ((value | (_ALL_BITS ^ mask)) + (_spread_bits(delta) << shift)) & mask
+    subtrahend = _spread_bits(-delta) << shift
+    if value < subtrahend:
+        return None
+    return (value - subtrahend) & mask
 
 
 def get_tiles_from_center(nr_of_tiles, available_tiles, should_cancel_func=None):
+    """
+     * Returns the nr_of_tiles tiles closest to the center of the available tiles.
+     * The tiles are ranked by get_center_out_rank, i.e. in the order of a spiral around the center, and only the
+       best ranked tiles are selected. Tiles which aren't available don't have to be visited.
+    """
     if nr_of_tiles > len(available_tiles):
         nr_of_tiles = len(available_tiles)
 
@@ -239,39 +536,52 @@ def get_tiles_from_center(nr_of_tiles, available_tiles, should_cancel_func=None)
     if nr_of_tiles is None or nr_of_tiles >= len(available_tiles) or len(available_tiles) == 0:
         return available_tiles
 
+    if isinstance(available_tiles, TileRange):
+        return set(available_tiles[:nr_of_tiles])
+
     min_x = min([t[0] for t in available_tiles])
     min_y = min([t[1] for t in available_tiles])
     max_x = max([t[0] for t in available_tiles])
     max_y = max([t[1] for t in available_tiles])
+    center_tile = (min_x + _get_center_offset(max_x - min_x), min_y + _get_center_offset(max_y - min_y))
+    if should_cancel_func and should_cancel_func():
+        return set([t for t in [center_tile] if t in available_tiles])
 
-    center_tile_offset = (int(round((max_x-min_x) / 2)), int(round((max_y-min_y) / 2)))
-    selected_tiles = set()
-    center_tile = _sum_tiles((min_x, min_y), center_tile_offset)
-    if len(selected_tiles) < nr_of_tiles and  center_tile in available_tiles:
-        selected_tiles.add(center_tile)
-
-    current_tile = center_tile
-    nr_of_steps = 0
-    current_direction = 0
-    while len(selected_tiles) < nr_of_tiles and not(should_cancel_func and should_cancel_func()):
-        #  always after two direction changes, the step length has to be increased by one
-        if current_direction % 2 == 0:
-            nr_of_steps += 1
-
-        #  go nr_of_steps steps into the current direction
-        for s in range(nr_of_steps):
-            current_tile = _sum_tiles(current_tile, _directions[current_direction])
-            if current_tile in available_tiles:
-                selected_tiles.add(current_tile)
-                if len(selected_tiles) >= nr_of_tiles:
-                    break
-        current_direction = (current_direction + 1) % 4
+    selected_tiles = set(heapq.nsmallest(nr_of_tiles, available_tiles,
+                                         key=lambda t: get_center_out_rank(t, center_tile)))
     debug("Center tiles completed")
     return selected_tiles
 
 
-def _sum_tiles(first_tile, second_tile):
-    return tuple(map(operator.add, first_tile, second_tile))
+def get_center_out_rank(tile, center_tile):
+    """
+     * Returns the position of the tile on a spiral around the center tile, starting with 0 for the center.
+     * The spiral consists of square rings, ring r containing the 8r tiles with the Chebyshev distance r to the
+       center. Each ring starts right of its top left corner and runs clockwise through the top, right, bottom
+       and left side, i.e. it begins at position (2r - 1)^2.
+    """
+    dx = tile[0] - center_tile[0]
+    dy = tile[1] - center_tile[1]
+    r = max(abs(dx), abs(dy))
+    if r == 0:
+        return 0
+    if dy == -r and dx > -r:
+        index = dx + r - 1
+    elif dx == r and dy > -r:
+        index = 2 * r + dy + r - 1
+    elif dy == r and dx < r:
+        index = 4 * r + r - 1 - dx
+    else:
+        index = 6 * r + r - 1 - dy
+    return (2 * r - 1) ** 2 + index
+
+
+def _get_center_offset(distance):
+    """
+     * Returns the offset of the center tile from the first of distance + 1 tiles. Integer division is used,
+       so that the center is the same on Python 2 and 3.
+    """
+    return distance // 2
 
 
 def get_zoom_by_scale(scale):
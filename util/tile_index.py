@@ -0,0 +1,238 @@
+import hashlib
+import os
+import sys
+import time
+from bisect import bisect_right
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
+from .log_helper import info, warn, debug
+from .file_helper import get_cache_directory
+
+_INDEX_VERSION = 3
+
+
+class ZoomIndex(object):
+    """
+     * Index of the existing tiles of one zoom level.
+     * The rows of each column are stored as sorted, run-length encoded ranges [first_row, last_row], so that
+       contiguous areas need only a few numbers per column.
+     * The columns are indexed on demand, i.e. only the tiles of the indexed columns are known. Indexed columns
+       without tiles have no ranges. A zoom level which is too large to be indexed is marked with too_large.
+    """
+
+    def __init__(self, ranges_by_column=None, signatures_by_column=None, too_large=False):
+        """
+        :param signatures_by_column: The signatures of the columns, if the columns are validated independently
+        """
+        self._ranges_by_column = {}
+        self._range_starts_by_column = {}
+        self._signatures_by_column = signatures_by_column or {}
+        self.too_large = too_large
+        for col, ranges in (ranges_by_column or {}).items():
+            self._set_ranges(col, ranges)
+
+    @staticmethod
+    def from_sorted_tiles(tiles):
+        """
+         * Creates the index of the tiles, which have to be sorted by column and row.
+         * The tiles are consumed one by one, i.e. the tiles don't have to be held in memory.
+        :param tiles: An iterable of tuples (col, row)
+        """
+        zoom_index = ZoomIndex()
+        zoom_index.add_sorted_tiles(columns=[], tiles=tiles)
+        return zoom_index
+
+    @staticmethod
+    def from_tiles(tiles):
+        return ZoomIndex.from_sorted_tiles(sorted(tiles))
+
+    def add_sorted_tiles(self, columns, tiles, max_tiles=None):
+        """
+         * Adds the tiles of the columns to the index. The tiles have to be sorted by column and row.
+        :param columns: The columns which have been indexed, they are indexed also if they don't contain tiles
+        :param tiles: An iterable of tuples (col, row) of the indexed columns
+        :param max_tiles: The max. number of tiles of the index. If the index would get larger, it's marked as
+         too_large and no tiles are added.
+        :return: False, if the index is too large
+        """
+        ranges_by_column = dict((col, []) for col in columns)
+        nr_of_tiles = self.nr_of_tiles()
+        current_col = None
+        ranges = None
+        for col, row in tiles:
+            if col != current_col:
+                current_col = col
+                ranges = ranges_by_column.setdefault(col, [])
+            if ranges and ranges[-1][1] + 1 >= row:
+                ranges[-1][1] = max(ranges[-1][1], row)
+            else:
+                ranges.append([row, row])
+            nr_of_tiles += 1
+            if max_tiles is not None and nr_of_tiles > max_tiles:
+                self.too_large = True
+                return False
+        for col, ranges in ranges_by_column.items():
+            self._set_ranges(col, ranges)
+        return True
+
+    def _set_ranges(self, col, ranges):
+        self._ranges_by_column[col] = ranges
+        self._range_starts_by_column[col] = [r[0] for r in ranges]
+
+    def set_column_signature(self, col, signature):
+        self._signatures_by_column[col] = list(signature)
+
+    def is_indexed(self, col, signature=None):
+        """
+         * Returns True, if the column is indexed and, if a signature is specified, the column hasn't changed
+        """
+        if col not in self._ranges_by_column:
+            return False
+        return signature is None or self._signatures_by_column.get(col) == list(signature)
+
+    def get_missing_columns(self, columns):
+        """
+         * Returns the sorted columns, which aren't indexed yet
+        """
+        return sorted(col for col in set(columns) if col not in self._ranges_by_column)
+
+    def contains(self, col, row):
+        starts = self._range_starts_by_column.get(col)
+        if not starts:
+            return False
+        index = bisect_right(starts, row) - 1
+        return index >= 0 and row <= self._ranges_by_column[col][index][1]
+
+    def __contains__(self, tile):
+        return self.contains(tile[0], tile[1])
+
+    def filter(self, tiles):
+        """
+         * Returns the tiles which exist. The columns of the tiles have to be indexed.
+        :param tiles: A list of tuples (col, row)
+        """
+        return [t for t in tiles if self.contains(t[0], t[1])]
+
+    def columns(self):
+        return sorted(self._ranges_by_column.keys())
+
+    def nr_of_tiles(self):
+        return sum(r[1] - r[0] + 1 for ranges in self._ranges_by_column.values() for r in ranges)
+
+    def to_json(self):
+        return dict((str(col), ranges) for col, ranges in self._ranges_by_column.items())
+
+    def signatures_to_json(self):
+        return dict((str(col), signature) for col, signature in self._signatures_by_column.items())
+
+    @staticmethod
+    def from_json(data, signatures=None, too_large=False):
+        signatures_by_column = dict((int(col), signature) for col, signature in (signatures or {}).items())
+        return ZoomIndex(dict((int(col), ranges) for col, ranges in data.items()),
+                         signatures_by_column=signatures_by_column,
+                         too_large=too_large)
+
+
+class TileIndex(object):
+    """
+     * Index of the existing tiles of a tile source, which is persisted next to the data of the source.
+     * The zoom levels are indexed independently and only when they are requested. Each zoom level is stored
+       in its own file with a signature (e.g. modification time and size of the file) and is rebuilt, if the
+       signature changes.
+     * Changed zoom levels are saved at most once per save interval, the remaining changes are saved by flush().
+     * The index isn't thread-safe, the sources synchronize the access.
+    """
+
+    _save_interval_seconds = 10
+
+    def __init__(self, path):
+        """
+        :param path: The directory of the index files. If it isn't writable, the files are stored in the
+         cache directory, in a directory named by the hash of the absolute path.
+        """
+        self.path = path
+        abs_path = os.path.abspath(path)
+        if not isinstance(abs_path, bytes):
+            abs_path = abs_path.encode("utf-8")
+        self._fallback_path = os.path.join(get_cache_directory(), "tile_index", hashlib.sha1(abs_path).hexdigest())
+        self._zooms = {}
+        self._changed_zooms = set()
+        self._saved_at = 0
+
+    def get(self, zoom_level, signature):
+        """
+         * Returns the ZoomIndex of the specified zoom level or None, if it's not indexed or the signature differs
+        """
+        entry = self._load(zoom_level)
+        if entry and entry["signature"] == list(signature):
+            return ZoomIndex.from_json(entry["columns"],
+                                       signatures=entry.get("column_signatures"),
+                                       too_large=entry.get("too_large", False))
+        return None
+
+    def put(self, zoom_level, signature, zoom_index):
+        """
+         * Adds the ZoomIndex of the specified zoom level. It's saved, unless the index has been saved within
+           the save interval.
+        """
+        self._zooms[int(zoom_level)] = {
+            "version": _INDEX_VERSION,
+            "signature": list(signature),
+            "columns": zoom_index.to_json(),
+            "column_signatures": zoom_index.signatures_to_json(),
+            "too_large": zoom_index.too_large
+        }
+        self._changed_zooms.add(int(zoom_level))
+        if time.time() - self._saved_at >= self._save_interval_seconds:
+            self.flush()
+
+    def flush(self):
+        """
+         * Saves the zoom levels, which have changed since they have been saved the last time
+        """
+        for zoom_level in sorted(self._changed_zooms):
+            self._save(zoom_level)
+        self._changed_zooms.clear()
+        self._saved_at = time.time()
+
+    def _load(self, zoom_level):
+        zoom_level = int(zoom_level)
+        if zoom_level not in self._zooms:
+            self._zooms[zoom_level] = None
+            for directory in [self.path, self._fallback_path]:
+                path = _get_zoom_file_path(directory, zoom_level)
+                if os.path.isfile(path):
+                    try:
+                        with open(path, 'r') as f:
+                            entry = json.load(f)
+                        if entry.get("version") == _INDEX_VERSION:
+                            self._zooms[zoom_level] = entry
+                            debug("Tile index loaded: {}", path)
+                            break
+                    except (IOError, OSError, ValueError):
+                        warn("Invalid tile index {}: {}", path, sys.exc_info()[1])
+        return self._zooms[zoom_level]
+
+    def _save(self, zoom_level):
+        for directory in [self.path, self._fallback_path]:
+            path = _get_zoom_file_path(directory, zoom_level)
+            try:
+                if not os.path.isdir(directory):
+                    os.makedirs(directory)
+                tmp_path = "{}.tmp".format(path)
+                with open(tmp_path, 'w') as f:
+                    json.dump(self._zooms[zoom_level], f)
+                if os.path.isfile(path):
+                    os.remove(path)
+                os.rename(tmp_path, path)
+                debug("Tile index saved: {}", path)
+                return
+            except (IOError, OSError):
+                info("Tile index cannot be saved to {}: {}", path, sys.exc_info()[1])
+
+
+def _get_zoom_file_path(directory, zoom_level):
+    return os.path.join(directory, "{}.json".format(zoom_level))
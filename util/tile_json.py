@@ -5,9 +5,32 @@ except ImportError:
     import json
 import os
 import ast
+import time
 from .log_helper import critical, debug, info
 from .tile_helper import get_tile_bounds, WORLD_BOUNDS
-from .network_helper import load_url
+from .network_helper import load_url_with_validators
+
+_DEFAULT_MAX_AGE_SECONDS = 600
+
+_tile_json_cache = {}
+
+
+def get_tile_json(url):
+    """
+     * Returns the loaded TileJSON of the specified url or path.
+     * The TileJSON is shared by all sources of the current session. Once it's older than its max age, it's
+       revalidated, i.e. it's only transferred again if it has changed in the meantime.
+    :param url:
+    :return:
+    """
+    tile_json = _tile_json_cache.get(url)
+    if tile_json is None:
+        tile_json = TileJSON(url)
+        if tile_json.load():
+            _tile_json_cache[url] = tile_json
+    elif tile_json.is_expired():
+        tile_json.revalidate()
+    return tile_json
 
 
 class TileJSON(object):
@@ -19,21 +42,61 @@ class TileJSON(object):
     def __init__(self, url):
         self.url = url
         self.json = None
+        self._validators = None
+        self._file_modification_time = None
+        self._loaded_at = None
 
     def load(self):
+        return self._load()
+
+    def is_expired(self):
+        if self._loaded_at is None:
+            return True
+        max_age = _DEFAULT_MAX_AGE_SECONDS
+        if self._validators and self._validators["max_age"] is not None:
+            max_age = self._validators["max_age"]
+        return time.time() - self._loaded_at > max_age
+
+    def revalidate(self):
+        """
+         * Checks if the TileJSON has changed since it has been loaded and reloads it if so.
+         * Local files are compared by their modification time, remote documents are requested conditionally.
+        :return: True if the TileJSON is up to date
+        """
+        if not self.json:
+            return self._load()
+        if os.path.isfile(self.url) and os.path.getmtime(self.url) == self._file_modification_time:
+            self._loaded_at = time.time()
+            return True
+        return self._load(validators=self._validators)
+
+    def _load(self, validators=None):
         debug("Loading TileJSON")
         success = False
+        loaded_validators = None
         try:
             if os.path.isfile(self.url):
+                self._file_modification_time = os.path.getmtime(self.url)
                 with open(self.url, 'r') as f:
                     data = f.read()
             else:
-                status, data = load_url(self.url)
+                status, data, new_validators = load_url_with_validators(self.url, validators=validators)
+                if status == 304:
+                    debug("TileJSON not modified: {}", self.url)
+                    for key in new_validators:
+                        if new_validators[key] is not None:
+                            self._validators[key] = new_validators[key]
+                    self._loaded_at = time.time()
+                    return True
+                loaded_validators = new_validators
             self.json = json.loads(data)
             if self.json:
                 debug("TileJSON loaded")
                 self._validate()
                 debug("TileJSON validated")
+                # only a valid document is fresh, an invalid one is loaded again with the next request
+                self._validators = loaded_validators
+                self._loaded_at = time.time()
                 success = True
             else:
                 info("Parsing TileJSON failed")
@@ -5,21 +5,51 @@ try:
 except ImportError:
     import json
 import os
+import re
 import sys
+import math
+import mmap
+import threading
+from collections import deque, OrderedDict
+from multiprocessing.pool import ThreadPool
 import traceback
+try:
+    from queue import Queue, Full
+except ImportError:
+    from Queue import Queue, Full
+try:
+    import psycopg2
+    from psycopg2.pool import ThreadedConnectionPool
+except ImportError:
+    psycopg2 = None
 
 from .vtr_2to3 import *
-from .tile_json import TileJSON
+from .tile_json import get_tile_json
 from .log_helper import info, warn, critical, debug
 from .tile_helper import (VectorTile,
                          get_tiles_from_center,
                          get_tile_bounds,
                          create_bounds,
+                         TileRange,
                          WORLD_BOUNDS)
-from .network_helper import url_exists, load_tiles_async
-from .file_helper import is_sqlite_db
+from .network_helper import url_exists, iter_tiles_async, NetworkStatistics
+from .file_helper import is_sqlite_db, get_cache_entry_validators, refresh_cache_entry
+from .sqlite_helper import get_connection_pool, release_connection_pool
+from .tile_index import TileIndex, ZoomIndex
+from .pmtiles_helper import (read_header,
+                             decompress_internal,
+                             zxy_to_tile_id,
+                             Directory,
+                             Compression,
+                             TileType,
+                             HEADER_SIZE_BYTES,
+                             MAX_DIRECTORY_DEPTH)
 
 _DEFAULT_CRS = "EPSG:3857"
+_DIRECTORY_LAYOUT_REGEX = re.compile(r"^(?P<base>.*?)\{z\}[/\\]\{x\}[/\\]\{y\}(?P<extension>\.\w+)?$")
+_MVT_EXTENT = 4096
+_MVT_BUFFER = 64
+_UNSUPPORTED_POSTGIS_COLUMN_TYPES = ["geometry", "geography", "raster", "bytea"]
 
 
 class AbstractSource(QObject):
@@ -89,6 +119,30 @@ class AbstractSource(QObject):
     def crs(self):
         raise NotImplementedError
 
+    def statistics(self):
+        """
+         * Returns the NetworkStatistics of the last load or None, if the source doesn't use the network
+        :return:
+        """
+        return None
+
+    def get_existing_tiles(self, zoom_level, tiles):
+        """
+         * Returns the tiles which exist in this source. Sources which don't know which tiles exist return all tiles.
+        :param zoom_level:
+        :param tiles: A list of tuples (col, row)
+        :return:
+        """
+        return tiles
+
+    def get_indexed_tiles(self, zoom_level, tiles):
+        """
+         * Same as get_existing_tiles, but only the data held in memory is used, i.e. nothing is read from the source.
+           It's cheap enough to be called from the UI thread.
+        :return: The tiles which exist or None, if it's unknown whether the tiles exist
+        """
+        return tiles
+
     def load_tiles(self, zoom_level, tiles_to_load, max_tiles=None):
         """
          * Loads the tiles for the specified zoom_level and bounds from the web service this source has been created with
@@ -99,6 +153,15 @@ class AbstractSource(QObject):
         """
         raise NotImplementedError
 
+    def iter_tiles(self, zoom_level, tiles_to_load, max_tiles=None):
+        """
+         * Same as load_tiles, but yields the tuples (tile, encoded_data) as soon as they are available
+         * The next tile is only loaded, when the consumer requests it. Sources which can't stream their tiles
+           return the result of load_tiles.
+        """
+        for tile_data_tuple in self.load_tiles(zoom_level=zoom_level, tiles_to_load=tiles_to_load, max_tiles=max_tiles):
+            yield tile_data_tuple
+
 
 class ServerSource(AbstractSource):
 
@@ -113,8 +176,8 @@ class ServerSource(AbstractSource):
             raise RuntimeError(error)
 
         self.url = url
-        self.json = TileJSON(url)
-        self.json.load()
+        self.json = get_tile_json(url)
+        self._statistics = None
 
     def source(self):
         return self.url
@@ -158,7 +221,13 @@ class ServerSource(AbstractSource):
     def crs(self):
         return self.json.crs()
 
+    def statistics(self):
+        return self._statistics
+
     def load_tiles(self, zoom_level, tiles_to_load, max_tiles=None):
+        return list(self.iter_tiles(zoom_level=zoom_level, tiles_to_load=tiles_to_load, max_tiles=max_tiles))
+
+    def iter_tiles(self, zoom_level, tiles_to_load, max_tiles=None):
         self._cancelling = False
         base_url = self.json.tiles()[0]
         urls = []
@@ -170,6 +239,8 @@ class ServerSource(AbstractSource):
         api_key = ""
         if "api_key" in list(parameters.keys()):
             api_key = parameters["api_key"][0]
+        cache_name = self.name()
+        validators_by_tile = {}
         for t in tiles_to_load:
             col = t[0]
             row = t[1]
@@ -179,18 +250,34 @@ class ServerSource(AbstractSource):
                 .replace("{y}", str(int(row)))\
                 .replace("{api_key}", str(api_key))
             urls.append((load_url, col, row))
+            validators = get_cache_entry_validators(cache_name, zoom_level, col, row)
+            if validators:
+                validators_by_tile[(col, row)] = validators
 
         self.max_progress_changed.emit(len(urls))
         self.message_changed.emit("Getting {} tiles from source...".format(len(urls)))
-        tile_coords_with_content = load_tiles_async(urls_with_col_and_row=urls,
+        self._statistics = NetworkStatistics()
+        tile_coords_with_content = iter_tiles_async(urls_with_col_and_row=urls,
                                                     on_progress_changed=lambda p: self.progress_changed.emit(p),
-                                                    cancelling_func=lambda: self._cancelling)
-        tiles_with_data = []
-        for coord, data in tile_coords_with_content:
-            tile = VectorTile(self.scheme(), zoom_level=zoom_level, x=coord[0], y=coord[1])
-            tiles_with_data.append((tile, data))
-
-        return tiles_with_data
+                                                    cancelling_func=lambda: self._cancelling,
+                                                    validators_by_tile=validators_by_tile,
+                                                    statistics=self._statistics)
+        nr_not_modified = 0
+        try:
+            for coord, data, validators in tile_coords_with_content:
+                tile = VectorTile(self.scheme(), zoom_level=zoom_level, x=coord[0], y=coord[1])
+                tile.validators = validators
+                if data is None:
+                    # not modified, the cached tile can be used without decoding it again
+                    tile.decoded_data = refresh_cache_entry(cache_name, zoom_level, coord[0], coord[1], validators)
+                    if not tile.decoded_data:
+                        continue
+                    nr_not_modified += 1
+                yield tile, data
+        finally:
+            tile_coords_with_content.close()
+        if validators_by_tile:
+            info("{} of {} revalidated tiles were not modified", nr_not_modified, len(validators_by_tile))
 
 
 class MBTilesSource(AbstractSource):
@@ -198,7 +285,16 @@ class MBTilesSource(AbstractSource):
     def attribution(self):
         return self._get_metadata_value("attribution", "")
 
-    def __init__(self, path):
+    _read_queue_size = 8
+    _read_batch_size = 16
+    _max_indexed_tiles_per_zoom = 4000000
+
+    def __init__(self, path, nr_of_read_connections=1):
+        """
+        :param path:
+        :param nr_of_read_connections: The number of connections used to read the tiles concurrently.
+         The requested tiles are split into that many ranges of columns, each being read on its own connection.
+        """
         AbstractSource.__init__(self)
         if not os.path.isfile(path):
             raise RuntimeError("The file does not exist: {}".format(path))
@@ -208,8 +304,14 @@ class MBTilesSource(AbstractSource):
                 "The file '{}' is not a valid Mapbox vector tile file and cannot be loaded.".format(path))
 
         self.path = path
-        self.conn = None
+        self._nr_of_read_connections = max(1, nr_of_read_connections)
+        self._connection_pool = None
+        self._connection_pool_lock = threading.Lock()
         self._metadata_cache = {}
+        self._index_lock = threading.Lock()
+        self._index_signature = None
+        self._zoom_indexes = {}
+        self._tile_index = TileIndex(path="{}.vtr_index".format(path))
 
     def source(self):
         return self.path
@@ -276,6 +378,13 @@ class MBTilesSource(AbstractSource):
         :param max_tiles:
         :return:
         """
+        return list(self.iter_tiles(zoom_level=zoom_level, tiles_to_load=tiles_to_load, max_tiles=max_tiles))
+
+    def iter_tiles(self, zoom_level, tiles_to_load, max_tiles=None):
+        """
+         * Yields the tiles listed in tiles_to_load while iterating the cursor, i.e. only the tiles being
+           processed are held in memory.
+        """
         self._cancelling = False
         debug("Reading tiles of zoom level {}", zoom_level)
 
@@ -291,27 +400,157 @@ class MBTilesSource(AbstractSource):
                                                  should_cancel_func=lambda: self._cancelling)
         else:
             center_tiles = tiles_to_load
-        where_clause = self._get_where_clause(tiles_to_load=center_tiles, zoom_level=zoom_level)
-
-        sql_command = "SELECT zoom_level, tile_column, tile_row, tile_data FROM tiles {};"
-        sql = sql_command.format(where_clause)
-
-        tile_data_tuples = []
-        rows = self._get_from_db(sql=sql)
-        count_sql = "select count(*) 'nr_of_tiles' from tiles WHERE zoom_level = {}".format(zoom_level)
-        total_nr_of_tiles = self._get_single_value(count_sql, "nr_of_tiles")
-        if max_tiles is not None and max_tiles < total_nr_of_tiles:
+        if max_tiles is not None and max_tiles < len(tiles_to_load):
             self.tile_limit_reached.emit()
+        if len(center_tiles) == 0:
+            return
+
+        # the queries return the bounding box of the requested tiles
+        requested_tiles = set(center_tiles)
+        self.max_progress_changed.emit(len(requested_tiles))
+        if self._nr_of_read_connections > 1:
+            rows = self._iter_tile_rows_parallel(zoom_level=zoom_level, tiles=requested_tiles)
+        else:
+            rows = self._iter_tile_rows(zoom_level=zoom_level, tiles=requested_tiles)
+        nr_of_tiles = 0
+        for row in rows:
+            if self._cancelling or (max_tiles and nr_of_tiles >= max_tiles):
+                break
+            if (row["tile_column"], row["tile_row"]) not in requested_tiles:
+                continue
+            nr_of_tiles += 1
+            self.progress_changed.emit(nr_of_tiles)
+            yield self._create_tile(row)
+
+    def _iter_tile_rows(self, zoom_level, tiles):
+        where_clause, parameters = self._get_where_clause(tiles_to_load=tiles, zoom_level=zoom_level)
+        if self._is_deduplicated():
+            sql = """SELECT zoom_level, tile_column, tile_row, map.tile_id AS tile_id, tile_data
+                     FROM map JOIN images ON images.tile_id = map.tile_id {};""".format(where_clause)
+        else:
+            sql = "SELECT zoom_level, tile_column, tile_row, tile_data FROM tiles {};".format(where_clause)
+        return self._iter_from_db(sql=sql, parameters=parameters)
 
-        if rows:
-            self.max_progress_changed.emit(len(rows))
-            for index, row in enumerate(rows):
-                if self._cancelling or (max_tiles and len(tile_data_tuples) >= max_tiles):
+    def _is_deduplicated(self):
+        """
+         * Returns True if the file uses the map/images schema, where identical tiles share one image
+           (e.g. files created by tippecanoe or OpenMapTiles). The tiles table is a view on these tables then.
+        """
+        if "deduplicated" not in self._metadata_cache:
+            sql = "select count(*) 'nr_of_tables' from sqlite_master where type = 'table' and name in ('map', 'images')"
+            self._metadata_cache["deduplicated"] = self._get_single_value(sql, "nr_of_tables") == 2
+            debug("Deduplicated MBTiles: {}", self._metadata_cache["deduplicated"])
+        return self._metadata_cache["deduplicated"]
+
+    def _iter_tile_rows_parallel(self, zoom_level, tiles):
+        """
+         * Splits the tiles into contiguous ranges of columns and reads the ranges concurrently, each on its own
+           connection. The rows are yielded in batches in the order they are read. As the queue between the reading
+           threads and the consumer is bounded, the threads only read ahead a limited number of rows.
+        """
+        columns = sorted(set(t[0] for t in tiles))
+        nr_of_columns_per_range = int(math.ceil(len(columns) / float(self._nr_of_read_connections)))
+        column_ranges = [set(columns[i:i + nr_of_columns_per_range])
+                         for i in range(0, len(columns), nr_of_columns_per_range)]
+        rows_queue = Queue(maxsize=self._read_queue_size)
+        stop_reading = threading.Event()
+        connection_pool = self._get_connection_pool()
+
+        def put(item):
+            while not stop_reading.is_set():
+                try:
+                    rows_queue.put(item, timeout=0.1)
+                    return
+                except Full:
+                    pass
+
+        def read(column_range):
+            try:
+                tiles_of_range = [t for t in tiles if t[0] in column_range]
+                batch = []
+                for row in self._iter_tile_rows(zoom_level=zoom_level, tiles=tiles_of_range):
+                    if stop_reading.is_set():
+                        break
+                    batch.append(row)
+                    if len(batch) >= self._read_batch_size:
+                        put(batch)
+                        batch = []
+                if batch:
+                    put(batch)
+            finally:
+                connection_pool.release()
+                put(None)
+
+        threads = [threading.Thread(target=read, args=(r,)) for r in column_ranges]
+        debug("Reading {} tiles with {} connections", len(tiles), len(threads))
+        for t in threads:
+            t.daemon = True
+            t.start()
+        nr_of_running_threads = len(threads)
+        try:
+            while nr_of_running_threads > 0:
+                batch = rows_queue.get()
+                if batch is None:
+                    nr_of_running_threads -= 1
+                else:
+                    for row in batch:
+                        yield row
+        finally:
+            stop_reading.set()
+            for t in threads:
+                t.join()
+
+    def get_existing_tiles(self, zoom_level, tiles):
+        with self._index_lock:
+            zoom_index = self._get_zoom_index(zoom_level, columns=_get_columns(tiles))
+            if zoom_index is None:
+                return tiles
+            return zoom_index.filter(tiles)
+
+    def get_indexed_tiles(self, zoom_level, tiles):
+        return _get_indexed_tiles(self._index_lock, self._zoom_indexes, zoom_level, tiles)
+
+    def _get_zoom_index(self, zoom_level, columns):
+        """
+         * Returns the index of the tiles of the specified zoom level, in which the specified columns are indexed.
+           The columns which aren't indexed yet are read from the file, using the index on the columns of the
+           tiles table, and are added to the persisted index. The index is reused until the file changes.
+         * Returns None for zoom levels with too many tiles. This is persisted too, i.e. these zoom levels
+           aren't read again.
+         * The caller has to hold the index lock.
+        """
+        if self._index_signature is None:
+            stat = os.stat(self.path)
+            self._index_signature = [stat.st_mtime, stat.st_size]
+        zoom_index = self._zoom_indexes.get(zoom_level)
+        if zoom_index is None:
+            zoom_index = self._tile_index.get(zoom_level, self._index_signature) or ZoomIndex()
+            self._zoom_indexes[zoom_level] = zoom_index
+        missing_columns = []
+        if not zoom_index.too_large:
+            missing_columns = zoom_index.get_missing_columns(columns)
+        if missing_columns:
+            debug("Indexing {} columns of zoom level {}", len(missing_columns), zoom_level)
+            table = "tiles"
+            if self._is_deduplicated():
+                table = "map"
+            sql = """SELECT tile_column, tile_row FROM {} WHERE zoom_level = ? AND tile_column BETWEEN ? AND ?
+                     ORDER BY tile_column, tile_row""".format(table)
+            for first_col, last_col in _get_column_runs(missing_columns):
+                rows = self._iter_from_db(sql=sql, parameters=(zoom_level, first_col, last_col))
+                try:
+                    is_indexed = zoom_index.add_sorted_tiles(columns=range(first_col, last_col + 1),
+                                                             tiles=((row[0], row[1]) for row in rows),
+                                                             max_tiles=self._max_indexed_tiles_per_zoom)
+                finally:
+                    rows.close()
+                if not is_indexed:
+                    info("Zoom level {} has too many tiles to be indexed", zoom_level)
                     break
-                tile, data = self._create_tile(row)
-                tile_data_tuples.append((tile, data))
-                self.progress_changed.emit(index+1)
-        return tile_data_tuples
+            self._tile_index.put(zoom_level, self._index_signature, zoom_index)
+        if zoom_index.too_large:
+            return None
+        return zoom_index
 
     def _get_bounds_from_data(self, zoom_level):
         sql = """select 
@@ -335,18 +574,29 @@ class MBTilesSource(AbstractSource):
 
     @staticmethod
     def _get_where_clause(tiles_to_load, zoom_level):
+        """
+         * Returns the where clause and its parameters to query the specified tiles.
+         * The tiles are queried by the bounding box of their coordinates, so that the index on
+           (zoom_level, tile_column, tile_row) can be used. Tiles within the bounding box which haven't
+           been requested have to be filtered by the caller.
+        :return: A tuple (where_clause, parameters)
+        """
+        conditions = []
+        parameters = []
+        if zoom_level is not None:
+            conditions.append("zoom_level = ?")
+            parameters.append(zoom_level)
+        if tiles_to_load:
+            columns = [t[0] for t in tiles_to_load]
+            rows = [t[1] for t in tiles_to_load]
+            conditions.append("tile_column BETWEEN ? AND ?")
+            parameters.extend([min(columns), max(columns)])
+            conditions.append("tile_row BETWEEN ? AND ?")
+            parameters.extend([min(rows), max(rows)])
         where_clause = ""
-        if zoom_level is not None or tiles_to_load is not None:
-            where_clause = "WHERE"
-            if zoom_level is not None:
-                where_clause += " zoom_level = {}".format(zoom_level)
-                if tiles_to_load is not None:
-                    where_clause += " AND"
-            if tiles_to_load is not None:
-                tile_coords = str(["{};{}".format(x[0], x[1]) for x in tiles_to_load]).replace("[", "").replace(
-                    "]", "")
-                where_clause += " tile_column || \";\" || tile_row IN ({})".format(tile_coords)
-        return where_clause
+        if conditions:
+            where_clause = "WHERE {}".format(" AND ".join(conditions))
+        return where_clause, tuple(parameters)
 
     def _create_tile(self, row):
         zoom_level = row["zoom_level"]
@@ -354,20 +604,31 @@ class MBTilesSource(AbstractSource):
         tile_row = row["tile_row"]
         binary_data = row["tile_data"]
         tile = VectorTile(self.scheme(), zoom_level, tile_col, tile_row)
+        if "tile_id" in row.keys():
+            tile.payload_id = row["tile_id"]
         return tile, binary_data
 
     def close_connection(self):
         """
-         * Closes the current db connection
+         * Releases the connection pool, which closes its connections, unless another source of the file still
+           uses it. The pool is acquired again with the next access.
+         * Saves the changes of the tile index
         :return: 
         """
-        if self.conn:
-            try:
-                self.conn.close()
-                debug("Connection closed")
-            except:
-                warn("Closing connection failed: {}".format(sys.exc_info()))
-        self.conn = None
+        with self._index_lock:
+            self._tile_index.flush()
+        with self._connection_pool_lock:
+            pool = self._connection_pool
+            self._connection_pool = None
+        if pool:
+            pool.release()
+            release_connection_pool(pool)
+
+    def _get_connection_pool(self):
+        with self._connection_pool_lock:
+            if self._connection_pool is None:
+                self._connection_pool = get_connection_pool(self.path)
+            return self._connection_pool
 
     def _get_zoom(self, max_zoom=True):
         if max_zoom:
@@ -399,14 +660,10 @@ class MBTilesSource(AbstractSource):
         return self._get_single_value(sql_query=query, field_name="zoom_level")
 
     def _get_metadata_value(self, field_name, default=None):
-        if field_name not in self._metadata_cache:
-            debug("Loading metadata value '{}'", field_name)
-            sql = "select value as '{0}' from metadata where name = '{0}'".format(field_name)
-            value = self._get_single_value(sql_query=sql, field_name=field_name)
-            if default and not value:
-                value = default
-            self._metadata_cache[field_name] = value
-        return self._metadata_cache[field_name]
+        value = self._get_connection_pool().metadata().get(field_name)
+        if default and not value:
+            value = default
+        return value
 
     def _get_single_value(self, sql_query, field_name):
         """
@@ -426,14 +683,11 @@ class MBTilesSource(AbstractSource):
             critical("Loading metadata value '{}' failed: {}", field_name, sys.exc_info())
         return value
 
-    def _get_from_db(self, sql):
-        if not self.conn:
-            debug("Not connected yet.")
-            self._connect_to_db()
+    def _get_from_db(self, sql, parameters=()):
         try:
-            debug("Execute SQL: {}", sql)
-            cur = self.conn.cursor()
-            cur.execute(sql)
+            debug("Execute SQL: {} {}", sql, parameters)
+            cur = self._get_connection_pool().connection().cursor()
+            cur.execute(sql, parameters)
             return cur.fetchall()
         except sqlite3.OperationalError:
             critical("Getting data from db failed: {}", sql)
@@ -443,21 +697,36 @@ class MBTilesSource(AbstractSource):
                 tb = traceback.format_exc()
             critical("Getting data from db failed: {}, {}", sys.exc_info(), tb)
 
-    def _connect_to_db(self):
+    def _iter_from_db(self, sql, parameters=()):
         """
-         * Since an mbtile file is a sqlite database, we can connect to it
+         * Yields the rows of the query one by one instead of fetching all of them at once
         """
-        debug("Connecting to: {}", self.path)
+        debug("Execute SQL: {} {}", sql, parameters)
+        cur = None
         try:
-            self.conn = sqlite3.connect(self.path)
-            self.conn.row_factory = sqlite3.Row
-            debug("Successfully connected")
+            cur = self._get_connection_pool().connection().cursor()
+            cur.execute(sql, parameters)
+            for row in cur:
+                yield row
+        except GeneratorExit:
+            raise
+        except sqlite3.OperationalError:
+            critical("Getting data from db failed: {}", sql)
         except:
-            critical("Db connection failed:", sys.exc_info())
+            tb = ""
+            if traceback:
+                tb = traceback.format_exc()
+            critical("Getting data from db failed: {}, {}", sys.exc_info(), tb)
+        finally:
+            if cur:
+                cur.close()
 
 
 class DirectorySource(AbstractSource):
 
+    _nr_of_read_threads = 8
+    _max_pending_reads = 32
+
     def __init__(self, path):
         AbstractSource.__init__(self)
         if not os.path.isdir(path):
@@ -466,12 +735,22 @@ class DirectorySource(AbstractSource):
         metadata_path = os.path.join(path, "metadata.json")
         if not os.path.isfile(metadata_path):
             raise RuntimeError("There is no metadata.json in the directory.")
-        self.json = TileJSON(metadata_path)
-        self.json.load()
+        self.json = get_tile_json(metadata_path)
+        self._index_lock = threading.Lock()
+        self._zoom_indexes = {}
+        self._validated_columns = {}
+        self._tile_index = TileIndex(path=os.path.join(path, ".vtr_index"))
 
     def source(self):
         return self.path
 
+    def close_connection(self):
+        """
+         * Saves the changes of the tile index
+        """
+        with self._index_lock:
+            self._tile_index.flush()
+
     def attribution(self):
         return self.json.attribution()
 
@@ -513,30 +792,697 @@ class DirectorySource(AbstractSource):
         return self.json.crs()
 
     def load_tiles(self, zoom_level, tiles_to_load, max_tiles=None):
-        self._cancelling = False
-        tile_data_tuples = []
+        return list(self.iter_tiles(zoom_level=zoom_level, tiles_to_load=tiles_to_load, max_tiles=max_tiles))
 
-        if len(tiles_to_load) > max_tiles:
+    def iter_tiles(self, zoom_level, tiles_to_load, max_tiles=None):
+        """
+         * Yields the tiles which exist in the directory.
+         * Each directory containing requested tiles is listed once to find the existing files. The files are
+           then read concurrently by a limited number of threads.
+        """
+        self._cancelling = False
+        if max_tiles is not None and len(tiles_to_load) > max_tiles:
             tiles_to_load = get_tiles_from_center(max_tiles, tiles_to_load, should_cancel_func=lambda: self._cancelling)
             self.tile_limit_reached.emit()
 
+        tile_path = self._get_tile_path()
+        extension = os.path.splitext(tile_path)[1]
+        paths = [(t, tile_path.format(z=int(zoom_level), x=t[0], y=t[1])) for t in tiles_to_load]
+        files_by_directory = {}
+        for t, full_path in paths:
+            directory = os.path.dirname(full_path)
+            if directory not in files_by_directory:
+                files_by_directory[directory] = set(_list_files(directory, extension))
+        existing_paths = [(t, p) for t, p in paths if os.path.basename(p) in files_by_directory[os.path.dirname(p)]]
+        nr_not_found = len(paths) - len(existing_paths)
+        if nr_not_found:
+            info("{} of {} tiles not found in {}", nr_not_found, len(paths), self.path)
+
+        self.max_progress_changed.emit(len(paths))
+        progress = nr_not_found
+        pool = ThreadPool(self._nr_of_read_threads)
+        pending_reads = deque()
+        try:
+            for t, full_path in existing_paths:
+                if self._cancelling:
+                    break
+                pending_reads.append((t, pool.apply_async(_read_file, (full_path,))))
+                if len(pending_reads) >= self._max_pending_reads:
+                    progress += 1
+                    self.progress_changed.emit(progress)
+                    yield self._get_read_tile(zoom_level, pending_reads.popleft())
+            # the reads which have been started are finished anyway, their tiles are kept also when cancelling
+            while pending_reads:
+                progress += 1
+                self.progress_changed.emit(progress)
+                yield self._get_read_tile(zoom_level, pending_reads.popleft())
+        finally:
+            pool.close()
+            pool.join()
+
+    def _get_read_tile(self, zoom_level, pending_read):
+        coord, result = pending_read
+        tile = VectorTile(self.scheme(), zoom_level, coord[0], coord[1])
+        return tile, result.get()
+
+    def _get_tile_path(self):
         tile_path = self.json.get_value(key='tiles', is_array=True)
         if tile_path:
             tile_path = tile_path[0]
         else:
             tile_path = os.path.join(self.path, "{z}/{x}/{y}.pbf")
+        return tile_path
 
-        self.max_progress_changed.emit(tiles_to_load)
-        for index, t in enumerate(tiles_to_load):
-            self.progress_changed.emit(index)
-            full_path = tile_path.format(z=int(zoom_level), x=t[0], y=t[1])
-            col = t[0]
-            row = t[1]
-            tile = VectorTile(self.scheme(), zoom_level, col, row)
-            if os.path.isfile(full_path):
-                with open(full_path, 'rb') as f:
-                    encoded_data = f.read()
-                    tile_data_tuples.append((tile, encoded_data))
-            else:
-                info("File not found: {}", full_path)
-        return tile_data_tuples
+    def get_existing_tiles(self, zoom_level, tiles):
+        with self._index_lock:
+            zoom_index = self._get_zoom_index(zoom_level, columns=_get_columns(tiles))
+            if zoom_index is None:
+                return tiles
+            return zoom_index.filter(tiles)
+
+    def get_indexed_tiles(self, zoom_level, tiles):
+        if not _DIRECTORY_LAYOUT_REGEX.match(self._get_tile_path()):
+            return tiles
+        return _get_indexed_tiles(self._index_lock, self._zoom_indexes, zoom_level, tiles)
+
+    def _get_zoom_index(self, zoom_level, columns):
+        """
+         * Returns the index of the tiles of the specified zoom level, in which the specified columns are indexed,
+           or None, if the tiles aren't stored in the layout {z}/{x}/{y}.
+         * Each column is validated once per session by the modification time of its directory. Columns which
+           have been added or modified since they have been indexed are listed again.
+         * The caller has to hold the index lock.
+        """
+        match = _DIRECTORY_LAYOUT_REGEX.match(self._get_tile_path())
+        if not match:
+            return None
+        zoom_index = self._zoom_indexes.get(zoom_level)
+        if zoom_index is None:
+            zoom_index = self._tile_index.get(zoom_level, signature=[]) or ZoomIndex()
+            self._zoom_indexes[zoom_level] = zoom_index
+            self._validated_columns[zoom_level] = set()
+        validated_columns = self._validated_columns[zoom_level]
+        zoom_dir = os.path.join(match.group("base"), str(int(zoom_level)))
+        extension = match.group("extension") or ""
+        is_modified = False
+        for col in sorted(set(columns) - validated_columns):
+            column_dir = os.path.join(zoom_dir, str(col))
+            try:
+                signature = [os.path.getmtime(column_dir)]
+            except OSError:
+                signature = [None]
+            if not zoom_index.is_indexed(col, signature):
+                rows = []
+                for file_name in _list_files(column_dir, extension):
+                    row = file_name[:len(file_name) - len(extension)]
+                    if row.isdigit():
+                        rows.append(int(row))
+                zoom_index.add_sorted_tiles(columns=[col], tiles=((col, row) for row in sorted(rows)))
+                zoom_index.set_column_signature(col, signature)
+                is_modified = True
+            validated_columns.add(col)
+        if is_modified:
+            debug("Tile index of zoom level {} updated", zoom_level)
+            self._tile_index.put(zoom_level, [], zoom_index)
+        return zoom_index
+
+
+class PMTilesSource(AbstractSource):
+    """
+     * Reads the tiles of a PMTiles v3 archive from the local disk.
+     * The archive is memory mapped, so only the header, the directories covering the requested tiles and the
+       data of these tiles are read. The decompressed directories are cached.
+    """
+
+    _max_cached_directories = 64
+    _max_range_read_bytes = 4 * 1024 * 1024
+
+    def __init__(self, path):
+        AbstractSource.__init__(self)
+        if not os.path.isfile(path):
+            raise RuntimeError("The file does not exist: {}".format(path))
+
+        if os.path.getsize(path) < HEADER_SIZE_BYTES:
+            raise RuntimeError("The file '{}' is not a valid PMTiles archive and cannot be loaded.".format(path))
+
+        self.path = path
+        # guards the memory map and the cached directories, which are also accessed from the UI thread
+        self._lock = threading.RLock()
+        self._mmap = None
+        self._signature = None
+        self._header = None
+        self._metadata = None
+        self._directories = OrderedDict()
+
+        header = self._get_header()
+        if header["tile_type"] not in [TileType.Unknown, TileType.Mvt]:
+            raise RuntimeError(
+                "The file '{}' is not a valid Mapbox vector tile file and cannot be loaded.".format(path))
+        if header["tile_compression"] not in [Compression.Unknown, Compression.NoCompression, Compression.Gzip]:
+            raise RuntimeError("The tile compression {} of the file '{}' is not supported."
+                               .format(header["tile_compression"], path))
+
+    def source(self):
+        return self.path
+
+    def attribution(self):
+        return self._get_metadata().get("attribution", "")
+
+    def vector_layers(self):
+        layers = self._get_metadata().get("vector_layers", [])
+        if not layers:
+            warn("No vector_layers found in metadata")
+        return layers
+
+    def name(self):
+        name = self._get_metadata().get("name")
+        if not name:
+            name = os.path.splitext(os.path.basename(self.path))[0]
+        return name
+
+    def min_zoom(self):
+        return self._get_header()["min_zoom"]
+
+    def max_zoom(self):
+        return self._get_header()["max_zoom"]
+
+    def mask_level(self):
+        return self._get_metadata().get("maskLevel")
+
+    def scheme(self):
+        return "xyz"
+
+    def bounds(self):
+        header = self._get_header()
+        bounds = [header["min_lon"], header["min_lat"], header["max_lon"], header["max_lat"]]
+        if not any(bounds):
+            return None
+        return bounds
+
+    def bounds_tile(self, zoom):
+        bounds = self.bounds()
+        if not bounds:
+            bounds = WORLD_BOUNDS
+        return get_tile_bounds(zoom=zoom, bounds=bounds, scheme=self.scheme(), source_crs=4326)
+
+    def crs(self):
+        return _DEFAULT_CRS
+
+    def close_connection(self):
+        """
+         * Unmaps the archive. It's mapped again with the next access, the cached directories are kept,
+           unless the file has changed in the meantime.
+        """
+        with self._lock:
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
+
+    def get_existing_tiles(self, zoom_level, tiles):
+        return [t for t in tiles if self._find_tile(zoom_level, t[0], t[1])]
+
+    def get_indexed_tiles(self, zoom_level, tiles):
+        try:
+            return [t for t in tiles if self._find_tile(zoom_level, t[0], t[1], cached_only=True)]
+        except KeyError:
+            return None
+
+    def load_tiles(self, zoom_level, tiles_to_load, max_tiles=None):
+        return list(self.iter_tiles(zoom_level=zoom_level, tiles_to_load=tiles_to_load, max_tiles=max_tiles))
+
+    def iter_tiles(self, zoom_level, tiles_to_load, max_tiles=None):
+        """
+         * Yields the requested tiles in the order in which they are stored in the archive.
+         * Tiles whose data are stored one after another are read with a single range read. Tiles sharing
+           the same data get the offset of the data as payload_id.
+        """
+        self._cancelling = False
+        if max_tiles is not None and len(tiles_to_load) > max_tiles:
+            tiles_to_load = get_tiles_from_center(max_tiles, tiles_to_load, should_cancel_func=lambda: self._cancelling)
+            self.tile_limit_reached.emit()
+
+        self.max_progress_changed.emit(len(tiles_to_load))
+        locations = []
+        for col, row in tiles_to_load:
+            if self._cancelling:
+                return
+            location = self._find_tile(zoom_level, col, row)
+            if location:
+                locations.append((location[0], location[1], col, row))
+        nr_not_found = len(tiles_to_load) - len(locations)
+        if nr_not_found:
+            info("{} of {} tiles not found in {}", nr_not_found, len(tiles_to_load), self.path)
+
+        progress = nr_not_found
+        for start, end, run in self._get_contiguous_runs(sorted(locations)):
+            if self._cancelling:
+                break
+            data = self._read(start, end - start)
+            for offset, length, col, row in run:
+                tile = VectorTile(self.scheme(), zoom_level, col, row)
+                tile.payload_id = offset
+                progress += 1
+                self.progress_changed.emit(progress)
+                yield tile, data[offset - start:offset - start + length]
+
+    def _get_contiguous_runs(self, locations):
+        """
+         * Groups the locations, sorted by offset, into runs without gaps between the data of the tiles
+        :return: A list of tuples (start, end, locations)
+        """
+        runs = []
+        for location in locations:
+            offset, length = location[0], location[1]
+            if runs:
+                start, end, run = runs[-1]
+                if offset <= end and max(end, offset + length) - start <= self._max_range_read_bytes:
+                    run.append(location)
+                    runs[-1] = (start, max(end, offset + length), run)
+                    continue
+            runs.append((offset, offset + length, [location]))
+        return runs
+
+    def _find_tile(self, zoom_level, col, row, cached_only=False):
+        """
+         * Returns the tuple (offset, length) of the data of the tile within the file or None,
+           if the tile doesn't exist
+        :param cached_only: If True, only the cached header and directories are used and a KeyError is raised,
+         if they aren't cached
+        """
+        nr_of_tiles_per_axis = 1 << int(zoom_level)
+        if not (0 <= col < nr_of_tiles_per_axis and 0 <= row < nr_of_tiles_per_axis):
+            return None
+        tile_id = zxy_to_tile_id(int(zoom_level), col, row)
+        if cached_only:
+            header = self._header
+            if header is None:
+                raise KeyError("header")
+        else:
+            header = self._get_header()
+        offset = header["root_offset"]
+        length = header["root_length"]
+        for _ in range(MAX_DIRECTORY_DEPTH):
+            entry = self._get_directory(offset, length, cached_only).find(tile_id)
+            if entry is None:
+                return None
+            entry_offset, entry_length, is_leaf = entry
+            if not is_leaf:
+                return header["tile_data_offset"] + entry_offset, entry_length
+            offset = header["leaf_directory_offset"] + entry_offset
+            length = entry_length
+        return None
+
+    def _get_directory(self, offset, length, cached_only=False):
+        key = (offset, length)
+        with self._lock:
+            directory = self._directories.pop(key, None)
+            if directory is not None:
+                self._directories[key] = directory
+                return directory
+        if cached_only:
+            raise KeyError(key)
+        data = decompress_internal(self._read(offset, length), self._get_header()["internal_compression"])
+        directory = Directory.deserialize(data)
+        with self._lock:
+            if key not in self._directories and len(self._directories) >= self._max_cached_directories:
+                self._directories.popitem(last=False)
+            self._directories[key] = directory
+        return directory
+
+    def _get_header(self):
+        self._get_archive()
+        return self._header
+
+    def _get_metadata(self):
+        if self._metadata is None:
+            header = self._get_header()
+            metadata = {}
+            if header["metadata_length"]:
+                data = self._read(header["metadata_offset"], header["metadata_length"])
+                try:
+                    metadata = json.loads(decompress_internal(data, header["internal_compression"]).decode("utf-8"))
+                except ValueError:
+                    warn("Invalid metadata in '{}': {}", self.path, sys.exc_info()[1])
+            self._metadata = metadata
+        return self._metadata
+
+    def _read(self, offset, length):
+        # the archive could be unmapped by close_connection while it's sliced otherwise
+        with self._lock:
+            return self._get_archive()[offset:offset + length]
+
+    def _get_archive(self):
+        """
+         * Returns the memory map of the archive. The cached header, metadata and directories are discarded,
+           if the file has changed since it has been mapped the last time.
+        """
+        with self._lock:
+            if self._mmap is None:
+                stat = os.stat(self.path)
+                signature = (stat.st_mtime, stat.st_size)
+                if signature != self._signature:
+                    self._signature = signature
+                    self._header = None
+                    self._metadata = None
+                    self._directories.clear()
+                with open(self.path, 'rb') as f:
+                    self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                if self._header is None:
+                    self._header = read_header(self._mmap[:HEADER_SIZE_BYTES])
+            return self._mmap
+
+
+class PostGISSource(AbstractSource):
+    """
+     * Creates the tiles on demand from the geometry tables of a PostGIS database using ST_AsMVT.
+     * Each table becomes a layer of the tiles. The tiles are queried concurrently on a bounded pool of
+       connections, which is created when the first tile is loaded and closed by close_connection.
+    """
+
+    _nr_of_connections = 4
+    _max_pending_queries = 16
+
+    def __init__(self, connection):
+        """
+        :param connection: A connection created from POSTGIS_CONNECTION_TEMPLATE. If the key 'tables' contains
+         a list of table names (optionally prefixed by the schema), only these tables are used as layers.
+        """
+        AbstractSource.__init__(self)
+        if psycopg2 is None:
+            raise RuntimeError("The Python package psycopg2 is required to load tiles from PostGIS.")
+        self._connection = connection
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._layers = None
+        self._tile_sql = None
+        self._bounds = None
+
+    def source(self):
+        return "postgres://{}:{}/{}".format(self._connection["host"],
+                                           self._connection["port"],
+                                           self._connection["database"])
+
+    def name(self):
+        return self._connection["name"]
+
+    def attribution(self):
+        return ""
+
+    def vector_layers(self):
+        return [{"id": layer["name"],
+                 "description": "{}.{}".format(layer["schema"], layer["table"]),
+                 "fields": layer["fields"]} for layer in self._get_layers()]
+
+    def min_zoom(self):
+        return self._connection.get("min_zoom") or 0
+
+    def max_zoom(self):
+        return self._connection.get("max_zoom") or 14
+
+    def mask_level(self):
+        return None
+
+    def scheme(self):
+        return "xyz"
+
+    def crs(self):
+        return _DEFAULT_CRS
+
+    def bounds(self):
+        """
+         * Returns the union of the estimated extents of the tables. The extents are based on the table statistics,
+           i.e. they are only available for analyzed tables.
+        """
+        if self._bounds is None:
+            sql = """SELECT ST_XMin(e) x_min, ST_YMin(e) y_min, ST_XMax(e) x_max, ST_YMax(e) y_max FROM (
+                       SELECT ST_Transform(ST_SetSRID(ST_EstimatedExtent(%s, %s, %s)::geometry, %s), 4326) e
+                     ) AS extent"""
+            extents = []
+            for layer in self._get_layers():
+                rows = self._execute(sql, (layer["schema"], layer["table"], layer["geometry_column"], layer["srid"]))
+                if rows and rows[0][0] is not None:
+                    extents.append(rows[0])
+            bounds = WORLD_BOUNDS
+            if extents:
+                bounds = [min(e[0] for e in extents), min(e[1] for e in extents),
+                          max(e[2] for e in extents), max(e[3] for e in extents)]
+            self._bounds = bounds
+        return self._bounds
+
+    def bounds_tile(self, zoom):
+        return get_tile_bounds(zoom=zoom, bounds=self.bounds(), scheme=self.scheme(), source_crs=4326)
+
+    def close_connection(self):
+        """
+         * Closes the connections of the pool. A new pool is created when tiles are loaded the next time.
+        """
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+
+    def load_tiles(self, zoom_level, tiles_to_load, max_tiles=None):
+        return list(self.iter_tiles(zoom_level=zoom_level, tiles_to_load=tiles_to_load, max_tiles=max_tiles))
+
+    def iter_tiles(self, zoom_level, tiles_to_load, max_tiles=None):
+        """
+         * Yields the tiles in the order of tiles_to_load, while the following tiles are being created by the
+           database. Tiles without any features are skipped.
+        """
+        self._cancelling = False
+        if max_tiles is not None and len(tiles_to_load) > max_tiles:
+            tiles_to_load = get_tiles_from_center(max_tiles, tiles_to_load, should_cancel_func=lambda: self._cancelling)
+            self.tile_limit_reached.emit()
+
+        self.max_progress_changed.emit(len(tiles_to_load))
+        sql = self._get_tile_sql()
+        if not sql:
+            warn("No geometry tables found in {}", self.source())
+            return
+
+        progress = 0
+        pool = ThreadPool(self._nr_of_connections)
+        pending_queries = deque()
+        try:
+            for col, row in tiles_to_load:
+                if self._cancelling:
+                    break
+                tile = VectorTile(self.scheme(), zoom_level, col, row)
+                pending_queries.append((tile, pool.apply_async(self._query_tile, (sql, tile))))
+                if len(pending_queries) >= self._max_pending_queries:
+                    progress += 1
+                    self.progress_changed.emit(progress)
+                    tile, result = pending_queries.popleft()
+                    data = result.get()
+                    if data:
+                        yield tile, data
+            # the queries which have been started are finished anyway, their tiles are kept also when cancelling
+            while pending_queries:
+                progress += 1
+                self.progress_changed.emit(progress)
+                tile, result = pending_queries.popleft()
+                data = result.get()
+                if data:
+                    yield tile, data
+        finally:
+            pool.close()
+            pool.join()
+
+    def _query_tile(self, sql, tile):
+        x_min, y_min, x_max, y_max = tile.extent
+        buffer_size = (x_max - x_min) * _MVT_BUFFER / _MVT_EXTENT
+        parameters = {
+            "x_min": x_min,
+            "y_min": y_min,
+            "x_max": x_max,
+            "y_max": y_max,
+            "buffer": buffer_size
+        }
+        rows = self._execute(sql, parameters)
+        if rows and rows[0][0]:
+            return bytes(rows[0][0])
+        return None
+
+    def _get_tile_sql(self):
+        """
+         * Returns the query creating a tile with all layers. The envelope of the tile, in EPSG:3857,
+           is passed as the parameters x_min, y_min, x_max, y_max and buffer.
+         * The layers are encoded separately and concatenated, which results in a valid tile with several layers.
+        """
+        if self._tile_sql is None:
+            envelope = "ST_MakeEnvelope(%(x_min)s, %(y_min)s, %(x_max)s, %(y_max)s, 3857)"
+            layer_queries = []
+            for layer in self._get_layers():
+                columns = "".join("{}, ".format(_quote_identifier(c)) for c in layer["fields"])
+                geometry_column = _quote_identifier(layer["geometry_column"])
+                layer_queries.append("""COALESCE((
+                    SELECT ST_AsMVT(q, {name}, {extent}, 'vtr_mvt_geometry') FROM (
+                        SELECT {columns}ST_AsMVTGeom(ST_Transform({geometry}, 3857), {envelope},
+                                                     {extent}, {buffer}, true) AS vtr_mvt_geometry
+                        FROM {schema}.{table}
+                        WHERE {geometry} && ST_Transform(ST_Expand({envelope}, %(buffer)s), {srid})
+                    ) AS q WHERE q.vtr_mvt_geometry IS NOT NULL
+                ), ''::bytea)""".format(name=_escape_parameter_marks(_quote_literal(layer["name"])),
+                                        extent=_MVT_EXTENT,
+                                        buffer=_MVT_BUFFER,
+                                        columns=_escape_parameter_marks(columns),
+                                        geometry=_escape_parameter_marks(geometry_column),
+                                        envelope=envelope,
+                                        schema=_escape_parameter_marks(_quote_identifier(layer["schema"])),
+                                        table=_escape_parameter_marks(_quote_identifier(layer["table"])),
+                                        srid=int(layer["srid"])))
+            sql = ""
+            if layer_queries:
+                sql = "SELECT {}".format(" || ".join(layer_queries))
+            self._tile_sql = sql
+        return self._tile_sql
+
+    def _get_layers(self):
+        """
+         * Returns the geometry tables, restricted to the tables of the connection, if there are any
+        """
+        if self._layers is None:
+            tables = self._connection.get("tables")
+            sql = """SELECT f_table_schema, f_table_name, f_geometry_column, srid
+                     FROM geometry_columns
+                     ORDER BY f_table_schema, f_table_name, f_geometry_column"""
+            layers = []
+            for schema, table, geometry_column, srid in self._execute(sql):
+                if tables and table not in tables and "{}.{}".format(schema, table) not in tables:
+                    continue
+                if not srid:
+                    warn("The table {}.{} is ignored, as the SRID of its geometries is unknown", schema, table)
+                    continue
+                column_sql = """SELECT column_name, udt_name FROM information_schema.columns
+                                WHERE table_schema = %s AND table_name = %s AND column_name <> %s
+                                ORDER BY ordinal_position"""
+                columns = self._execute(column_sql, (schema, table, geometry_column))
+                fields = OrderedDict((name, column_type) for name, column_type in columns
+                                     if column_type not in _UNSUPPORTED_POSTGIS_COLUMN_TYPES)
+                layers.append({
+                    "name": table,
+                    "schema": schema,
+                    "table": table,
+                    "geometry_column": geometry_column,
+                    "srid": srid,
+                    "fields": fields
+                })
+            debug("PostGIS layers: {}", [l["name"] for l in layers])
+            self._layers = layers
+        return self._layers
+
+    def _execute(self, sql, parameters=None):
+        """
+         * Returns the rows of the query. Transient errors (e.g. a lost connection) are logged and result in no rows,
+           other errors (e.g. a missing table or permission) raise a RuntimeError, so that the loading fails.
+        """
+        pool = self._get_pool()
+        conn = pool.getconn()
+        try:
+            conn.autocommit = True
+            cur = conn.cursor()
+            try:
+                cur.execute(sql, parameters)
+                return cur.fetchall()
+            finally:
+                cur.close()
+        except psycopg2.OperationalError:
+            warn("Query on {} failed: {}", self.source(), sys.exc_info()[1])
+            return []
+        except psycopg2.Error:
+            raise RuntimeError("Query on {} failed: {}".format(self.source(), sys.exc_info()[1]))
+        finally:
+            # broken connections are discarded by the pool
+            pool.putconn(conn, close=bool(conn.closed))
+
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                debug("Connecting to: {}", self.source())
+                try:
+                    self._pool = ThreadedConnectionPool(1, self._nr_of_connections,
+                                                        host=self._connection["host"],
+                                                        port=self._connection["port"],
+                                                        user=self._connection["username"],
+                                                        password=self._connection["password"],
+                                                        dbname=self._connection["database"])
+                except psycopg2.Error:
+                    raise RuntimeError("Connecting to {} failed: {}".format(self.source(), sys.exc_info()[1]))
+            return self._pool
+
+
+def _read_file(path):
+    """
+     * Returns the content of the file. It's read with a single read call, without querying the size of the file.
+    """
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _get_indexed_tiles(index_lock, zoom_indexes, zoom_level, tiles):
+    """
+     * Returns the tiles which exist according to the zoom index held in memory or None, if the columns of the tiles
+       aren't indexed yet. As the index isn't built here, None is returned too, while the index is being updated.
+    """
+    if not index_lock.acquire(False):
+        return None
+    try:
+        zoom_index = zoom_indexes.get(zoom_level)
+        if zoom_index is None:
+            return None
+        if zoom_index.too_large:
+            return tiles
+        if zoom_index.get_missing_columns(_get_columns(tiles)):
+            return None
+        return zoom_index.filter(tiles)
+    finally:
+        index_lock.release()
+
+
+def _get_columns(tiles):
+    if isinstance(tiles, TileRange):
+        return range(tiles.x_min, tiles.x_max + 1)
+    return set(t[0] for t in tiles)
+
+
+def _get_column_runs(columns):
+    """
+     * Returns the sorted columns as runs of consecutive columns
+    :return: A list of tuples (first_col, last_col)
+    """
+    runs = []
+    for col in columns:
+        if runs and runs[-1][1] + 1 == col:
+            runs[-1] = (runs[-1][0], col)
+        else:
+            runs.append((col, col))
+    return runs
+
+
+def _list_files(path, extension):
+    """
+     * Returns the names of the files with the extension in the specified directory or an empty list, if the
+       directory doesn't exist.
+     * The entries are filtered by their names only, i.e. there is no stat call per entry, which would be
+       expensive on network shares.
+    """
+    try:
+        names = os.listdir(path)
+    except OSError:
+        return []
+    return [name for name in names if name.endswith(extension)]
+
+
+def _quote_identifier(name):
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+def _quote_literal(value):
+    return "'{}'".format(value.replace("'", "''"))
+
+
+def _escape_parameter_marks(sql):
+    """
+     * Escapes the % in sql, which would otherwise be interpreted as query parameter by psycopg2
+    """
+    return sql.replace("%", "%%")
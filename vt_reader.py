@@ -9,54 +9,72 @@ try:
 except ImportError:
     import json
 import uuid
+import hashlib
+import threading
 import traceback
 
 if "VTR_TESTS" not in os.environ or os.environ["VTR_TESTS"] != '1':
     from .util.vtr_2to3 import *
     from .util.qgis_helper import get_loaded_layers_of_connection
     from .util.log_helper import info, critical, debug, remove_key
-    from .util.tile_helper import get_all_tiles, get_code_from_epsg, clamp, create_bounds, VectorTile
+    from .util.tile_helper import (get_all_tiles,
+                                   get_code_from_epsg,
+                                   clamp,
+                                   create_bounds,
+                                   get_parent_range,
+                                   get_tile_key,
+                                   VectorTile)
+    from .util.overzoom_helper import get_overzoomed_data
     from .util.feature_helper import (FeatureMerger,
                                      geo_types,
                                      is_multi,
-                                     map_coordinates_recursive,
+                                     map_tile_coordinates,
+                                     TileAffine,
+                                     translate_coordinates_recursive,
                                      GeoTypes,
                                      clip_features)
     from .util.file_helper import (get_styles,
                                    get_style_folder,
                                    assure_temp_dirs_exist,
                                    get_cache_entry,
-                                   is_gzipped,
+                                   is_tile_cached,
                                    get_geojson_file_name,
                                    get_icons_directory,
                                    cache_tile)
-    from .util.tile_source import ServerSource, MBTilesSource, DirectorySource
+    from .util.tile_source import ServerSource, MBTilesSource, DirectorySource, PMTilesSource, PostGISSource
     from .util.connection import ConnectionTypes
     from .util.mp_helper import decode_tile_native, decode_tile_python, can_load_lib
 else:
     from util.vtr_2to3 import *
     from util.qgis_helper import get_loaded_layers_of_connection
     from util.log_helper import info, critical, debug, remove_key
-    from util.tile_helper import get_all_tiles, get_code_from_epsg, clamp, create_bounds, VectorTile
+    from util.tile_helper import (get_all_tiles,
+                                  get_code_from_epsg,
+                                  clamp,
+                                  create_bounds,
+                                  get_parent_range,
+                                  get_tile_key,
+                                  VectorTile)
+    from util.overzoom_helper import get_overzoomed_data
     from util.feature_helper import (FeatureMerger,
                                      geo_types,
                                      is_multi,
-                                     map_coordinates_recursive,
+                                     map_tile_coordinates,
+                                     TileAffine,
+                                     translate_coordinates_recursive,
                                      GeoTypes,
                                      clip_features)
     from util.file_helper import (get_styles,
                                   get_style_folder,
                                   assure_temp_dirs_exist,
                                   get_cache_entry,
-                                  is_gzipped,
+                                  is_tile_cached,
                                   get_geojson_file_name,
                                   get_icons_directory,
                                   cache_tile)
-    from util.tile_source import ServerSource, MBTilesSource, DirectorySource
+    from util.tile_source import ServerSource, MBTilesSource, DirectorySource, PMTilesSource, PostGISSource
     from util.connection import ConnectionTypes
     from util.mp_helper import decode_tile_native, decode_tile_python, can_load_lib
-from io import BytesIO
-from gzip import GzipFile
 
 import multiprocessing as mp
 
@@ -79,6 +97,7 @@ class VtReader(QObject):
     tile_limit_reached = pyqtSignal(int, name='tile_limit_reached')
     cancelled = pyqtSignal(name='cancelled')
     add_layer_to_group = pyqtSignal(object, name='add_layer_to_group')
+    network_statistics_changed = pyqtSignal(dict, name='networkStatisticsChanged')
 
     _loading_options = {
             'zoom_level': None,
@@ -88,10 +107,13 @@ class VtReader(QObject):
             'clip_tiles': None,
             'apply_styles': None,
             'max_tiles': None,
-            'bounds': None
+            'bounds': None,
+            'overzoom': False,
+            'cache_only': False
         }
 
     _nr_tiles_to_process_serial = 30
+    _max_pending_tasks_per_processor = 4
     _layers_to_dissolve = []
     _zoom_level_delimiter = "*"
     _DEFAULT_EXTENT = 4096
@@ -111,7 +133,6 @@ class VtReader(QObject):
 
         self._connection = connection
         self._source = self._create_source(connection)
-        self._external_source = self._create_source(connection)
 
         assure_temp_dirs_exist()
         self.iface = iface
@@ -122,6 +143,9 @@ class VtReader(QObject):
         self._flush = False
         self._feature_count = None
         self._allowed_sources = None
+        self._overzoomed_tiles = None
+        self._overzoom_parents = {}
+        self._prefetcher = None
 
     def connection(self):
         return self._connection
@@ -137,15 +161,37 @@ class VtReader(QObject):
     def get_source(self):
         """
          * Returns the source being used of the current reader. This method is intended for external use,
-         i.e. from outside of this reader. SQlite objects must only be used in the thread they were created.
-         As a result of this, each reader creates two identical connections, but one is created within and one
-         outisde of the thread.
+         i.e. from outside of this reader. The source can be used from any thread, MBTiles sources use a separate
+         SQLite connection per thread.
         :return:
         """
 
-        return self._external_source
+        return self._source
+
+    def are_tiles_cached(self, bounds):
+        """
+         * Returns True, if all tiles within the bounds, which exist in the source, are cached.
+         * Only the data held in memory is used, neither the source nor the cache is read. It's cheap enough to be
+           called from the UI thread, tiles whose existence or cache entry is unknown are treated as not cached.
+        :param bounds: The tile bounds of the zoom level to check, which must not be above the max. zoom of the source
+        """
+        zoom_level = bounds["zoom"]
+        tiles = self._source.get_indexed_tiles(zoom_level=zoom_level, tiles=get_all_tiles(bounds=bounds))
+        if not tiles:
+            return False
+        source_name = self._source.name()
+        return all(is_tile_cached(source_name, zoom_level, t[0], t[1]) for t in tiles)
 
     def _create_source(self, connection):
+        source = self.create_source_of_connection(connection)
+        source.progress_changed.connect(self._source_progress_changed)
+        source.max_progress_changed.connect(self._source_max_progress_changed)
+        source.message_changed.connect(self._source_message_changed)
+        source.tile_limit_reached.connect(self._source_tile_limit_reached)
+        return source
+
+    @staticmethod
+    def create_source_of_connection(connection):
         conn_type = connection["type"]
         if conn_type == ConnectionTypes.TileJSON:
             source = ServerSource(url=connection["url"])
@@ -153,16 +199,17 @@ class VtReader(QObject):
             source = MBTilesSource(path=connection["path"])
         elif conn_type == ConnectionTypes.Directory:
             source = DirectorySource(path=connection["path"])
+        elif conn_type == ConnectionTypes.PMTiles:
+            source = PMTilesSource(path=connection["path"])
+        elif conn_type == ConnectionTypes.PostGIS:
+            source = PostGISSource(connection=connection)
         else:
             raise RuntimeError("Type not set on connection")
-        source.progress_changed.connect(self._source_progress_changed)
-        source.max_progress_changed.connect(self._source_max_progress_changed)
-        source.message_changed.connect(self._source_message_changed)
-        source.tile_limit_reached.connect(self._source_tile_limit_reached)
         return source
 
     def shutdown(self):
         info("Shutdown reader")
+        self.cancel_prefetch()
         self._source.progress_changed.disconnect()
         self._source.max_progress_changed.disconnect()
         self._source.message_changed.disconnect()
@@ -238,9 +285,6 @@ class VtReader(QObject):
         return zoom_level
 
     def _load_tiles(self):
-        # recreate source to assure the source belongs to the new thread, SQLite3 isn't happy about it otherwise
-        self._source = self._create_source(self.connection())
-
         try:
             if can_load_lib():
                 info("Native decoding supported!!!")
@@ -265,10 +309,16 @@ class VtReader(QObject):
 
             zoom_level = self._get_clamped_zoom_level()
 
-            all_tiles = get_all_tiles(
-                bounds=bounds,
-                is_cancel_requested_handler=lambda: self.cancel_requested,
-            )
+            all_tiles = get_all_tiles(bounds=bounds)
+            self._overzoomed_tiles = None
+            if self._loading_options["overzoom"] and bounds["zoom"] > zoom_level:
+                # the tiles on the requested zoom level are created from their parents on the max zoom level
+                self._overzoomed_tiles = all_tiles
+                all_tiles = get_parent_range(all_tiles, bounds["zoom"] - zoom_level)
+                info("Overzooming from zoom level {} to {}", zoom_level, bounds["zoom"])
+            nr_of_tiles_in_bounds = len(all_tiles)
+            all_tiles = self._source.get_existing_tiles(zoom_level=zoom_level, tiles=all_tiles)
+            debug("{} of {} tiles in the bounds exist in the source", len(all_tiles), nr_of_tiles_in_bounds)
             tiles_to_load = set()
             cached_tiles = []
             tiles_to_ignore = set()
@@ -278,7 +328,11 @@ class VtReader(QObject):
                 if self.cancel_requested or (max_tiles and len(cached_tiles) >= max_tiles):
                     break
 
-                decoded_data = get_cache_entry(cache_name=source_name, zoom_level=zoom_level, x=t[0], y=t[1])
+                decoded_data = None
+                if self._overzoomed_tiles is not None:
+                    decoded_data = self._overzoom_parents.get(get_tile_key(zoom_level, t[0], t[1]))
+                if not decoded_data:
+                    decoded_data = get_cache_entry(cache_name=source_name, zoom_level=zoom_level, x=t[0], y=t[1])
                 if decoded_data:
                     tile = VectorTile(scheme=scheme, zoom_level=zoom_level, x=t[0], y=t[1])
                     tile.decoded_data = decoded_data
@@ -288,28 +342,39 @@ class VtReader(QObject):
                     tiles_to_load.add(t)
 
             remaining_nr_of_tiles = len(tiles_to_load)
-            if max_tiles:
+            if self._loading_options["cache_only"]:
+                remaining_nr_of_tiles = 0
+            elif max_tiles:
                 if len(cached_tiles) + len(tiles_to_load) >= max_tiles:
                     remaining_nr_of_tiles = clamp(max_tiles - len(cached_tiles), low=0)
             info("{} tiles in cache. Max. {} will be loaded additionally.", len(cached_tiles), remaining_nr_of_tiles)
+            # the parents of the previous load have been used, they're replaced by the ones of this load
+            self._overzoom_parents = {}
             if len(cached_tiles) > 0:
                 if not self.cancel_requested:
-                    self._process_tiles(cached_tiles, layer_filter)
-                    self._all_tiles.extend(cached_tiles)
+                    self._process_loaded_tiles(cached_tiles, layer_filter)
+                self._release_decoded_data(cached_tiles)
 
             debug("Loading data for zoom level '{}' source '{}'", zoom_level, self._source.name())
 
-            if remaining_nr_of_tiles:
-                tile_data_tuples = self._source.load_tiles(zoom_level=zoom_level,
+            if remaining_nr_of_tiles and not self.cancel_requested:
+                tile_data_tuples = self._source.iter_tiles(zoom_level=zoom_level,
                                                            tiles_to_load=tiles_to_load,
                                                            max_tiles=remaining_nr_of_tiles)
-                if len(tile_data_tuples) > 0 and not self.cancel_requested:
-                    tiles = self._decode_tiles(tile_data_tuples)
-                    self._process_tiles(tiles, layer_filter)
-                    for t in tiles:
-                        cache_tile(cache_name=source_name, zoom_level=zoom_level, x=t.column, y=t.row,
-                                   decoded_data=t.decoded_data)
-                    self._all_tiles.extend(tiles)
+                revalidated_tiles = []
+                tiles = self._decode_tiles(self._divert_revalidated_tiles(tile_data_tuples, revalidated_tiles))
+                if len(revalidated_tiles) > 0 and not self.cancel_requested:
+                    self._process_loaded_tiles(revalidated_tiles, layer_filter)
+                self._release_decoded_data(revalidated_tiles)
+                if len(tiles) > 0 and not self.cancel_requested:
+                    self._process_loaded_tiles(tiles, layer_filter)
+                elif len(tiles) > 0:
+                    info("Loading cancelled, caching the {} tiles loaded until then", len(tiles))
+                for t in tiles:
+                    cache_tile(cache_name=source_name, zoom_level=zoom_level, x=t.column, y=t.row,
+                               decoded_data=t.decoded_data, validators=t.validators)
+                self._release_decoded_data(tiles)
+                self._report_network_statistics()
             self._continue_loading()
 
         except Exception as e:
@@ -318,6 +383,20 @@ class VtReader(QObject):
                 tb = traceback.format_exc()
             critical("An exception occured: {}, {}", e, tb)
             self.cancelled.emit()
+        finally:
+            # the loading thread is finished afterwards, its connection can be reused by the next one
+            self._source.close_connection()
+
+    def _report_network_statistics(self):
+        """
+         * Logs the network statistics of the current load and emits them, if the source used the network
+        """
+        statistics = self._source.statistics()
+        if statistics is None or not statistics.hosts():
+            return
+        summary = statistics.summary()
+        info("Network statistics: {}", json.dumps(summary, sort_keys=True))
+        self.network_statistics_changed.emit(summary)
 
     def _continue_loading(self):
         zoom_level = self._loading_options["zoom_level"]
@@ -340,6 +419,45 @@ class VtReader(QObject):
                 loaded_extent = {}
             self.loading_finished.emit(zoom_level, loaded_extent)
 
+    def _process_loaded_tiles(self, tiles, layer_filter):
+        """
+         * Creates the features of the loaded tiles. When overzooming, the features are created from the children
+           of the loaded tiles on the requested zoom level instead, whose data is clipped from the loaded tiles.
+        """
+        if self._overzoomed_tiles is not None:
+            for t in tiles:
+                self._overzoom_parents[t.key()] = t.decoded_data
+            tiles = self._get_overzoomed_tiles(tiles)
+        self._process_tiles(tiles, layer_filter)
+        self._all_tiles.extend(tiles)
+        if self._overzoomed_tiles is not None:
+            self._release_decoded_data(tiles)
+
+    def _get_overzoomed_tiles(self, parent_tiles):
+        zoom_level = self._loading_options["zoom_level"]
+        levels = zoom_level - self._get_clamped_zoom_level()
+        tiles = []
+        for parent in parent_tiles:
+            if not parent.decoded_data:
+                continue
+            for col in range(parent.column << levels, (parent.column + 1) << levels):
+                for row in range(parent.row << levels, (parent.row + 1) << levels):
+                    if (col, row) in self._overzoomed_tiles:
+                        tile = VectorTile(scheme=parent.scheme, zoom_level=zoom_level, x=col, y=row)
+                        tile.decoded_data = get_overzoomed_data(parent.decoded_data, parent, tile)
+                        if tile.decoded_data:
+                            tiles.append(tile)
+        return tiles
+
+    @staticmethod
+    def _release_decoded_data(tiles):
+        """
+         * Drops the decoded data of the tiles once their features have been created and they have been cached.
+           The tiles are kept in _all_tiles to calculate the loaded extent, which doesn't need the data.
+        """
+        for t in tiles:
+            t.decoded_data = None
+
     @staticmethod
     def _get_extent(tiles, zoom_level, scheme):
         loaded_tiles_x = [t.coord()[0] for t in tiles]
@@ -356,7 +474,7 @@ class VtReader(QObject):
         return bounds
 
     def set_options(self, load_mask_layer=False, merge_tiles=True, clip_tiles=False, apply_styles=False, max_tiles=None,
-                    layer_filter=None, is_inspection_mode=False):
+                    layer_filter=None, is_inspection_mode=False, overzoom=False, cache_only=False):
         """
          * Specify the reader options
         :param is_inspection_mode:
@@ -367,6 +485,9 @@ class VtReader(QObject):
         :param max_tiles: The maximum number of tiles to load
         :param layer_filter: A list of layers. If any layers are set, only these will be loaded. If the list is empty,
             all available layers will be loaded
+        :param overzoom: If True, zoom levels above the max zoom of the source are created from the cached tiles
+            of the max zoom level, instead of loading the tiles of the max zoom level
+        :param cache_only: If True, only the cached tiles are used and no tiles are loaded from the source
         :return:
         """
         if layer_filter:
@@ -378,7 +499,9 @@ class VtReader(QObject):
             'apply_styles': apply_styles,
             'max_tiles': max_tiles,
             'layer_filter': layer_filter,
-            'inspection_mode': is_inspection_mode
+            'inspection_mode': is_inspection_mode,
+            'overzoom': overzoom,
+            'cache_only': cache_only
         }
 
     def load_tiles_async(self, bounds):
@@ -390,6 +513,7 @@ class VtReader(QObject):
         """
         zoom_level = bounds["zoom"]
         info("Loading zoom level '{}', bounds: {}", zoom_level, bounds)
+        self.cancel_prefetch()
         self._loading_options["zoom_level"] = zoom_level
         self._loading_options["bounds"] = bounds
         _worker_thread = QThread(self.iface.mainWindow())
@@ -397,92 +521,213 @@ class VtReader(QObject):
         _worker_thread.started.connect(self._load_tiles)
         _worker_thread.start()
 
+    def prefetch_async(self, tiles_by_zoom, max_bytes):
+        """
+         * Loads the specified tiles into the cache in the background, until max_bytes have been loaded.
+         * The prefetching is cancelled as soon as the next tiles are loaded by the reader.
+        :param tiles_by_zoom: A list of tuples (zoom_level, tiles) in the order of their priority
+        :param max_bytes: The max. number of bytes of encoded tile data to load
+        """
+        if not self._prefetcher:
+            self._prefetcher = TilePrefetcher(self._connection)
+        clip_tiles = not self._loading_options.get("inspection_mode")
+        self._prefetcher.prefetch_async(tiles_by_zoom, max_bytes=max_bytes, clip_tiles=clip_tiles,
+                                        parent=self.iface.mainWindow())
+
+    def cancel_prefetch(self):
+        if self._prefetcher:
+            self._prefetcher.cancel()
+
     @staticmethod
-    def _get_pool():
+    def _get_nr_of_processors():
         nr_processors = 4
         try:
             nr_processors = mp.cpu_count()
         except NotImplementedError:
             info("CPU count cannot be retrieved. Falling back to default = 4")
+        return nr_processors
+
+    @staticmethod
+    def _get_pool(nr_processors):
         pool = mp.Pool(nr_processors)
         return pool
 
+    @staticmethod
+    def _divert_revalidated_tiles(tile_data_tuples, revalidated_tiles):
+        """
+         * Passes through the tiles which have to be decoded. Tiles whose cache entry has been revalidated already
+           have their decoded data and are collected in revalidated_tiles instead.
+        """
+        for tile, data in tile_data_tuples:
+            if tile.decoded_data:
+                revalidated_tiles.append(tile)
+            else:
+                yield tile, data
+
     def _decode_tiles(self, tiles_with_encoded_data):
         """
          * Decodes the PBF data from all the specified tiles and reports the progress
-         * If a tile is loaded from the cache, the decoded_data is already set and doesn't have to be encoded
-        :param tiles_with_encoded_data:
+         * As the number of tiles isn't known before the source has delivered all of them, the maximum of the
+           progress is the number of tiles passed to the pool so far and the progress the number of decoded tiles.
+         * The data is decompressed by the decoder in the worker processes, so only the compressed data is
+           passed to the pool.
+         * The tiles are consumed as they are delivered by the source, so that loading and decoding overlap.
+           Only a limited number of tiles is waiting in the pool, the next tile is requested from the source
+           once a decoding task is done.
+         * Tiles sharing their payload with another tile are decoded only once, see _skip_duplicate_payloads
+         * When the loading is cancelled, the sources stop delivering tiles, except the ones already loaded.
+           These and the tiles in the pool are still decoded, so that they can be cached for the next load.
+        :param tiles_with_encoded_data: An iterable of tuples (tile, encoded_data)
         :return:
         """
         clip_tiles = not self._loading_options["inspection_mode"]
-        tiles_with_encoded_data = [(t[0], self._unzip(t[1]), clip_tiles) for t in tiles_with_encoded_data]
+        copies_by_payload_id = {}
+        tiles_with_encoded_data = self._skip_duplicate_payloads(tiles_with_encoded_data, copies_by_payload_id)
+        tiles_with_encoded_data = ((t[0], t[1], clip_tiles) for t in tiles_with_encoded_data)
 
         if can_load_lib():
             decoder_func = decode_tile_native
         else:
             decoder_func = decode_tile_python
 
-        tiles = []
-
         tile_data_tuples = []
 
-        if len(tiles_with_encoded_data) <= self._nr_tiles_to_process_serial:
-            for t in tiles_with_encoded_data:
+        first_tiles = list(islice(tiles_with_encoded_data, self._nr_tiles_to_process_serial + 1))
+        if len(first_tiles) <= self._nr_tiles_to_process_serial:
+            for t in first_tiles:
                 tile, decoded_data = decoder_func(t)
                 if decoded_data:
                     tile_data_tuples.append((tile, decoded_data))
         else:
-            pool = self._get_pool()
-            rs = pool.map_async(decoder_func, tiles_with_encoded_data, callback=tile_data_tuples.extend)
+            nr_processors = self._get_nr_of_processors()
+            max_pending_tasks = nr_processors * self._max_pending_tasks_per_processor
+            pool = self._get_pool(nr_processors)
+            pending_tasks = []
+            nr_submitted = 0
+            nr_decoded = 0
+            self._update_progress(progress=0, max_progress=0, msg="Decoding tiles...")
+            for t in chain(first_tiles, tiles_with_encoded_data):
+                if self.cancel_requested:
+                    # the source might have started after the cancellation, it stops after the loaded tiles then
+                    self._source.cancel()
+                pending_tasks.append(pool.apply_async(decoder_func, (t,)))
+                nr_submitted += 1
+                self._update_progress(max_progress=nr_submitted)
+                while len(pending_tasks) >= max_pending_tasks:
+                    nr_finished = self._collect_decoded_tiles(pending_tasks, tile_data_tuples)
+                    if nr_finished:
+                        nr_decoded += nr_finished
+                        self._update_progress(progress=nr_decoded)
+                    QApplication.processEvents()
             pool.close()
-            current_progress = 0
-            nr_of_tiles = len(tiles_with_encoded_data)
-            self._update_progress(max_progress=nr_of_tiles, msg="Decoding {} tiles...".format(nr_of_tiles))
-            while not rs.ready() and not self.cancel_requested:
+            self._update_progress(msg="Decoding {} tiles...".format(nr_submitted))
+            while pending_tasks:
+                nr_finished = self._collect_decoded_tiles(pending_tasks, tile_data_tuples)
+                if nr_finished:
+                    nr_decoded += nr_finished
+                    self._update_progress(progress=nr_decoded)
                 QApplication.processEvents()
-                remaining = rs._number_left
-                index = nr_of_tiles - remaining
-                progress = int(100.0 / nr_of_tiles * (index + 1))
-                if progress != current_progress:
-                    current_progress = progress
-                    self._update_progress(progress=progress)
-            if self.cancel_requested:
-                pool.terminate()
             pool.join()
 
-        tile_data_tuples = sorted(tile_data_tuples, key=lambda t: t[0].id())
-        groups = groupby(tile_data_tuples, lambda t: t[0].id())
-        for key, group in groups:
-            tile = None
-            data = {}
-            for t, decoded_data in list(group):
-                if not decoded_data:
-                    continue
+        if copies_by_payload_id:
+            tile_data_tuples.extend(self._copy_duplicate_payloads(tile_data_tuples, copies_by_payload_id))
 
-                if not tile:
-                    tile = t
-                for layer_name in decoded_data:
-                    data[layer_name] = decoded_data[layer_name]
-            tile.decoded_data = data
-            tiles.append(tile)
+        # the decoded layers of the same tile are merged, the tiles are returned in the order of their keys
+        tiles_by_key = {}
+        for tile, decoded_data in tile_data_tuples:
+            if not decoded_data:
+                continue
+            key = tile.key()
+            if key in tiles_by_key:
+                tiles_by_key[key].decoded_data.update(decoded_data)
+            else:
+                tile.decoded_data = dict(decoded_data)
+                tiles_by_key[key] = tile
+        tiles = [tiles_by_key[key] for key in sorted(tiles_by_key)]
 
         info("Decoding finished, {} tiles with data", len(tiles))
         return tiles
 
     @staticmethod
-    def _unzip(data):
+    def _skip_duplicate_payloads(tiles_with_encoded_data, copies_by_payload_id):
         """
-         * If the passed data is gzipped, it will be unzipped. Otherwise it will be returned untouched
-        :param data:
-        :return:
+         * Passes through the first tile of each payload. The other tiles with the same payload are collected in
+           copies_by_payload_id, so that they don't have to be decoded again.
+         * Tiles without a payload_id from the source are identified by the hash of their encoded data.
         """
+        for tile, data in tiles_with_encoded_data:
+            if tile.payload_id is None and data:
+                tile.payload_id = "sha1:{}".format(hashlib.sha1(data).hexdigest())
+            payload_id = tile.payload_id
+            if payload_id is not None:
+                if payload_id in copies_by_payload_id:
+                    copies_by_payload_id[payload_id].append(tile)
+                    continue
+                copies_by_payload_id[payload_id] = []
+            yield tile, data
 
-        is_zipped = is_gzipped(data)
-        if is_zipped:
-            file_content = GzipFile('', 'r', 0, BytesIO(data)).read()
-        else:
-            file_content = data
-        return file_content
+    @staticmethod
+    def _copy_duplicate_payloads(tile_data_tuples, copies_by_payload_id):
+        """
+         * Creates the decoded data of the tiles whose payload has been decoded for another tile
+        :return: A list of tuples (tile, decoded_data) for the copies
+        """
+        copies = []
+        for tile, decoded_data in tile_data_tuples:
+            for copy in copies_by_payload_id.get(tile.payload_id, []):
+                copies.append((copy, VtReader._copy_decoded_data(decoded_data, source_tile=tile, target_tile=copy)))
+        nr_of_duplicates = sum(len(c) for c in copies_by_payload_id.values())
+        info("{} distinct payloads decoded, {} tiles with a duplicate payload ({} copied)",
+             len(copies_by_payload_id), nr_of_duplicates, len(copies))
+        return copies
+
+    @staticmethod
+    def _copy_decoded_data(decoded_data, source_tile, target_tile):
+        """
+         * Returns the decoded data of source_tile for target_tile.
+         * Tile-local layers are independent of the tile and are shared. GeoJSON layers, as created by the native
+           decoder, contain absolute coordinates, which are moved by the offset between the tiles.
+        """
+        delta_x = target_tile.extent[0] - source_tile.extent[0]
+        delta_y = target_tile.extent[1] - source_tile.extent[1]
+        data = {}
+        for layer_name, layer in decoded_data.items():
+            if not layer.get("isGeojson"):
+                data[layer_name] = layer
+                continue
+            layer_copy = dict(layer)
+            for geo_type_id in geo_types:
+                geo_type = geo_types[geo_type_id]
+                features = layer.get(geo_type)
+                if not features:
+                    continue
+                layer_copy[geo_type] = []
+                for f in features:
+                    feature = dict(f)
+                    feature["geometry"] = {
+                        "type": f["geometry"]["type"],
+                        "coordinates": translate_coordinates_recursive(f["geometry"]["coordinates"], delta_x, delta_y)
+                    }
+                    feature["properties"] = dict(f["properties"])
+                    feature["properties"]["_col"] = target_tile.column
+                    feature["properties"]["_row"] = target_tile.row
+                    layer_copy[geo_type].append(feature)
+            data[layer_name] = layer_copy
+        return data
+
+    @staticmethod
+    def _collect_decoded_tiles(pending_tasks, tile_data_tuples):
+        """
+         * Removes the finished tasks from pending_tasks and adds their results to tile_data_tuples
+        :return: The number of finished tasks
+        """
+        finished_tasks = [task for task in pending_tasks if task.ready()]
+        for task in finished_tasks:
+            pending_tasks.remove(task)
+            tile, decoded_data = task.get()
+            if decoded_data:
+                tile_data_tuples.append((tile, decoded_data))
+        return len(finished_tasks)
 
     def _process_tiles(self, tiles, layer_filter):
         """
@@ -695,12 +940,16 @@ class VtReader(QObject):
                         if tile_id not in feature_collection["tiles"]:
                             feature_collection["tiles"].append(tile_id)
             else:
-                for feature in layer["features"]:
-                    if "extent" in layer:
-                        extent = layer["extent"]
-                    else:
-                        extent = self._DEFAULT_EXTENT
-                    geojson_features, geo_type = self._create_geojson_feature(feature, tile, extent)
+                if "extent" in layer:
+                    extent = layer["extent"]
+                else:
+                    extent = self._DEFAULT_EXTENT
+                features = layer["features"]
+                # the coordinates of all features of the layer are transformed at once
+                geometries = map_tile_coordinates([self._get_tile_coordinates(f) for f in features],
+                                                  TileAffine(tile.extent, extent))
+                for feature, geometry in zip(features, geometries):
+                    geojson_features, geo_type = self._create_geojson_feature(feature, geometry, extent)
                     if geojson_features and len(geojson_features) > 0:
                         for f in geojson_features:
                             f["properties"]["_id"] = self._feature_count
@@ -724,32 +973,32 @@ class VtReader(QObject):
         feature_collection = self.feature_collections_by_layer_name_and_geotype[name_and_geotype]
         return feature_collection
 
-    def _create_geojson_feature(self, feature, tile, current_layer_tile_extent):
+    @staticmethod
+    def _get_tile_coordinates(feature):
+        coordinates = feature["geometry"]
+        if geo_types[feature["type"]] == GeoTypes.POINT:
+            coordinates = coordinates[0]
+        return coordinates
+
+    def _create_geojson_feature(self, feature, geometry, current_layer_tile_extent):
         """
         Creates a GeoJSON feature for the specified feature
+        :param geometry: The tuple (absolute_coordinates, all_out_of_bounds) returned by map_tile_coordinates
         """
 
         geo_type = geo_types[feature["type"]]
-        coordinates = feature["geometry"]
+        coordinates, all_out_of_bounds = geometry
         properties = feature["properties"]
         if "id" in properties and properties["id"] < 0:
             properties["id"] = 0
 
         if geo_type == GeoTypes.POINT:
-            coordinates = coordinates[0]
-            if self._clip_tiles_at_tile_bounds and not all(0 <= c <= current_layer_tile_extent for c in coordinates):
+            tile_coordinates = feature["geometry"][0]
+            if self._clip_tiles_at_tile_bounds and not all(0 <= c <= current_layer_tile_extent
+                                                           for c in tile_coordinates):
                 return None, None
-        all_out_of_bounds = []
-        coordinates = map_coordinates_recursive(coordinates=coordinates,
-                                                tile_extent=current_layer_tile_extent,
-                                                mapper_func=lambda coords: self._get_absolute_coordinates(
-                                                    coordinates=coords,
-                                                    tile=tile,
-                                                    extent=current_layer_tile_extent),
-                                                all_out_of_bounds_func=lambda out_of_bounds: all_out_of_bounds.append(
-                                                    out_of_bounds))
-
-        if self._clip_tiles_at_tile_bounds and all(c is True for c in all_out_of_bounds):
+
+        if self._clip_tiles_at_tile_bounds and all_out_of_bounds:
             return None, None
 
         split_geometries = self._loading_options["merge_tiles"]
@@ -790,20 +1039,133 @@ class VtReader(QObject):
                     "type": type_string,
                     "coordinates": c
                 },
-                "properties": properties
+                "properties": dict(properties)
             }
             all_features.append(feature_json)
 
         return all_features
 
-    @staticmethod
-    def _get_absolute_coordinates(coordinates, tile, extent):
+
+class TilePrefetcher(QObject):
+    """
+     * Loads tiles which are likely to be requested next (e.g. the tiles around the loaded extent) into the cache,
+       while the reader is idle.
+     * The prefetcher has its own instance of the source, so that cancelling it doesn't affect the reader.
+     * Each prefetching runs in a new worker with its own thread, which are deleted when the thread has finished.
+       A prefetching requested while another one is still running is started after the running one has finished,
+       as they share the source.
+    """
+
+    def __init__(self, connection):
+        QObject.__init__(self)
+        self._connection = connection
+        self._source = None
+        self._worker = None
+        self._pending_prefetch = None
+
+    def prefetch_async(self, tiles_by_zoom, max_bytes, clip_tiles, parent=None):
         """
-         * The coordinates of a geometry, are relative to the tile the feature is located on.
-         * Due to this, we've to get the absolute coordinates of the geometry.
+         * Cancels the running prefetching and starts prefetching the specified tiles
         """
-        delta_x = tile.extent[2] - tile.extent[0]
-        delta_y = tile.extent[3] - tile.extent[1]
-        merc_easting = int(tile.extent[0] + delta_x / extent * coordinates[0])
-        merc_northing = int(tile.extent[1] + delta_y / extent * coordinates[1])
-        return [merc_easting, merc_northing]
+        self.cancel()
+        self._pending_prefetch = (tiles_by_zoom, max_bytes, clip_tiles, parent)
+        if not self._worker:
+            self._start_pending_prefetch()
+
+    def is_running(self):
+        return self._worker is not None
+
+    def cancel(self):
+        self._pending_prefetch = None
+        if self._worker:
+            self._worker.cancel()
+
+    def _start_pending_prefetch(self):
+        tiles_by_zoom, max_bytes, clip_tiles, parent = self._pending_prefetch
+        self._pending_prefetch = None
+        if not self._source:
+            self._source = VtReader.create_source_of_connection(self._connection)
+        worker = _PrefetchWorker(self._source, tiles_by_zoom, max_bytes=max_bytes, clip_tiles=clip_tiles)
+        worker_thread = QThread(parent)
+        worker.moveToThread(worker_thread)
+        worker_thread.started.connect(worker.prefetch)
+        worker_thread.finished.connect(self._worker_finished)
+        worker_thread.finished.connect(worker.deleteLater)
+        worker_thread.finished.connect(worker_thread.deleteLater)
+        self._worker = worker
+        worker_thread.start(QThread.LowestPriority)
+
+    def _worker_finished(self):
+        self._worker = None
+        if self._pending_prefetch:
+            self._start_pending_prefetch()
+
+
+class _PrefetchWorker(QObject):
+    """
+     * Prefetches the tiles once. The tiles are loaded in small batches and decoded one by one.
+    """
+
+    _batch_size = 4
+
+    def __init__(self, source, tiles_by_zoom, max_bytes, clip_tiles):
+        QObject.__init__(self)
+        self._source = source
+        self._tiles_by_zoom = tiles_by_zoom
+        self._max_bytes = max_bytes
+        self._clip_tiles = clip_tiles
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+        self._source.cancel()
+
+    def prefetch(self):
+        cancel_event = self._cancel_event
+        max_bytes = self._max_bytes
+        try:
+            if can_load_lib():
+                decoder_func = decode_tile_native
+            else:
+                decoder_func = decode_tile_python
+            source_name = self._source.name()
+            nr_of_bytes = 0
+            nr_of_tiles = 0
+            for zoom_level, tiles in self._tiles_by_zoom:
+                if cancel_event.is_set() or nr_of_bytes >= max_bytes:
+                    break
+                tiles = [t for t in self._source.get_existing_tiles(zoom_level=zoom_level, tiles=tiles)
+                         if not is_tile_cached(source_name, zoom_level, t[0], t[1], read_files=True)]
+                for index in range(0, len(tiles), self._batch_size):
+                    if cancel_event.is_set() or nr_of_bytes >= max_bytes:
+                        break
+                    batch = tiles[index:index + self._batch_size]
+                    tile_data_tuples = self._source.iter_tiles(zoom_level=zoom_level, tiles_to_load=batch)
+                    try:
+                        for tile, data in tile_data_tuples:
+                            if cancel_event.is_set() or nr_of_bytes >= max_bytes:
+                                break
+                            if tile.decoded_data or not data:
+                                # the cache entry has been revalidated
+                                continue
+                            nr_of_bytes += len(data)
+                            tile, decoded_data = decoder_func((tile, data, self._clip_tiles))
+                            if decoded_data:
+                                cache_tile(cache_name=source_name, zoom_level=zoom_level, x=tile.column,
+                                           y=tile.row, decoded_data=decoded_data, validators=tile.validators)
+                                nr_of_tiles += 1
+                    finally:
+                        # aborts the requests which are still running
+                        tile_data_tuples.close()
+            if cancel_event.is_set():
+                debug("Prefetching cancelled after {} tiles ({} bytes)", nr_of_tiles, nr_of_bytes)
+            else:
+                info("Prefetching finished, {} tiles ({} bytes) cached", nr_of_tiles, nr_of_bytes)
+        except Exception as e:
+            tb = ""
+            if traceback:
+                tb = traceback.format_exc()
+            critical("Prefetching failed: {}, {}", e, tb)
+        finally:
+            self._source.close_connection()
+            QThread.currentThread().quit()
@@ -36,7 +36,11 @@ from .util.tile_helper import (
     extent_overlap_bounds,
     center_tiles_equal,
     clamp_bounds,
-    convert_coordinate,
+    convert_coordinates,
+    clear_coordinate_transforms,
+    get_all_tiles,
+    get_surrounding_tiles,
+    TileRange,
     WORLD_BOUNDS)
 
 from .ui.dialogs import AboutDialog, ConnectionsDialog
@@ -46,6 +50,7 @@ from .util.file_helper import (
     clear_cache,
     get_plugin_directory,
     get_temp_dir)
+from .util.sqlite_helper import close_connection_pools
 
 # try:
 #     pth = 'C:\\Program Files\\JetBrains\\PyCharm 2017.2.3\\debug-eggs\\pycharm-debug.egg'
@@ -81,6 +86,9 @@ class VtrPlugin():
     _dialog = None
     _model = None
     _reload_button_text = "Load features overlapping the view extent"
+    _max_overzoom_levels = 6
+    _max_preview_levels = 3
+    _prefetch_max_bytes = 5 * 1024 * 1024
     add_layer_action = None
 
     def _get_zoom_for_current_map_scale(self):
@@ -116,7 +124,11 @@ class VtrPlugin():
         self._loaded_extent = None
         self._loaded_scale = None
         self._is_loading = False
+        self._refinement_bounds = None
+        self._displayed_extent = None
+        self._qgis_crs = None
         self.iface.mapCanvas().xyCoordinates.connect(self._handle_mouse_move)
+        self.iface.mapCanvas().destinationCrsChanged.connect(self._on_crs_change)
         self._debouncer = SignalDebouncer(timeout=500,
                                           signals=[
                                               # self.iface.mapCanvas().scaleChanged,  # doesn't seem to be required,
@@ -225,6 +237,10 @@ class VtrPlugin():
 
     def _on_project_change(self):
         self.iface.mainWindow().statusBar().showMessage("")
+        self._qgis_crs = None
+        self._refinement_bounds = None
+        self._displayed_extent = None
+        clear_coordinate_transforms()
         self._debouncer.stop()
         self._cancel_load()
         self.connections_dialog.set_layers([])
@@ -319,7 +335,7 @@ class VtrPlugin():
 
             new_zoom = self._get_zoom_for_current_map_scale()
             min_zoom = self._current_reader.get_source().min_zoom()
-            max_zoom = self._current_reader.get_source().max_zoom()
+            max_zoom = self._get_max_zoom()
             new_zoom = clamp(new_zoom, low=min_zoom, high=max_zoom)
 
             has_zoom_changed = new_zoom != self._current_zoom
@@ -454,6 +470,7 @@ class VtrPlugin():
     def reader_cancelled(self):
         info("Loading cancelled")
         self._is_loading = False
+        self._refinement_bounds = None
         self.handle_progress_update(show_progress=False)
         if self._auto_zoom:
             extent = self._extent_to_load
@@ -488,7 +505,7 @@ class VtrPlugin():
             new_extent = self._extent_to_load
         else:
             zoom = get_zoom_by_scale(scale)
-            max_zoom = self._current_reader.get_source().max_zoom()
+            max_zoom = self._get_max_zoom()
             min_zoom = self._current_reader.get_source().min_zoom()
             zoom = clamp(zoom, low=min_zoom, high=max_zoom)
             new_extent = self._get_visible_extent_as_tile_bounds(zoom)
@@ -512,7 +529,7 @@ class VtrPlugin():
     def _handle_scale_change(self, new_scale):
         scale_increased = self._current_scale is None or new_scale > self._current_scale
         self._current_scale = new_scale
-        max_zoom = self._current_reader.get_source().max_zoom()
+        max_zoom = self._get_max_zoom()
         new_zoom = get_zoom_by_scale(new_scale)
         if new_zoom > max_zoom:
             new_zoom = max_zoom
@@ -522,8 +539,16 @@ class VtrPlugin():
             self._reload_tiles()
 
     def _get_qgis_crs(self):
-        canvas = self.iface.mapCanvas()
-        return get_code_from_epsg(canvas.mapSettings().destinationCrs().authid())
+        """
+         * Returns the EPSG code of the map canvas. The code is cached, as it's required on each mouse move.
+        """
+        if self._qgis_crs is None:
+            canvas = self.iface.mapCanvas()
+            self._qgis_crs = get_code_from_epsg(canvas.mapSettings().destinationCrs().authid())
+        return self._qgis_crs
+
+    def _on_crs_change(self):
+        self._qgis_crs = None
 
     def _handle_mouse_move(self, pos):
         if not self._current_reader:
@@ -585,7 +610,7 @@ class VtrPlugin():
             zoom = self._get_zoom_for_current_map_scale()
             if self._current_reader:
                 min_zoom = self._current_reader.get_source().min_zoom()
-                max_zoom = self._current_reader.get_source().max_zoom()
+                max_zoom = self._get_max_zoom()
                 zoom = clamp(zoom, low=min_zoom, high=max_zoom)
         elif manual_zoom:
             zoom = manual_zoom
@@ -610,10 +635,54 @@ class VtrPlugin():
             else:
                 bounds = self._get_visible_extent_as_tile_bounds(zoom=self._current_zoom)
 
-            self._load_tiles(options=self.connections_dialog.options,
-                             layers_to_load=self._current_layer_filter,
-                             bounds=bounds,
-                             ignore_limit=ignore_limit)
+            preview_bounds = None
+            if not ignore_limit:
+                preview_bounds = self._get_preview_bounds(bounds)
+            if preview_bounds:
+                info("Showing the cached zoom level {} while loading zoom level {}", preview_bounds["zoom"],
+                     bounds["zoom"])
+                self._refinement_bounds = bounds
+                self._load_tiles(options=self.connections_dialog.options,
+                                 layers_to_load=self._current_layer_filter,
+                                 bounds=preview_bounds,
+                                 cache_only=True)
+            else:
+                self._load_tiles(options=self.connections_dialog.options,
+                                 layers_to_load=self._current_layer_filter,
+                                 bounds=bounds,
+                                 ignore_limit=ignore_limit)
+
+    def _get_preview_bounds(self, bounds):
+        """
+         * Returns the visible tile bounds of the nearest coarser zoom level, whose tiles are all cached, or None,
+           if there is no such zoom level or if the displayed data already covers the visible extent in more detail.
+         * While navigating, the cached tiles are shown immediately and are replaced by the tiles of the zoom level
+           to load, as soon as they are loaded.
+        """
+        options = self.connections_dialog.options
+        if not options.auto_zoom_enabled() or not options.progressive_loading_enabled():
+            return None
+        source = self._current_reader.get_source()
+        zoom = bounds["zoom"]
+        highest_zoom = zoom - 1
+        if source.max_zoom() is not None:
+            highest_zoom = min(highest_zoom, source.max_zoom())
+        lowest_zoom = zoom - self._max_preview_levels
+        if source.min_zoom() is not None:
+            lowest_zoom = max(lowest_zoom, source.min_zoom())
+        displayed = self._displayed_extent
+        if displayed and displayed["zoom"] >= lowest_zoom:
+            visible_extent = self._get_visible_extent_as_tile_bounds(displayed["zoom"])
+            if self.is_extent_within_bounds(visible_extent, displayed):
+                lowest_zoom = displayed["zoom"] + 1
+        for preview_zoom in range(highest_zoom, lowest_zoom - 1, -1):
+            preview_bounds = self._get_visible_extent_as_tile_bounds(preview_zoom)
+            source_bounds = source.bounds_tile(preview_zoom)
+            if source_bounds:
+                preview_bounds = clamp_bounds(bounds_to_clamp=preview_bounds, clamp_values=source_bounds)
+            if self._current_reader.are_tiles_cached(preview_bounds):
+                return preview_bounds
+        return None
 
     def _get_current_extent_as_wkt(self):
         return self.iface.mapCanvas().extent().asWktCoordinates()
@@ -691,9 +760,21 @@ class VtrPlugin():
             zoom = manual_zoom
         if self.connections_dialog.options.auto_zoom_enabled():
             zoom = self._get_zoom_for_current_map_scale()
+            if self._current_reader:
+                max_zoom = self._get_max_zoom()
         zoom = clamp(zoom, low=min_zoom, high=max_zoom)
         return zoom
 
+    def _get_max_zoom(self):
+        """
+         * Returns the max. zoom level to load automatically, which is above the max. zoom of the source if overzooming
+           is enabled. The zoom levels above are created from the tiles of the max. zoom of the source.
+        """
+        max_zoom = self._current_reader.get_source().max_zoom()
+        if max_zoom is not None and self.connections_dialog.options.overzoom_enabled():
+            max_zoom += self._max_overzoom_levels
+        return max_zoom
+
     def _set_qgis_extent(self, zoom, scheme, bounds):
         """
          * Sets the current extent of the QGIS map canvas to the specified bounds
@@ -701,8 +782,8 @@ class VtrPlugin():
         """
         min_xy = tile_to_latlon(zoom, bounds["x_min"], bounds["y_min"], scheme=scheme)
         max_xy = tile_to_latlon(zoom, bounds["x_max"], bounds["y_max"], scheme=scheme)
-        min_pos = convert_coordinate(900913, self._get_qgis_crs(), lat=min_xy[1], lng=min_xy[0])
-        max_pos = convert_coordinate(900913, self._get_qgis_crs(), lat=min_xy[1], lng=max_xy[0])
+        min_pos, max_pos = convert_coordinates(900913, self._get_qgis_crs(), [(min_xy[0], min_xy[1]),
+                                                                              (max_xy[0], min_xy[1])])
 
         map_min_pos = QgsPoint(min_pos[0], min_pos[1])
         map_max_pos = QgsPoint(max_pos[0], max_pos[1])
@@ -730,7 +811,7 @@ class VtrPlugin():
         new_action.setEnabled(is_enabled)
         return new_action
 
-    def _load_tiles(self, options, layers_to_load, bounds, ignore_limit=False, is_add=False):
+    def _load_tiles(self, options, layers_to_load, bounds, ignore_limit=False, is_add=False, cache_only=False):
         self._current_extent = bounds
         if self._debouncer.is_running():
             if is_add:
@@ -754,6 +835,7 @@ class VtrPlugin():
         if ignore_limit:
             tile_limit = None
         clip_tiles = options.clip_tiles()
+        overzoom = options.overzoom_enabled()
 
         reader = self._current_reader
         if not reader:
@@ -771,7 +853,7 @@ class VtrPlugin():
                 reader.set_allowed_sources(self._current_reader_sources)
                 reader.set_options(load_mask_layer=load_mask_layer, merge_tiles=merge_tiles, clip_tiles=clip_tiles,
                                    apply_styles=apply_styles, max_tiles=tile_limit, layer_filter=layers_to_load,
-                                   is_inspection_mode=inspection_mode)
+                                   is_inspection_mode=inspection_mode, overzoom=overzoom, cache_only=cache_only)
                 self._is_loading = True
                 reader.load_tiles_async(bounds=bounds)
             except Exception as e:
@@ -838,6 +920,22 @@ class VtrPlugin():
         layer_group.addLayer(layer)
 
     def reader_loading_finished(self, loaded_zoom_level, loaded_extent):
+        self._displayed_extent = self._current_extent
+        refinement_bounds = self._refinement_bounds
+        self._refinement_bounds = None
+        if refinement_bounds:
+            # the cached preview is shown, its layers are updated again as soon as the zoom level to load is loaded
+            self.handle_progress_update(show_progress=False)
+            self.refresh_layers()
+            info("Preview of zoom level {} shown, loading zoom level {}", loaded_zoom_level, refinement_bounds["zoom"])
+            self._is_loading = False
+            self._load_tiles(options=self.connections_dialog.options,
+                             layers_to_load=self._current_layer_filter,
+                             bounds=refinement_bounds)
+            if not self._is_loading:
+                self._debouncer.start()
+            return
+
         self._loaded_extent = self._current_extent
         self.handle_progress_update(show_progress=False)
         auto_zoom = self._auto_zoom
@@ -861,6 +959,38 @@ class VtrPlugin():
         self._is_loading = False
         if auto_zoom:
             self._debouncer.start()
+            if self.connections_dialog.options.prefetch_enabled():
+                self._prefetch_tiles()
+
+    def _prefetch_tiles(self):
+        """
+         * Starts prefetching the ring of tiles around the loaded extent and the tiles of the visible extent
+           on the adjacent zoom levels, so that the next pan or zoom can be served from the cache
+        """
+        if not self._current_reader or not self._loaded_extent:
+            return
+        source = self._current_reader.get_source()
+        zoom = self._loaded_extent["zoom"]
+        tiles_by_zoom = []
+        for prefetch_zoom in [zoom, zoom - 1, zoom + 1]:
+            if source.min_zoom() is not None and prefetch_zoom < source.min_zoom():
+                continue
+            if source.max_zoom() is not None and prefetch_zoom > source.max_zoom():
+                continue
+            within = TileRange(0, 0, 2 ** prefetch_zoom - 1, 2 ** prefetch_zoom - 1)
+            source_bounds = source.bounds_tile(prefetch_zoom)
+            if source_bounds:
+                within = within.intersection(TileRange.from_bounds(source_bounds))
+            if prefetch_zoom == zoom:
+                tiles = get_surrounding_tiles(TileRange.from_bounds(self._loaded_extent), within=within)
+            else:
+                visible_extent = self._get_visible_extent_as_tile_bounds(prefetch_zoom)
+                tiles = get_all_tiles(visible_extent).intersection(within)
+            if tiles:
+                tiles_by_zoom.append((prefetch_zoom, tiles))
+        if tiles_by_zoom:
+            debug("Prefetching {} tiles", sum(len(t) for _, t in tiles_by_zoom))
+            self._current_reader.prefetch_async(tiles_by_zoom, max_bytes=self._prefetch_max_bytes)
 
     def _set_layer_extent(self, loaded_extent):
         layers = self._get_all_own_layers()
@@ -869,8 +999,8 @@ class VtrPlugin():
             if self._current_reader:
                 src = self._current_reader.get_source()
                 bounds = src.bounds()
-            x_min, y_min = convert_coordinate(4326, self._get_qgis_crs(), lat=bounds[1], lng=bounds[0])
-            x_max, y_max = convert_coordinate(4326, self._get_qgis_crs(), lat=bounds[3], lng=bounds[2])
+            (x_min, y_min), (x_max, y_max) = convert_coordinates(4326, self._get_qgis_crs(),
+                                                                 [(bounds[0], bounds[1]), (bounds[2], bounds[3])])
             bounds = [x_min, y_min, x_max, y_max]
         else:
             if not loaded_extent:
@@ -977,11 +1107,15 @@ class VtrPlugin():
 
     def unload(self):
         if self._current_reader:
+            self._current_reader.cancel_prefetch()
             self._current_reader.get_source().close_connection()
             self._current_reader = None
+        # the prefetcher's source or readers which have been replaced might still hold SQLite connections
+        close_connection_pools()
 
         try:
             self.iface.mapCanvas().xyCoordinates.disconnect(self._handle_mouse_move)
+            self.iface.mapCanvas().destinationCrsChanged.disconnect(self._on_crs_change)
             QgsMapLayerRegistry.instance().layersWillBeRemoved.disconnect(self._on_remove)
             self.iface.newProjectCreated.disconnect(self._on_project_change)
             self.iface.projectRead.disconnect(self._on_project_change)